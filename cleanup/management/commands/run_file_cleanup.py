@@ -0,0 +1,28 @@
+import signal
+import threading
+
+from django.core.management.base import BaseCommand
+
+from cleanup.worker import FileCleanupWorker
+
+
+class Command(BaseCommand):
+    help = 'Deletes the stored files queued by set-based deletes of all tenants.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Drain the queue once and exit')
+        parser.add_argument('--batch-size', type=int, help='Files claimed per transaction')
+
+    def handle(self, *args, **options):
+        worker = FileCleanupWorker(batch_size=options['batch_size'])
+        if options['once']:
+            handled = worker.run_pending()
+            self.stdout.write(self.style.SUCCESS(f'Processed {handled} queued files'))
+            return
+
+        stop_event = threading.Event()
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(signum, lambda *_: stop_event.set())
+        self.stdout.write('File cleanup worker started')
+        worker.run_forever(stop_event)
+        self.stdout.write(self.style.SUCCESS('File cleanup worker stopped'))
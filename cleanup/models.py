@@ -0,0 +1,25 @@
+from django.db import models
+from django.utils import timezone
+
+
+class PendingFileDeletion(models.Model):
+    """
+    A stored file whose database row is gone and that still has to be deleted.
+
+    Lives in the public schema only: deletes in any tenant queue their files
+    here in the same transaction, and one worker drains the queue for all
+    tenants (``cleanup.worker``).
+    """
+    name = models.CharField(max_length=500)
+    not_before = models.DateTimeField(default=timezone.now)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['not_before'], name='pendingfiledel_not_before_idx'),
+        ]
+
+    def __str__(self):
+        return self.name
@@ -0,0 +1,34 @@
+"""
+Enqueueing of stored files for deletion.
+
+Both helpers only write queue rows, inside the caller's transaction, so a
+rolled-back delete never loses its files. ``enqueue_queryset`` does it with
+one ``INSERT ... SELECT`` without loading the rows into Python.
+"""
+from django.db import connection
+from django.utils import timezone
+
+from .models import PendingFileDeletion
+
+
+def enqueue(names):
+    PendingFileDeletion.objects.bulk_create(
+        [PendingFileDeletion(name=name) for name in names if name], batch_size=1000,
+    )
+
+
+def enqueue_queryset(queryset, field_name):
+    """Queue the files referenced by ``field_name`` of every row of ``queryset``; returns the count."""
+    column = queryset.model._meta.get_field(field_name).column
+    sql, params = queryset.order_by().values(field_name).query.sql_with_params()
+    quote = connection.ops.quote_name
+    now = timezone.now()
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {quote(PendingFileDeletion._meta.db_table)} '
+            f'(name, not_before, attempts, last_error, created_at) '
+            f"SELECT files.{quote(column)}, %s, 0, '', %s FROM ({sql}) files "
+            f"WHERE files.{quote(column)} <> ''",
+            [now, now, *params],
+        )
+        return cursor.rowcount
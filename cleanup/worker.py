@@ -0,0 +1,73 @@
+"""
+Background deletion of queued files.
+
+Batches are claimed with ``SELECT ... FOR UPDATE SKIP LOCKED``, so several
+workers can share the queue. Files that fail to delete are retried with
+exponential backoff (``not_before``); storages treat already missing files
+as deleted.
+"""
+import logging
+import threading
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+
+from .models import PendingFileDeletion
+
+logger = logging.getLogger(__name__)
+
+MAX_BACKOFF = timedelta(hours=6)
+
+
+class FileCleanupWorker:
+    def __init__(self, storage=None, batch_size=None, poll_interval=None):
+        self.storage = storage or default_storage
+        self.batch_size = batch_size or getattr(settings, 'FILE_CLEANUP_BATCH_SIZE', 200)
+        self.poll_interval = poll_interval or getattr(settings, 'FILE_CLEANUP_POLL_INTERVAL', 30)
+
+    def process_batch(self, now=None):
+        """Delete one batch of due files; returns the number of queue rows handled."""
+        now = now or timezone.now()
+        with transaction.atomic():
+            batch = list(
+                PendingFileDeletion.objects.filter(not_before__lte=now)
+                .order_by('not_before')
+                .select_for_update(skip_locked=True)[:self.batch_size]
+            )
+            done, failed = [], []
+            for pending in batch:
+                try:
+                    self.storage.delete(pending.name)
+                except Exception as exc:  # any storage error is retried later
+                    pending.attempts += 1
+                    pending.last_error = str(exc)
+                    pending.not_before = now + min(timedelta(minutes=2 ** pending.attempts), MAX_BACKOFF)
+                    failed.append(pending)
+                else:
+                    done.append(pending.pk)
+            PendingFileDeletion.objects.filter(pk__in=done).delete()
+            PendingFileDeletion.objects.bulk_update(failed, ['attempts', 'last_error', 'not_before'])
+        if failed:
+            logger.warning('Could not delete %d of %d files; first error: %s', len(failed), len(batch), failed[0].last_error)
+        return len(batch)
+
+    def run_pending(self):
+        total = 0
+        while True:
+            handled = self.process_batch()
+            total += handled
+            if handled < self.batch_size:
+                return total
+
+    def run_forever(self, stop_event=None):
+        stop_event = stop_event or threading.Event()
+        while not stop_event.is_set():
+            close_old_connections()
+            try:
+                self.run_pending()
+            except Exception:
+                logger.exception('File cleanup failed')
+            stop_event.wait(self.poll_interval)
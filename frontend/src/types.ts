@@ -36,8 +36,10 @@ export interface Task {
   updated_at: string;
   assigned_to: number;
   created_by: number;
-  comments: Comment[];
-  attachments: Attachment[];
+  comment_count: number;
+  latest_comments: Comment[];
+  attachment_count: number;
+  latest_attachments: Attachment[];
 }
 
 export interface Comment {
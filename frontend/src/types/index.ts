@@ -19,8 +19,10 @@ export interface Task {
   updated_at: string;
   assigned_to: number;
   created_by: number;
-  comments: TaskComment[];
-  attachments: TaskAttachment[];
+  comment_count: number;
+  latest_comments: TaskComment[];
+  attachment_count: number;
+  latest_attachments: TaskAttachment[];
 }
 
 export interface TaskComment {
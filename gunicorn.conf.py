@@ -0,0 +1,148 @@
+"""
+Gunicorn runtime profile; gunicorn picks this file up from the working directory.
+
+* ``GUNICORN_WORKER_CLASS``: ``sync`` (default), ``gthread`` (``GUNICORN_THREADS``
+  threads per worker) or ``uvicorn`` (serves the ASGI application). Only
+  ``sync`` drops nothing when a worker is recycled: the others can reset
+  connections they accepted but had not started serving yet.
+* Worker count: ``GUNICORN_WORKERS``, or ``GUNICORN_WORKERS_PER_CPU`` per CPU
+  of the container's cgroup CPU quota (not the host's cores) plus one.
+* The application is preloaded in the master and its URLconfs imported, then
+  the heap is frozen, so workers share those pages copy-on-write.
+* Workers are recycled after ``GUNICORN_MAX_REQUESTS`` requests, give or take
+  ``GUNICORN_MAX_REQUESTS_JITTER`` so they do not all restart together, and
+  when their proportional memory (PSS) exceeds ``GUNICORN_MAX_WORKER_MEMORY_MB``
+  (default: 80% of the cgroup memory limit split across the workers).
+* SIGTERM drains: workers stop accepting, finish in-flight requests for up to
+  ``GUNICORN_GRACEFUL_TIMEOUT`` seconds and exit. Kubernetes keeps routing to
+  a terminating pod for a few seconds, which the deployment's preStop sleep
+  covers.
+"""
+import gc
+import importlib
+import math
+import os
+import signal
+import threading
+import time
+
+WORKER_CLASSES = {
+    'sync': 'sync',
+    'gthread': 'gthread',
+    'uvicorn': 'uvicorn.workers.UvicornWorker',
+}
+
+
+def _env_int(name, default):
+    value = os.getenv(name)
+    return int(value) if value else default
+
+
+def _read(path):
+    try:
+        with open(path) as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+
+def cgroup_cpus():
+    """CPUs granted by the cgroup quota (v2, then v1), else the CPUs this process may run on."""
+    quota = _read('/sys/fs/cgroup/cpu.max')
+    if quota:
+        limit, period = quota.split()
+        if limit != 'max':
+            return int(limit) / int(period)
+    limit, period = _read('/sys/fs/cgroup/cpu/cpu.cfs_quota_us'), _read('/sys/fs/cgroup/cpu/cpu.cfs_period_us')
+    if limit and period and int(limit) > 0:
+        return int(limit) / int(period)
+    return len(os.sched_getaffinity(0))
+
+
+def cgroup_memory_bytes():
+    """The cgroup memory limit (v2, then v1), or ``None`` when unlimited."""
+    limit = _read('/sys/fs/cgroup/memory.max') or _read('/sys/fs/cgroup/memory/memory.limit_in_bytes')
+    if not limit or limit == 'max' or int(limit) >= 2 ** 60:
+        return None
+    return int(limit)
+
+
+def worker_memory_bytes():
+    """Proportional set size of this process (shared pages split between sharers), else RSS."""
+    rollup = _read('/proc/self/smaps_rollup')
+    if rollup:
+        for line in rollup.splitlines():
+            if line.startswith('Pss:'):
+                return int(line.split()[1]) * 1024
+    statm = _read('/proc/self/statm')
+    return int(statm.split()[1]) * os.sysconf('SC_PAGE_SIZE') if statm else 0
+
+
+worker_type = os.getenv('GUNICORN_WORKER_CLASS', 'sync')
+worker_class = WORKER_CLASSES[worker_type]
+if worker_type == 'uvicorn':
+    wsgi_app = 'task_management_system.asgi:application'
+else:
+    wsgi_app = 'task_management_system.wsgi:application'
+
+bind = os.getenv('GUNICORN_BIND', '0.0.0.0:8000')
+workers = _env_int('GUNICORN_WORKERS', 0) or max(
+    2, math.ceil(cgroup_cpus() * _env_int('GUNICORN_WORKERS_PER_CPU', 2)) + 1,
+)
+threads = _env_int('GUNICORN_THREADS', 4) if worker_type == 'gthread' else 1
+preload_app = os.getenv('GUNICORN_PRELOAD', 'True') == 'True'
+
+max_requests = _env_int('GUNICORN_MAX_REQUESTS', 1000)
+max_requests_jitter = _env_int('GUNICORN_MAX_REQUESTS_JITTER', max_requests // 10)
+timeout = _env_int('GUNICORN_TIMEOUT', 30)
+graceful_timeout = _env_int('GUNICORN_GRACEFUL_TIMEOUT', 25)
+keepalive = _env_int('GUNICORN_KEEPALIVE', 5)
+# Heartbeat files on tmpfs; a disk-backed /tmp can stall workers under I/O pressure
+worker_tmp_dir = '/dev/shm' if os.path.isdir('/dev/shm') else None
+
+_memory_limit = cgroup_memory_bytes()
+max_worker_memory = _env_int('GUNICORN_MAX_WORKER_MEMORY_MB', 0) * 1024 * 1024 or (
+    int(_memory_limit * 0.8 / workers) if _memory_limit else 0
+)
+memory_check_interval = _env_int('GUNICORN_MEMORY_CHECK_INTERVAL', 10)
+
+
+def when_ready(server):
+    if not preload_app:
+        return
+    # Import the views, serializers and URL patterns once, before forking
+    from django.conf import settings
+    from django.db import connections
+
+    for urlconf in {settings.ROOT_URLCONF, getattr(settings, 'PUBLIC_SCHEMA_URLCONF', settings.ROOT_URLCONF)}:
+        importlib.import_module(urlconf)
+    connections.close_all()
+    # Keep the garbage collector from touching (and so copying) the preloaded objects
+    gc.freeze()
+    server.log.info('Preloaded the application for %d %s workers', workers, worker_type)
+
+
+def _watch_memory(worker):
+    while worker.alive:
+        used = worker_memory_bytes()
+        if used > max_worker_memory:
+            worker.log.warning(
+                'Worker %s uses %d MB (limit %d MB); restarting it after its current requests',
+                worker.pid, used // 2 ** 20, max_worker_memory // 2 ** 20,
+            )
+            # The same graceful exit as a SIGTERM from the master; the master starts a replacement
+            os.kill(worker.pid, signal.SIGTERM)
+            return
+        time.sleep(memory_check_interval)
+
+
+def post_worker_init(worker):
+    if max_worker_memory:
+        threading.Thread(target=_watch_memory, args=(worker,), name='memory-watchdog', daemon=True).start()
+
+
+def worker_exit(server, worker):
+    # Connections are per worker; close them cleanly instead of leaving them to the database to reap
+    from django.db import connections
+
+    connections.close_all()
@@ -0,0 +1,106 @@
+"""
+Maintenance of the cross-tenant ``ScheduledReminder`` index.
+
+Task saves and deletes in any tenant schema upsert or drop that task's row in
+the public table (the tenant search path falls back to ``public``), inside
+the same transaction as the task change. ``rebuild_tenant`` recreates the
+rows of one tenant from its tasks in bounded batches.
+"""
+from django.conf import settings
+from django.db import connection
+from django.utils import timezone
+from django_tenants.utils import get_tenant_model
+
+from .models import ScheduledReminder
+
+DONE = 'done'
+BATCH_SIZE = 1000
+
+_tenant_ids = {}
+
+
+def current_tenant_id():
+    """Primary key of the tenant whose schema is active, or ``None`` outside any tenant."""
+    tenant = getattr(connection, 'tenant', None)
+    if tenant is None:
+        return None
+    pk = getattr(tenant, 'pk', None)
+    if pk is not None:
+        return pk
+    # schema_context() only sets a schema name; resolve it once per process
+    schema_name = tenant.schema_name
+    if schema_name not in _tenant_ids:
+        _tenant_ids[schema_name] = (
+            get_tenant_model().objects.filter(schema_name=schema_name).values_list('pk', flat=True).first()
+        )
+    return _tenant_ids[schema_name]
+
+
+def lead_time():
+    return getattr(settings, 'REMINDER_LEAD_TIME')
+
+
+def reminder_for(tenant_id, task_id, status, due_date, now=None):
+    """The index row a task should have, or ``None`` when nothing is left to remind about."""
+    now = now or timezone.now()
+    if status == DONE or due_date is None or due_date <= now:
+        return None
+    return ScheduledReminder(tenant_id=tenant_id, task_id=task_id, due_date=due_date, remind_at=due_date - lead_time())
+
+
+def _upsert(rows):
+    ScheduledReminder.objects.bulk_create(
+        rows,
+        batch_size=BATCH_SIZE,
+        update_conflicts=True,
+        unique_fields=['tenant', 'task_id'],
+        update_fields=['due_date', 'remind_at'],
+    )
+
+
+def sync_task(task):
+    """Bring the index row of ``task`` (in the current schema) in line with its status and due date."""
+    tenant_id = current_tenant_id()
+    if tenant_id is None:
+        return
+    row = reminder_for(tenant_id, task.pk, task.status, task.due_date)
+    if row is None:
+        discard_tasks([task.pk], tenant_id)
+    else:
+        _upsert([row])
+
+
+def discard_tasks(task_ids, tenant_id=None):
+    """Drop the rows of ``task_ids`` (a list or a ``values('pk')`` subquery) of the current tenant."""
+    tenant_id = tenant_id or current_tenant_id()
+    if tenant_id is None:
+        return
+    ScheduledReminder.objects.filter(tenant_id=tenant_id, task_id__in=task_ids).delete()
+
+
+def rebuild_tenant(tenant, task_model):
+    """
+    Recreate the rows of ``tenant``; the caller must have its schema active.
+
+    Only reminders whose time is still ahead are scheduled, so a rebuild
+    never resends reminders that already went out.
+    """
+    now = timezone.now()
+    ScheduledReminder.objects.filter(tenant=tenant).delete()
+    tasks = (
+        task_model.objects.exclude(status=DONE)
+        .filter(due_date__gt=now + lead_time())
+        .values_list('pk', 'status', 'due_date')
+    )
+    rows = []
+    count = 0
+    for pk, status, due_date in tasks.iterator(chunk_size=BATCH_SIZE):
+        rows.append(reminder_for(tenant.pk, pk, status, due_date, now))
+        if len(rows) >= BATCH_SIZE:
+            _upsert(rows)
+            count += len(rows)
+            rows = []
+    if rows:
+        _upsert(rows)
+        count += len(rows)
+    return count
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+from django_tenants.utils import get_tenant_model, tenant_context
+
+from reminders.index import rebuild_tenant
+from tasks.models import Task
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the cross-tenant reminder index from the tasks of every tenant (or of --schema).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--schema', help='Only rebuild this tenant schema')
+
+    def handle(self, *args, **options):
+        tenants = get_tenant_model().objects.order_by('pk')
+        if options['schema']:
+            tenants = tenants.filter(schema_name=options['schema'])
+        for tenant in tenants.iterator():
+            with tenant_context(tenant):
+                count = rebuild_tenant(tenant, Task)
+            self.stdout.write(f'{tenant.schema_name}: {count} reminders')
+        self.stdout.write(self.style.SUCCESS('Rebuilt reminder index'))
@@ -0,0 +1,31 @@
+import signal
+import threading
+
+from django.core.management.base import BaseCommand
+
+from reminders.scheduler import ReminderScheduler
+
+
+class Command(BaseCommand):
+    help = (
+        'Sends due-date reminders of all tenants to REMINDER_SINK. '
+        'Several instances may run at once; each claims its own batches.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Send what is due now and exit')
+        parser.add_argument('--batch-size', type=int, help='Reminders claimed per transaction')
+
+    def handle(self, *args, **options):
+        scheduler = ReminderScheduler(batch_size=options['batch_size'])
+        if options['once']:
+            sent = scheduler.run_pending()
+            self.stdout.write(self.style.SUCCESS(f'Processed {sent} reminders'))
+            return
+
+        stop_event = threading.Event()
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(signum, lambda *_: stop_event.set())
+        self.stdout.write('Reminder scheduler started')
+        scheduler.run_forever(stop_event)
+        self.stdout.write(self.style.SUCCESS('Reminder scheduler stopped'))
@@ -0,0 +1,30 @@
+# Generated by Django 5.1.7 on 2026-10-19 09:06
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('tenants', '0002_setup_public_tenant'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ScheduledReminder',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('task_id', models.BigIntegerField()),
+                ('due_date', models.DateTimeField()),
+                ('remind_at', models.DateTimeField()),
+                ('tenant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='tenants.tenant')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['remind_at'], name='reminder_remind_at_idx')],
+                'constraints': [models.UniqueConstraint(fields=('tenant', 'task_id'), name='reminder_tenant_task_uniq')],
+            },
+        ),
+    ]
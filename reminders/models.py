@@ -0,0 +1,28 @@
+from django.conf import settings
+from django.db import models
+
+
+class ScheduledReminder(models.Model):
+    """
+    A pending due-date reminder for one task of one tenant.
+
+    Lives in the public schema only, so the scheduler finds the next due
+    reminders of every tenant with one indexed range scan instead of visiting
+    each schema. Rows are kept deliberately narrow; everything else about the
+    task is read from its tenant schema when the reminder is sent.
+    """
+    tenant = models.ForeignKey(settings.TENANT_MODEL, on_delete=models.CASCADE, related_name='+')
+    task_id = models.BigIntegerField()
+    due_date = models.DateTimeField()
+    remind_at = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['tenant', 'task_id'], name='reminder_tenant_task_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['remind_at'], name='reminder_remind_at_idx'),
+        ]
+
+    def __str__(self):
+        return f'Reminder for task {self.task_id} of tenant {self.tenant_id} at {self.remind_at}'
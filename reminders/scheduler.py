@@ -0,0 +1,115 @@
+"""
+Cross-tenant due-date reminder scheduler.
+
+The scheduler sleeps until the earliest ``remind_at`` in the public index (or
+``REMINDER_MAX_SLEEP`` seconds, so reminders added meanwhile are picked up),
+then drains everything that is due in batches of ``REMINDER_BATCH_SIZE``:
+
+1. claim a batch with ``SELECT ... FOR UPDATE SKIP LOCKED``, so any number of
+   scheduler processes can run side by side without sending twice;
+2. load the claimed tasks from their tenant schemas (one query per tenant in
+   the batch) and drop rows whose task was finished or rescheduled since;
+3. hand the batch to the sink and delete the claimed rows in the same
+   transaction.
+
+Only one batch is held in memory at a time, however many reminders exist.
+Delivery is at-least-once: a crash after the sink returned but before the
+commit resends that batch.
+"""
+import logging
+import threading
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import Min
+from django.utils import timezone
+from django_tenants.utils import get_tenant_model, schema_context
+
+from tasks.models import Task
+
+from .index import DONE
+from .models import ScheduledReminder
+from .sinks import Reminder, get_sink
+
+logger = logging.getLogger(__name__)
+
+
+class ReminderScheduler:
+    def __init__(self, sink=None, batch_size=None, max_sleep=None):
+        self.sink = sink or get_sink()
+        self.batch_size = batch_size or getattr(settings, 'REMINDER_BATCH_SIZE', 500)
+        self.max_sleep = max_sleep if max_sleep is not None else getattr(settings, 'REMINDER_MAX_SLEEP', 60)
+
+    def _load(self, schema_name, due_dates):
+        tasks = Task.objects.filter(pk__in=due_dates).exclude(status=DONE).values_list(
+            'pk', 'title', 'due_date', 'assigned_to_id', 'assigned_to__email', 'created_by_id', 'created_by__email',
+        )
+        reminders = []
+        for pk, title, due_date, assignee_id, assignee_email, creator_id, creator_email in tasks:
+            if due_date != due_dates[pk]:
+                continue
+            reminders.append(Reminder(
+                schema_name=schema_name,
+                task_id=pk,
+                title=title,
+                due_date=due_date,
+                recipient_id=assignee_id or creator_id,
+                recipient_email=(assignee_email if assignee_id else creator_email) or '',
+            ))
+        return reminders
+
+    def dispatch_batch(self, now=None):
+        """Send one batch of due reminders; returns the number of index rows consumed."""
+        now = now or timezone.now()
+        with transaction.atomic():
+            claimed = list(
+                ScheduledReminder.objects.filter(remind_at__lte=now)
+                .order_by('remind_at')
+                .select_for_update(skip_locked=True)
+                .values_list('pk', 'tenant_id', 'task_id', 'due_date')[:self.batch_size]
+            )
+            if not claimed:
+                return 0
+            by_tenant = defaultdict(dict)
+            for _, tenant_id, task_id, due_date in claimed:
+                by_tenant[tenant_id][task_id] = due_date
+            schemas = dict(get_tenant_model().objects.filter(pk__in=by_tenant).values_list('pk', 'schema_name'))
+
+            reminders = []
+            for tenant_id, due_dates in by_tenant.items():
+                with schema_context(schemas[tenant_id]):
+                    reminders.extend(self._load(schemas[tenant_id], due_dates))
+            if reminders:
+                self.sink.send(reminders)
+            ScheduledReminder.objects.filter(pk__in=[row[0] for row in claimed]).delete()
+        logger.info('Sent %d reminders (%d index rows, %d tenants)', len(reminders), len(claimed), len(by_tenant))
+        return len(claimed)
+
+    def run_pending(self, now=None):
+        """Drain every reminder due at ``now``, one batch at a time."""
+        now = now or timezone.now()
+        total = 0
+        while True:
+            consumed = self.dispatch_batch(now)
+            total += consumed
+            if consumed < self.batch_size:
+                return total
+
+    def seconds_until_next(self):
+        next_at = ScheduledReminder.objects.aggregate(next_at=Min('remind_at'))['next_at']
+        if next_at is None:
+            return self.max_sleep
+        return min(max((next_at - timezone.now()).total_seconds(), 0), self.max_sleep)
+
+    def run_forever(self, stop_event=None):
+        stop_event = stop_event or threading.Event()
+        while not stop_event.is_set():
+            close_old_connections()
+            try:
+                self.run_pending()
+                delay = self.seconds_until_next()
+            except Exception:
+                logger.exception('Reminder dispatch failed; retrying in %ss', self.max_sleep)
+                delay = self.max_sleep
+            stop_event.wait(delay)
@@ -0,0 +1,27 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from tasks.models import Task
+from tasks.signals import subtrees_deleting
+
+from . import index
+
+REMINDER_FIELDS = {'status', 'due_date'}
+
+
+@receiver(post_save, sender=Task)
+def sync_task_reminder(sender, instance, created, update_fields=None, raw=False, **kwargs):
+    if raw or (update_fields is not None and not REMINDER_FIELDS.intersection(update_fields)):
+        return
+    if created or instance.has_changed('status', 'due_date'):
+        index.sync_task(instance)
+
+
+@receiver(post_delete, sender=Task)
+def discard_task_reminder(sender, instance, **kwargs):
+    index.discard_tasks([instance.pk])
+
+
+@receiver(subtrees_deleting, sender=Task)
+def discard_subtree_reminders(sender, queryset, **kwargs):
+    index.discard_tasks(queryset.values('pk'))
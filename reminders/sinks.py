@@ -0,0 +1,69 @@
+"""
+Destinations for due-date reminders.
+
+A sink receives one batch (a list of ``Reminder``) per call and should either
+deliver all of it or raise: the scheduler only removes a batch from the index
+after ``send()`` returns, so a failing sink is retried on the next wake-up.
+Select the sink with ``REMINDER_SINK`` (a dotted path) and pass constructor
+arguments through ``REMINDER_SINK_OPTIONS``.
+"""
+import json
+import logging
+import os
+import threading
+from dataclasses import asdict, dataclass
+from datetime import datetime
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class Reminder:
+    schema_name: str
+    task_id: int
+    title: str
+    due_date: datetime
+    recipient_id: int
+    recipient_email: str
+
+
+class ReminderSink:
+    def send(self, reminders):
+        raise NotImplementedError
+
+
+class LogSink(ReminderSink):
+    """Logs one line per reminder; useful in development and for smoke tests."""
+    def send(self, reminders):
+        for reminder in reminders:
+            logger.info(
+                'Reminder schema=%s task=%s recipient=%s due=%s title=%r',
+                reminder.schema_name, reminder.task_id, reminder.recipient_email or reminder.recipient_id,
+                reminder.due_date.isoformat(), reminder.title,
+            )
+
+
+class FileSink(ReminderSink):
+    """Appends reminders to a JSON lines file, one object per line."""
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def send(self, reminders):
+        lines = ''.join(json.dumps(asdict(reminder), cls=DjangoJSONEncoder) + '\n' for reminder in reminders)
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._lock, open(self.path, 'a') as handle:
+            handle.write(lines)
+            handle.flush()
+            os.fsync(handle.fileno())
+
+
+def get_sink():
+    sink_class = import_string(getattr(settings, 'REMINDER_SINK', 'reminders.sinks.LogSink'))
+    return sink_class(**getattr(settings, 'REMINDER_SINK_OPTIONS', {}))
@@ -0,0 +1,260 @@
+"""
+``POST /api/batch/``: several API calls in one round trip.
+
+The batch request goes through the middleware once (tenant resolution,
+instrumentation, activity buffer) and is authenticated once. Each
+sub-request is then dispatched in-process to the view its path resolves to
+in the tenant's URLconf. The batch's user is handed to it, so the JWT is
+not decoded again. Sub-requests still go through the views' permissions
+and throttles, so batching does not get around the rate limits.
+
+Sub-requests run in order. A sub-request with a ``name`` can be referenced
+by later ones as ``${name.field.0.id}`` in their ``path`` or ``body``. The
+reference is resolved against the earlier response body; a string that is
+a single reference keeps the referenced value's type. A sub-request that
+references a failed one is not executed and answered with 424.
+
+With ``atomic``, everything runs in one transaction that is rolled back if
+any sub-request fails; the remaining sub-requests are answered with 424.
+
+Responses are collected as data (``Response.data``) and rendered once with
+the batch response.
+"""
+import io
+import logging
+import re
+
+import orjson
+from django.conf import settings
+from django.db import transaction
+from django.http import Http404, HttpRequest, QueryDict
+from django.urls import Resolver404, resolve
+from rest_framework import serializers, status
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from .docs import OpenApiExample, extend_schema
+
+logger = logging.getLogger(__name__)
+
+METHODS = ('GET', 'POST', 'PUT', 'PATCH', 'DELETE')
+REFERENCE = re.compile(r'\$\{([\w-]+)((?:\.[\w-]+)*)\}')
+
+
+class SubRequestSerializer(serializers.Serializer):
+    name = serializers.RegexField(r'^[\w-]+$', required=False, help_text='Name later sub-requests refer to')
+    method = serializers.ChoiceField(choices=METHODS, default='GET')
+    path = serializers.RegexField(r'^/api/', help_text='API path, with query string')
+    body = serializers.JSONField(required=False)
+
+
+class BatchSerializer(serializers.Serializer):
+    requests = SubRequestSerializer(many=True, allow_empty=False)
+    atomic = serializers.BooleanField(default=False)
+
+    def validate_requests(self, value):
+        limit = getattr(settings, 'BATCH_MAX_REQUESTS', 20)
+        if len(value) > limit:
+            raise serializers.ValidationError(f'At most {limit} requests per batch.')
+        names = [request['name'] for request in value if 'name' in request]
+        if len(names) != len(set(names)):
+            raise serializers.ValidationError('Request names must be unique.')
+        return value
+
+
+class SubResponseSerializer(serializers.Serializer):
+    name = serializers.CharField(required=False)
+    status = serializers.IntegerField()
+    body = serializers.JSONField(allow_null=True)
+
+
+class BatchResponseSerializer(serializers.Serializer):
+    responses = SubResponseSerializer(many=True)
+
+
+class Unresolved(Exception):
+    """A sub-request that cannot be sent; ``status`` and ``detail`` become its response."""
+    def __init__(self, status, detail):
+        super().__init__(detail)
+        self.status = status
+        self.detail = detail
+
+
+def _lookup(match, results):
+    name, fields = match.group(1), match.group(2)
+    if name not in results:
+        raise Unresolved(status.HTTP_400_BAD_REQUEST, f'Unknown request "{name}" in {match.group(0)}.')
+    result = results[name]
+    if result['status'] >= 400:
+        raise Unresolved(status.HTTP_424_FAILED_DEPENDENCY, f'Request "{name}" failed.')
+    value = result['body']
+    for field in fields.split('.')[1:]:
+        try:
+            value = value[int(field)] if isinstance(value, list) else value[field]
+        except (KeyError, IndexError, TypeError, ValueError):
+            raise Unresolved(status.HTTP_400_BAD_REQUEST, f'{match.group(0)} does not exist.')
+    return value
+
+
+def resolve_references(value, results):
+    """``value`` with every ``${name.field}`` replaced from the named ``results``."""
+    if isinstance(value, str):
+        match = REFERENCE.fullmatch(value)
+        if match:
+            return _lookup(match, results)
+        return REFERENCE.sub(lambda match: str(_lookup(match, results)), value)
+    if isinstance(value, list):
+        return [resolve_references(item, results) for item in value]
+    if isinstance(value, dict):
+        return {key: resolve_references(item, results) for key, item in value.items()}
+    return value
+
+
+class SubRequest(HttpRequest):
+    """One sub-request, carrying the batch's scheme, tenant, URLconf and user."""
+    def __init__(self, request, method, path, body):
+        super().__init__()
+        path, _, query = path.partition('?')
+        content = orjson.dumps(body) if body is not None else b''
+        self.outer = outer = request._request
+
+        self.method = method
+        self.path = self.path_info = path
+        self.META = {
+            **outer.META,
+            'REQUEST_METHOD': method,
+            'PATH_INFO': path,
+            'QUERY_STRING': query,
+            'CONTENT_TYPE': 'application/json',
+            'CONTENT_LENGTH': str(len(content)),
+        }
+        self.GET = QueryDict(query)
+        self.COOKIES = outer.COOKIES
+        self._stream = io.BytesIO(content)
+        self._read_started = False
+        for attribute in ('tenant', 'urlconf'):
+            if hasattr(outer, attribute):
+                setattr(self, attribute, getattr(outer, attribute))
+        # DRF authenticates requests carrying these with ForcedAuthentication instead of decoding the JWT again
+        self._force_auth_user = request.user
+        self._force_auth_token = request.auth
+        self.user = request.user
+        # Throttles append their bucket states here; RateLimitHeadersMiddleware reports them for the batch
+        if not hasattr(outer, 'rate_limits'):
+            outer.rate_limits = []
+        self.rate_limits = outer.rate_limits
+
+    def _get_scheme(self):
+        return self.outer.scheme
+
+
+def response_body(response):
+    if hasattr(response, 'data'):
+        return response.data
+    if response.streaming or not response.content:
+        return None
+    if response.get('Content-Type', '').startswith('application/json'):
+        return orjson.loads(response.content)
+    return response.content.decode(response.charset, errors='replace')
+
+
+@extend_schema(
+    tags=['Batch'],
+    summary='Send several API requests at once',
+    description=(
+        'Runs up to `BATCH_MAX_REQUESTS` API requests in order with one authentication and one tenant '
+        'lookup. Later requests can use results of earlier, named ones as `${name.field}`. With `atomic`, '
+        'all requests share one transaction that is rolled back if any of them fails.'
+    ),
+    request=BatchSerializer,
+    responses={200: BatchResponseSerializer},
+    examples=[
+        OpenApiExample(
+            'Task page',
+            value={
+                'requests': [
+                    {'name': 'task', 'path': '/api/tasks/42/'},
+                    {'path': '/api/tasks/${task.id}/comments/'},
+                    {'path': '/api/users/me/'},
+                ],
+            },
+            request_only=True,
+        ),
+        OpenApiExample(
+            'Create a task and comment on it',
+            value={
+                'atomic': True,
+                'requests': [
+                    {'name': 'task', 'method': 'POST', 'path': '/api/tasks/', 'body': {'title': 'Release'}},
+                    {
+                        'method': 'POST', 'path': '/api/tasks/${task.id}/add_comment/',
+                        'body': {'content': 'Created by a batch'},
+                    },
+                ],
+            },
+            request_only=True,
+        ),
+    ],
+)
+class BatchView(APIView):
+    # Only the sub-requests are throttled, each as the request it is
+    throttle_classes = []
+
+    def post(self, request):
+        serializer = BatchSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        requests, atomic = serializer.validated_data['requests'], serializer.validated_data['atomic']
+
+        if not atomic:
+            return Response({'responses': self.run(request, requests, atomic)})
+        with transaction.atomic():
+            responses = self.run(request, requests, atomic)
+            if any(response['status'] >= 400 for response in responses):
+                transaction.set_rollback(True)
+        return Response({'responses': responses})
+
+    def run(self, request, requests, atomic):
+        responses, results, failed = [], {}, None
+        for index, spec in enumerate(requests):
+            if failed is not None:
+                status_code, body = status.HTTP_424_FAILED_DEPENDENCY, {
+                    'detail': f'Not executed: request {failed} failed and the batch was rolled back.',
+                }
+            else:
+                status_code, body = self.dispatch_one(request, spec, results)
+                if atomic and status_code >= 400:
+                    failed = index
+            response = {'status': status_code, 'body': body}
+            if 'name' in spec:
+                response = {'name': spec['name'], **response}
+                results[spec['name']] = response
+            responses.append(response)
+        return responses
+
+    def dispatch_one(self, request, spec, results):
+        try:
+            path = resolve_references(spec['path'], results)
+            body = resolve_references(spec.get('body'), results)
+        except Unresolved as exc:
+            return exc.status, {'detail': exc.detail}
+
+        try:
+            match = resolve(path.partition('?')[0])
+        except Resolver404:
+            return status.HTTP_404_NOT_FOUND, {'detail': 'Not found.'}
+        if getattr(match.func, 'view_class', None) is BatchView:
+            return status.HTTP_400_BAD_REQUEST, {'detail': 'Batches cannot be nested.'}
+
+        sub = SubRequest(request, spec['method'], path, body)
+        sub.resolver_match = match
+        try:
+            response = match.func(sub, *match.args, **match.kwargs)
+        except Http404:
+            return status.HTTP_404_NOT_FOUND, {'detail': 'Not found.'}
+        except Exception:
+            if transaction.get_connection().in_atomic_block:
+                # The transaction may be unusable; fail the whole batch instead
+                raise
+            logger.exception('Batch sub-request %s %s failed', spec['method'], path)
+            return status.HTTP_500_INTERNAL_SERVER_ERROR, {'detail': 'Internal server error.'}
+        return response.status_code, response_body(response)
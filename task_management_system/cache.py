@@ -0,0 +1,234 @@
+"""
+Two-level, tenant-scoped cache.
+
+Lookups go to a per-process LRU first (``CACHE_LOCAL_MAX_ENTRIES`` entries,
+each kept at most ``CACHE_LOCAL_TTL`` seconds), then to the shared Django
+cache (``CACHE_SHARED_ALIAS``; redis when ``REDIS_URL`` is set), and fill
+both on the way back. Every key starts with the current tenant schema and a
+per-schema, per-namespace generation number, so one tenant can never read
+another tenant's entries, and ``bump()`` drops a whole namespace of one
+tenant with a single increment.
+
+Invalidation is driven by model signals (see ``tasks.signals`` and
+``users.signals``). It deletes the shared entries and this process's local
+ones, both immediately and again when the transaction commits, so readers
+in between cannot re-fill the cache with pre-commit data. Other processes
+may serve their local copy for up to ``CACHE_LOCAL_TTL`` seconds.
+
+Lookups are counted per namespace as ``local``/``shared`` hits and misses
+in ``cache_requests_total`` on ``/metrics``.
+"""
+import hashlib
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connection, transaction
+from django_tenants.utils import schema_context
+
+from .instrumentation import Counter, registry
+
+logger = logging.getLogger(__name__)
+
+MISSING = object()
+
+lookups = registry.register(Counter(
+    'cache_requests_total', 'Two-level cache lookups by namespace and the tier that answered (or miss).',
+    ('namespace', 'result'), getattr(settings, 'METRICS_MAX_SERIES', 2000),
+))
+
+
+class LocalLRU:
+    """Thread-safe LRU with a per-entry time to live."""
+    def __init__(self, max_entries, ttl):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_many(self, keys):
+        now = time.monotonic()
+        found = {}
+        with self._lock:
+            for key in keys:
+                entry = self._entries.get(key)
+                if entry is None:
+                    continue
+                if entry[0] < now:
+                    del self._entries[key]
+                    continue
+                self._entries.move_to_end(key)
+                found[key] = entry[1]
+        return found
+
+    def set_many(self, values):
+        expires = time.monotonic() + self.ttl
+        with self._lock:
+            for key, value in values.items():
+                self._entries[key] = (expires, value)
+                self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete_many(self, keys):
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+local = LocalLRU(
+    getattr(settings, 'CACHE_LOCAL_MAX_ENTRIES', 10000),
+    getattr(settings, 'CACHE_LOCAL_TTL', 5),
+)
+
+
+def _shared():
+    return caches[getattr(settings, 'CACHE_SHARED_ALIAS', 'default')]
+
+
+def _guarded(operation, default):
+    # A cache outage degrades to misses instead of failing requests
+    try:
+        return operation()
+    except Exception:
+        logger.warning('Shared cache unavailable', exc_info=True)
+        return default
+
+
+class TwoLevelCache:
+    """A namespace of tenant-scoped entries, e.g. ``TwoLevelCache('task')``."""
+    def __init__(self, namespace, timeout=None):
+        self.namespace = namespace
+        self.timeout = timeout
+
+    def _prefix(self):
+        return f'{connection.schema_name}:{self.namespace}'
+
+    def generation(self):
+        key = f'{self._prefix()}:generation'
+        value = local.get_many([key]).get(key)
+        if value is None:
+            value = _guarded(lambda: _shared().get(key), None) or 0
+            local.set_many({key: value})
+        return value
+
+    def _keys(self, ids):
+        prefix = f'{self._prefix()}:{self.generation()}'
+        return {f'{prefix}:{pk}': pk for pk in ids}
+
+    def get_many(self, ids):
+        """``{id: value}`` for the ids found in either tier."""
+        keys = self._keys(ids)
+        found = local.get_many(keys)
+        if found:
+            lookups.inc((self.namespace, 'local'), len(found))
+        missing = [key for key in keys if key not in found]
+        if missing:
+            shared = _guarded(lambda: _shared().get_many(missing), {})
+            if shared:
+                lookups.inc((self.namespace, 'shared'), len(shared))
+                local.set_many(shared)
+                found.update(shared)
+            if len(missing) > len(shared):
+                lookups.inc((self.namespace, 'miss'), len(missing) - len(shared))
+        return {keys[key]: value for key, value in found.items()}
+
+    def set_many(self, values):
+        keyed = {key: values[pk] for key, pk in self._keys(values).items()}
+        local.set_many(keyed)
+        timeout = self.timeout if self.timeout is not None else getattr(settings, 'CACHE_TIMEOUT', 300)
+        _guarded(lambda: _shared().set_many(keyed, timeout), None)
+
+    def get_or_set(self, key, build):
+        value = self.get_many([key]).get(key, MISSING)
+        if value is MISSING:
+            value = build()
+            self.set_many({key: value})
+        return value
+
+    def invalidate(self, ids):
+        """Drop the entries of ``ids`` in the current schema, now and on commit."""
+        ids = list(ids)
+        if not ids:
+            return
+
+        def delete():
+            keys = list(self._keys(ids))
+            local.delete_many(keys)
+            _guarded(lambda: _shared().delete_many(keys), None)
+
+        _now_and_on_commit(delete)
+
+    def bump(self):
+        """Drop every entry of this namespace in the current schema, now and on commit."""
+        def increment():
+            key = f'{self._prefix()}:generation'
+            shared = _shared()
+            # A missing generation reads as 0: add() starts it at 1, otherwise incr() (atomic on redis)
+            _guarded(lambda: shared.add(key, 1, None) or shared.incr(key), None)
+            local.delete_many([key])
+
+        _now_and_on_commit(increment)
+
+
+def _now_and_on_commit(callback):
+    callback()
+    if connection.in_atomic_block:
+        schema_name = connection.schema_name
+
+        def again():
+            with schema_context(schema_name):
+                callback()
+
+        transaction.on_commit(again)
+
+
+def digest(*parts):
+    """Short, fixed-length key for arbitrary query parameters."""
+    return hashlib.sha1(repr(parts).encode()).hexdigest()
+
+
+class RepresentationCache:
+    """
+    Serialized representations of model instances, keyed by primary key.
+
+    Representations with absolute URLs depend on the request's scheme and host,
+    so each entry remembers the base URL it was rendered for and only serves
+    requests with the same one.
+    """
+    def __init__(self, namespace, build, timeout=None):
+        self.cache = TwoLevelCache(namespace, timeout)
+        self.build = build
+
+    def render(self, ids, context=None):
+        """
+        Representations of ``ids``, in order.
+
+        ``build(missing_ids, context)`` returns ``{pk: representation}`` for the
+        ids that were not cached; ids it does not return are left out.
+        """
+        request = (context or {}).get('request')
+        variant = request.build_absolute_uri('/') if request is not None else ''
+        data = {}
+        for pk, (cached_variant, representation) in self.cache.get_many(ids).items():
+            if cached_variant == variant:
+                data[pk] = representation
+        missing = [pk for pk in ids if pk not in data]
+        if missing:
+            fresh = self.build(missing, context)
+            self.cache.set_many({pk: (variant, representation) for pk, representation in fresh.items()})
+            data.update(fresh)
+        return [data[pk] for pk in ids if pk in data]
+
+    def invalidate(self, ids):
+        self.cache.invalidate(ids)
+
+    def bump(self):
+        self.cache.bump()
@@ -0,0 +1,176 @@
+"""
+Negotiated compression of API responses.
+
+``CompressionMiddleware`` compresses responses with brotli (when the
+``brotli`` package is installed) or gzip, whichever the client's
+``Accept-Encoding`` ranks higher; brotli wins ties. Levels are chosen for
+CPU cost rather than ratio: brotli quality 4 compresses JSON better than
+gzip's best level at a fraction of its time. Both are configurable
+(``COMPRESSION_BROTLI_QUALITY``, ``COMPRESSION_GZIP_LEVEL``).
+
+Left alone are:
+
+* bodies shorter than ``COMPRESSION_MIN_SIZE`` bytes, which would not
+  shrink by a packet;
+* responses that are already encoded (the OpenAPI schema), marked
+  ``no-transform``, or files (static files come precompressed from
+  WhiteNoise, attachments are mostly compressed formats already);
+* content types other than JSON, XML, JavaScript, CSS, plain text and SVG.
+  HTML pages carry CSRF tokens, and compressing secrets next to
+  attacker-controlled input is what BREACH exploits.
+
+Streamed responses are compressed chunk by chunk, flushing after each one,
+so clients keep receiving data as it is produced.
+"""
+import functools
+import re
+import zlib
+
+from django.conf import settings
+from django.http import FileResponse
+from django.utils.cache import patch_vary_headers
+
+try:
+    import brotli
+except ImportError:  # optional; gzip only
+    brotli = None
+
+COMPRESSIBLE_TYPES = re.compile(
+    r'^(?:text/(?:plain|css|csv|javascript|xml)|application/(?:json|javascript|xml|[\w.-]+\+(?:json|xml))'
+    r'|image/svg\+xml)\b'
+)
+NO_TRANSFORM = re.compile(r'\bno-transform\b')
+
+
+class GzipEncoder:
+    name = 'gzip'
+
+    def __init__(self, level):
+        # wbits 31: a gzip container around the deflate stream
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def compress(self, data):
+        return self._compressor.compress(data)
+
+    def flush(self):
+        return self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self):
+        return self._compressor.flush()
+
+
+class BrotliEncoder:
+    name = 'br'
+
+    def __init__(self, quality):
+        self._compressor = brotli.Compressor(mode=brotli.MODE_TEXT, quality=quality)
+
+    def compress(self, data):
+        return self._compressor.process(data)
+
+    def flush(self):
+        return self._compressor.flush()
+
+    def finish(self):
+        return self._compressor.finish()
+
+
+def available_codings():
+    """Supported codings, most preferred first."""
+    return ('br', 'gzip') if brotli is not None else ('gzip',)
+
+
+@functools.lru_cache(maxsize=256)
+def negotiate(accept_encoding):
+    """The coding to use for an ``Accept-Encoding`` header value, or ``None`` for none."""
+    weights = {}
+    for part in accept_encoding.lower().split(','):
+        coding, _, params = part.partition(';')
+        weight = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                weight = float(params[2:])
+            except ValueError:
+                weight = 0.0
+        weights[coding.strip()] = weight
+    best, best_weight = None, 0.0
+    for coding in available_codings():
+        weight = weights.get(coding, weights.get('*', 0.0))
+        if weight > best_weight:
+            best, best_weight = coding, weight
+    return best
+
+
+class CompressionMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.min_size = getattr(settings, 'COMPRESSION_MIN_SIZE', 1024)
+        self.gzip_level = getattr(settings, 'COMPRESSION_GZIP_LEVEL', 5)
+        self.brotli_quality = getattr(settings, 'COMPRESSION_BROTLI_QUALITY', 4)
+
+    def encoder(self, coding):
+        if coding == 'br':
+            return BrotliEncoder(self.brotli_quality)
+        return GzipEncoder(self.gzip_level)
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if not self.compressible(response):
+            return response
+        # Whatever the outcome, caches must key this URL's responses on the header
+        patch_vary_headers(response, ['Accept-Encoding'])
+        coding = negotiate(request.headers.get('Accept-Encoding', ''))
+        if coding is None:
+            return response
+
+        if response.streaming:
+            if response.has_header('Content-Length') and int(response['Content-Length']) < self.min_size:
+                return response
+            encoder = self.encoder(coding)
+            if response.is_async:
+                response.streaming_content = self.compress_async(encoder, response.streaming_content)
+            else:
+                response.streaming_content = self.compress_stream(encoder, response.streaming_content)
+            del response['Content-Length']
+        else:
+            if len(response.content) < self.min_size:
+                return response
+            encoder = self.encoder(coding)
+            compressed = encoder.compress(response.content) + encoder.finish()
+            if len(compressed) >= len(response.content):
+                return response
+            response.content = compressed
+            response['Content-Length'] = str(len(compressed))
+
+        response['Content-Encoding'] = coding
+        # The representation changed, so a strong validator no longer matches it byte for byte
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response['ETag'] = 'W/' + etag
+        return response
+
+    def compressible(self, response):
+        if response.status_code < 200 or response.status_code in (204, 206, 304):
+            return False
+        if isinstance(response, FileResponse) or response.has_header('Content-Encoding'):
+            return False
+        if NO_TRANSFORM.search(response.get('Cache-Control', '')):
+            return False
+        return bool(COMPRESSIBLE_TYPES.match(response.get('Content-Type', '')))
+
+    @staticmethod
+    def compress_stream(encoder, chunks):
+        for chunk in chunks:
+            data = encoder.compress(chunk) + encoder.flush()
+            if data:
+                yield data
+        yield encoder.finish()
+
+    @staticmethod
+    async def compress_async(encoder, chunks):
+        async for chunk in chunks:
+            data = encoder.compress(chunk) + encoder.flush()
+            if data:
+                yield data
+        yield encoder.finish()
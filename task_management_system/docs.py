@@ -0,0 +1,138 @@
+"""
+OpenAPI documentation without the schema generator in every worker.
+
+``drf_spectacular.utils.extend_schema`` builds a schema subclass as soon as
+it decorates a view, which imports the whole generator (``openapi``,
+``plumbing``, yaml, every contrib extension). The ``extend_schema`` here only
+records its arguments; ``apply_deferred()`` replays them, in the original
+order, with the real decorator right before a schema is generated (see
+``task_management_system.openapi.SchemaGenerator``). ``OpenApiParameter``,
+``OpenApiExample`` and ``OpenApiTypes`` are plain data and re-exported as is.
+For the same reason ``DEFAULT_SCHEMA_CLASS`` is a placeholder (routers touch
+every view's ``schema`` when building URLs) that ``apply_deferred()`` swaps
+for drf-spectacular's ``AutoSchema``.
+
+The schema itself is generated once, at image build time, into
+``OPENAPI_SCHEMA_FILE``. ``openapi_schema`` serves that file, gzipped when
+the client accepts it, with an ETag and ``Cache-Control``. Without the file
+(local development) it is generated on the first request. The Swagger and
+ReDoc pages are only imported when first requested.
+"""
+import gzip
+import hashlib
+import logging
+import re
+import threading
+
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.utils.http import parse_etags
+from django.utils.module_loading import import_string
+from django.views.decorators.http import require_safe
+from drf_spectacular.types import OpenApiTypes
+from drf_spectacular.utils import OpenApiExample, OpenApiParameter
+from rest_framework.schemas.inspectors import ViewInspector
+from rest_framework.settings import api_settings
+
+__all__ = ['OpenApiExample', 'OpenApiParameter', 'OpenApiTypes', 'extend_schema']
+
+logger = logging.getLogger(__name__)
+
+SCHEMA_CONTENT_TYPE = 'application/vnd.oai.openapi+json'
+ACCEPTS_GZIP = re.compile(r'\bgzip\b')
+
+_pending = []
+_lock = threading.Lock()
+
+
+def extend_schema(*args, **kwargs):
+    """``drf_spectacular.utils.extend_schema``, applied when a schema is generated."""
+    def decorator(f):
+        _pending.append((f, args, kwargs))
+        return f
+    return decorator
+
+
+class DeferredSchema(ViewInspector):
+    """``DEFAULT_SCHEMA_CLASS`` until ``apply_deferred()`` runs; never used to generate anything."""
+
+
+def apply_deferred():
+    """Apply the annotations recorded so far; views imported later are picked up by the next call."""
+    from drf_spectacular.openapi import AutoSchema
+    from drf_spectacular.utils import extend_schema as annotate
+
+    with _lock:
+        if api_settings.DEFAULT_SCHEMA_CLASS is DeferredSchema:
+            api_settings.DEFAULT_SCHEMA_CLASS = AutoSchema
+        while _pending:
+            f, args, kwargs = _pending.pop(0)
+            annotate(*args, **kwargs)(f)
+
+
+def generate_schema():
+    """The OpenAPI document of the public URLconf (which includes every tenant endpoint), as JSON."""
+    from drf_spectacular.renderers import OpenApiJsonRenderer
+    from drf_spectacular.settings import spectacular_settings
+
+    generator = spectacular_settings.DEFAULT_GENERATOR_CLASS(urlconf=settings.PUBLIC_SCHEMA_URLCONF)
+    return OpenApiJsonRenderer().render(generator.get_schema(request=None, public=True), renderer_context={})
+
+
+_schema = None
+_schema_lock = threading.Lock()
+
+
+def _load_schema():
+    global _schema
+    if _schema is None:
+        with _schema_lock:
+            if _schema is None:
+                path = settings.OPENAPI_SCHEMA_FILE
+                try:
+                    with open(path, 'rb') as f:
+                        body = f.read()
+                except FileNotFoundError:
+                    logger.warning('%s not found; generating the OpenAPI schema in-process', path)
+                    body = generate_schema()
+                try:
+                    with open(f'{path}.gz', 'rb') as f:
+                        compressed = f.read()
+                except FileNotFoundError:
+                    compressed = gzip.compress(body, 9)
+                digest = hashlib.sha256(body).hexdigest()[:32]
+                _schema = {
+                    'identity': (body, f'"{digest}"'),
+                    'gzip': (compressed, f'"{digest}-gzip"'),
+                }
+    return _schema
+
+
+@require_safe
+def openapi_schema(request):
+    encoding = 'gzip' if ACCEPTS_GZIP.search(request.headers.get('Accept-Encoding', '')) else 'identity'
+    body, etag = _load_schema()[encoding]
+    if etag in parse_etags(request.headers.get('If-None-Match', '')):
+        response = HttpResponseNotModified()
+    else:
+        response = HttpResponse(body, content_type=SCHEMA_CONTENT_TYPE)
+        if encoding == 'gzip':
+            response['Content-Encoding'] = 'gzip'
+    response['ETag'] = etag
+    patch_vary_headers(response, ['Accept-Encoding'])
+    patch_cache_control(response, public=True, max_age=settings.OPENAPI_SCHEMA_MAX_AGE)
+    return response
+
+
+def lazy_view(dotted_path, **initkwargs):
+    """The class-based view at ``dotted_path``, imported on its first request."""
+    view = None
+
+    def dispatch(request, *args, **kwargs):
+        nonlocal view
+        if view is None:
+            view = import_string(dotted_path).as_view(**initkwargs)
+        return view(request, *args, **kwargs)
+
+    return dispatch
@@ -0,0 +1,298 @@
+"""
+Request instrumentation for the task management system.
+
+``InstrumentationMiddleware`` records, for every request, the resolved view,
+tenant schema, status code, wall time, SQL query count and SQL time into
+in-process histograms that are exposed in Prometheus text format on
+``/metrics``. The same middleware answers the cheap ``/api/health/`` probes
+before tenant resolution, so Kubernetes probes never touch the database
+unless they ask for readiness.
+
+Metrics are kept per worker process; scrape every pod (or every worker port)
+and aggregate in Prometheus.
+"""
+import heapq
+import hmac
+import logging
+import threading
+import time
+from bisect import bisect_left
+
+from django.conf import settings
+from django.db import connection
+from django.http import HttpResponse, JsonResponse
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+OVERFLOW_LABEL = '__other__'
+
+
+class Histogram:
+    """
+    Fixed-bucket histogram keyed by a tuple of label values.
+
+    The number of distinct label sets is capped; anything beyond the cap is
+    folded into a single overflow series so memory stays bounded no matter
+    how many tenants or views show up.
+    """
+    def __init__(self, name, documentation, labelnames, buckets, max_series):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self.max_series = max_series
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, labels, value):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                if len(self._series) >= self.max_series:
+                    labels = (OVERFLOW_LABEL,) * len(self.labelnames)
+                    series = self._series.get(labels)
+                if series is None:
+                    # Per-bucket counts plus a trailing +Inf bucket, then sum and count.
+                    series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def collect(self):
+        with self._lock:
+            snapshot = [(labels, list(s[0]), s[1], s[2]) for labels, s in self._series.items()]
+        lines = [
+            f'# HELP {self.name} {self.documentation}',
+            f'# TYPE {self.name} histogram',
+        ]
+        for labels, counts, total, count in snapshot:
+            base = _format_labels(self.labelnames, labels)
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                lines.append(f'{self.name}_bucket{{{base},le="{bound}"}} {cumulative}')
+            lines.append(f'{self.name}_bucket{{{base},le="+Inf"}} {count}')
+            lines.append(f'{self.name}_sum{{{base}}} {total}')
+            lines.append(f'{self.name}_count{{{base}}} {count}')
+        return lines
+
+
+class Counter:
+    """Monotonic counter keyed by a tuple of label values, capped like ``Histogram``."""
+    def __init__(self, name, documentation, labelnames, max_series):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.max_series = max_series
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, labels, amount=1):
+        with self._lock:
+            if labels not in self._values and len(self._values) >= self.max_series:
+                labels = (OVERFLOW_LABEL,) * len(self.labelnames)
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def collect(self):
+        with self._lock:
+            snapshot = list(self._values.items())
+        lines = [
+            f'# HELP {self.name} {self.documentation}',
+            f'# TYPE {self.name} counter',
+        ]
+        for labels, value in snapshot:
+            lines.append(f'{self.name}{{{_format_labels(self.labelnames, labels)}}} {value}')
+        return lines
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(names, values):
+    return ','.join(f'{name}="{_escape(value)}"' for name, value in zip(names, values))
+
+
+class MetricsRegistry:
+    """Holds the request metrics of this worker process."""
+    def __init__(self, max_series=2000):
+        labels = ('view', 'schema')
+        self.requests = Counter(
+            'http_requests_total', 'Requests by view, tenant schema and status code.',
+            labels + ('status',), max_series,
+        )
+        self.latency = Histogram(
+            'http_request_duration_seconds', 'Wall time spent serving the request.',
+            labels, LATENCY_BUCKETS, max_series,
+        )
+        self.query_count = Histogram(
+            'http_request_sql_queries', 'Number of SQL queries executed per request.',
+            labels, QUERY_COUNT_BUCKETS, max_series,
+        )
+        self.query_time = Histogram(
+            'http_request_sql_duration_seconds', 'Time spent in SQL per request.',
+            labels, LATENCY_BUCKETS, max_series,
+        )
+        self.extra = []
+
+    def register(self, metric):
+        """Expose an additional ``Counter`` or ``Histogram`` on ``/metrics``."""
+        self.extra.append(metric)
+        return metric
+
+    def observe_request(self, view, schema, status, duration, queries, sql_time):
+        labels = (view, schema)
+        self.requests.inc(labels + (str(status),))
+        self.latency.observe(labels, duration)
+        self.query_count.observe(labels, queries)
+        self.query_time.observe(labels, sql_time)
+
+    def render(self):
+        lines = []
+        for metric in (self.requests, self.latency, self.query_count, self.query_time, *self.extra):
+            lines.extend(metric.collect())
+        return '\n'.join(lines) + '\n'
+
+
+registry = MetricsRegistry(max_series=getattr(settings, 'METRICS_MAX_SERIES', 2000))
+
+
+class QueryRecorder:
+    """
+    ``connection.execute_wrapper`` hook counting and timing SQL queries.
+
+    Only the ``keep_slowest`` slowest statements are retained (in a min-heap),
+    so the per-query overhead is constant. With ``timeline=True`` every query
+    is kept together with its start offset, which is what the profiler uses.
+    """
+    def __init__(self, keep_slowest=0, timeline=False):
+        self.count = 0
+        self.duration = 0.0
+        self.keep_slowest = keep_slowest
+        self.slowest = []
+        self.timeline = [] if timeline else None
+        self.started = time.perf_counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - start
+            self.count += 1
+            self.duration += elapsed
+            if self.keep_slowest:
+                entry = (elapsed, self.count, sql)
+                if len(self.slowest) < self.keep_slowest:
+                    heapq.heappush(self.slowest, entry)
+                elif elapsed > self.slowest[0][0]:
+                    heapq.heapreplace(self.slowest, entry)
+            if self.timeline is not None:
+                self.timeline.append({
+                    'offset_ms': round((start - self.started) * 1000, 3),
+                    'duration_ms': round(elapsed * 1000, 3),
+                    'sql': sql,
+                    'many': many,
+                })
+
+    def worst_queries(self):
+        return [
+            {'duration_ms': round(elapsed * 1000, 3), 'sql': sql}
+            for elapsed, _, sql in sorted(self.slowest, reverse=True)
+        ]
+
+
+def _view_label(request):
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return '<unresolved>'
+    # view_name falls back to the view's dotted path for unnamed routes; route covers the rest
+    return match.view_name or match.route or '<unnamed>'
+
+
+def _schema_label(request):
+    tenant = getattr(request, 'tenant', None)
+    if tenant is not None:
+        return tenant.schema_name
+    return getattr(connection, 'schema_name', '') or '<none>'
+
+
+def health(request):
+    """Liveness probe: the process is up and serving requests."""
+    return JsonResponse({'status': 'ok'})
+
+
+def readiness(request):
+    """Readiness probe: the process can reach the database."""
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT 1')
+    except Exception:  # any driver error means "not ready"
+        # Driver messages can name hosts and users; they go to the log, not to the caller
+        logger.exception('Readiness check failed')
+        return JsonResponse({'status': 'unavailable'}, status=503)
+    return JsonResponse({'status': 'ok'})
+
+
+def metrics(request):
+    """Prometheus scrape endpoint; closed unless ``METRICS_TOKEN`` is set and sent as a bearer token."""
+    token = getattr(settings, 'METRICS_TOKEN', '')
+    if not token or not hmac.compare_digest(
+        request.headers.get('Authorization', '').encode(), f'Bearer {token}'.encode(),
+    ):
+        return HttpResponse(status=403)
+    return HttpResponse(registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+PROBE_VIEWS = {
+    '/api/health/': health,
+    '/api/health/ready/': readiness,
+    '/metrics': metrics,
+}
+
+
+class InstrumentationMiddleware:
+    """
+    Outermost middleware: answers probes and records per-request metrics.
+
+    It has to sit above ``TenantMainMiddleware`` so that probes skip the
+    hostname-to-tenant lookup and so that the tenant lookup query itself is
+    counted in the request's SQL totals.
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.enabled = getattr(settings, 'METRICS_ENABLED', True)
+        self.slow_threshold = getattr(settings, 'SLOW_REQUEST_THRESHOLD_MS', 0) / 1000
+        self.keep_slowest = getattr(settings, 'SLOW_REQUEST_TOP_QUERIES', 5) if self.slow_threshold else 0
+
+    def __call__(self, request):
+        probe = PROBE_VIEWS.get(request.path_info)
+        if probe is not None:
+            return probe(request)
+        if not self.enabled:
+            return self.get_response(request)
+
+        recorder = QueryRecorder(keep_slowest=self.keep_slowest)
+        start = time.perf_counter()
+        with connection.execute_wrapper(recorder):
+            response = self.get_response(request)
+        duration = time.perf_counter() - start
+
+        view = _view_label(request)
+        schema = _schema_label(request)
+        registry.observe_request(
+            view, schema, response.status_code, duration, recorder.count, recorder.duration,
+        )
+        if self.slow_threshold and duration >= self.slow_threshold:
+            logger.warning(
+                'Slow request %s %s view=%s schema=%s status=%s duration_ms=%.1f '
+                'queries=%d sql_ms=%.1f worst_queries=%s',
+                request.method, request.path, view, schema, response.status_code,
+                duration * 1000, recorder.count, recorder.duration * 1000,
+                recorder.worst_queries(),
+            )
+        return response
@@ -0,0 +1,18 @@
+"""
+Schema generator for ``SPECTACULAR_SETTINGS['DEFAULT_GENERATOR_CLASS']``.
+
+Only imported when a schema is generated: by ``manage.py spectacular`` at
+image build time, the ``check --deploy`` schema check, or the development
+fallback of ``/api/schema/``.
+"""
+from drf_spectacular.generators import SchemaGenerator as BaseSchemaGenerator
+
+from .docs import apply_deferred
+
+
+class SchemaGenerator(BaseSchemaGenerator):
+    def _initialise_endpoints(self):
+        # Enumerating the endpoints imports the views, which records their
+        # annotations; they must be applied before the views are inspected.
+        super()._initialise_endpoints()
+        apply_deferred()
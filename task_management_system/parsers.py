@@ -0,0 +1,27 @@
+"""
+JSON parsing with orjson; a drop-in for DRF's ``JSONParser``.
+"""
+import codecs
+
+import orjson
+from django.conf import settings
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+
+from .renderers import ORJSONRenderer
+
+
+class ORJSONParser(JSONParser):
+    renderer_class = ORJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get('encoding', settings.DEFAULT_CHARSET)
+        try:
+            body = stream.read()
+            # orjson reads UTF-8 bytes directly; other charsets are decoded first
+            if codecs.lookup(encoding).name != 'utf-8':
+                body = body.decode(encoding)
+            return orjson.loads(body)
+        except ValueError as exc:
+            raise ParseError('JSON parse error - %s' % str(exc))
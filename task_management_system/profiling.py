@@ -0,0 +1,185 @@
+"""
+On-demand profiling of single API requests.
+
+With ``PROFILING_ENABLED``, an admin (``role == 'admin'``) sends
+``X-Profile: inline`` (or ``disk``), or adds ``?_profile=inline`` to the
+query string, on any view that includes ``ProfilingMixin``. That one request then runs under cProfile and a stack
+sampler while its SQL is recorded. The report contains the top functions by
+cumulative time, collapsed stacks (feed them to ``flamegraph.pl`` or
+speedscope) and the SQL timeline. It either replaces the response body or
+is written to ``PROFILING_OUTPUT_DIR``.
+
+Requests without the flag only pay for one header and one query parameter
+lookup.
+"""
+import cProfile
+import io
+import json
+import os
+import pstats
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connection
+from django.utils import timezone
+from rest_framework.response import Response
+
+from .instrumentation import QueryRecorder
+
+PROFILE_HEADER = 'X-Profile'
+PROFILE_QUERY_PARAM = '_profile'
+PROFILE_MODES = ('inline', 'disk')
+
+
+class StackSampler(threading.Thread):
+    """Samples the stack of one thread at a fixed interval into collapsed-stack counts."""
+    def __init__(self, thread_id, interval):
+        super().__init__(daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f'{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})')
+                frame = frame.f_back
+            self.stacks[';'.join(reversed(stack))] += 1
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+    def collapsed(self):
+        return [f'{stack} {count}' for stack, count in self.stacks.most_common()]
+
+
+class RequestProfile:
+    """cProfile, stack sampling and SQL recording for the duration of one request."""
+    def __init__(self, mode):
+        self.mode = mode
+        self.profiler = cProfile.Profile()
+        self.sampler = StackSampler(
+            threading.get_ident(), getattr(settings, 'PROFILING_SAMPLE_INTERVAL', 0.001),
+        )
+        self.queries = QueryRecorder(timeline=True)
+        self._stack = ExitStack()
+        self.started = None
+        self.duration = None
+
+    def start(self):
+        self._stack.enter_context(connection.execute_wrapper(self.queries))
+        self.started = time.perf_counter()
+        self.queries.started = self.started
+        self.sampler.start()
+        self.profiler.enable()
+
+    def stop(self):
+        self.profiler.disable()
+        self.duration = time.perf_counter() - self.started
+        self.sampler.stop()
+        self._stack.close()
+
+    def stats_text(self, limit):
+        stream = io.StringIO()
+        stats = pstats.Stats(self.profiler, stream=stream)
+        stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(limit)
+        return stream.getvalue()
+
+    def report(self, request, response):
+        return {
+            'method': request.method,
+            'path': request.get_full_path(),
+            'status_code': response.status_code,
+            'duration_ms': round(self.duration * 1000, 3),
+            'sql': {
+                'count': self.queries.count,
+                'duration_ms': round(self.queries.duration * 1000, 3),
+                'timeline': self.queries.timeline,
+            },
+            'profile': self.stats_text(getattr(settings, 'PROFILING_STATS_LIMIT', 50)),
+            'collapsed_stacks': self.sampler.collapsed(),
+        }
+
+    def save(self, report, view_name):
+        directory = getattr(settings, 'PROFILING_OUTPUT_DIR', os.path.join(settings.BASE_DIR, 'profiles'))
+        os.makedirs(directory, exist_ok=True)
+        basename = f'{timezone.now():%Y%m%dT%H%M%S%f}-{view_name}'
+        self.profiler.dump_stats(os.path.join(directory, f'{basename}.prof'))
+        with open(os.path.join(directory, f'{basename}.json'), 'w') as handle:
+            json.dump(report, handle, indent=2)
+        with open(os.path.join(directory, f'{basename}.folded'), 'w') as handle:
+            handle.write('\n'.join(report['collapsed_stacks']))
+        return basename
+
+
+def requested_profile_mode(request):
+    """Return the requested profile mode, or ``None`` when profiling was not asked for."""
+    mode = request.headers.get(PROFILE_HEADER) or request.GET.get(PROFILE_QUERY_PARAM)
+    if not mode:
+        return None
+    mode = mode.lower()
+    return mode if mode in PROFILE_MODES else 'inline'
+
+
+class ProfilingMixin:
+    """
+    Lets admins profile a single request to a DRF view.
+
+    Profiling starts at the end of ``initial()``, once DRF has authenticated
+    the user and checked permissions and throttles.
+    It stops in ``finalize_response()`` after the response has been rendered,
+    so serialization and rendering are both included. An exception that DRF
+    does not turn into a response skips ``finalize_response()``; ``dispatch()``
+    then stops the profile on the way out, so the profiler, sampler thread and
+    SQL wrapper never outlive the request.
+    """
+    def dispatch(self, request, *args, **kwargs):
+        self._request_profile = None
+        try:
+            return super().dispatch(request, *args, **kwargs)
+        finally:
+            profile = self._request_profile
+            if profile is not None:
+                self._request_profile = None
+                profile.stop()
+
+    def initial(self, request, *args, **kwargs):
+        self._request_profile = None
+        super().initial(request, *args, **kwargs)
+        if getattr(settings, 'PROFILING_ENABLED', False):
+            mode = requested_profile_mode(request)
+            if mode and getattr(request.user, 'role', None) == 'admin':
+                self._request_profile = RequestProfile(mode)
+                self._request_profile.start()
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        profile = getattr(self, '_request_profile', None)
+        if profile is None:
+            return response
+
+        self._request_profile = None
+        try:
+            if hasattr(response, 'render') and not response.is_rendered:
+                response.render()
+        finally:
+            profile.stop()
+
+        report = profile.report(request, response)
+        if profile.mode == 'disk':
+            response['X-Profile-Report'] = profile.save(report, self.__class__.__name__)
+            return response
+
+        inline = Response(report, status=response.status_code)
+        return super().finalize_response(request, inline, *args, **kwargs)
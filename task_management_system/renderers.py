@@ -0,0 +1,31 @@
+"""
+JSON rendering with orjson.
+
+``ORJSONRenderer`` produces the same documents as DRF's ``JSONRenderer``
+(UTF-8, compact, ``Z`` for UTC datetimes, U+2028/U+2029 escaped) several
+times faster. Types orjson does not know natively (``Decimal``, lazy
+translations, querysets, ...) go through DRF's ``JSONEncoder``. orjson only
+indents by two spaces, so any requested indent (``; indent=4``, the
+browsable API) gets two.
+"""
+import orjson
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+_fallback = JSONEncoder().default
+
+OPTIONS = orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS
+
+
+class ORJSONRenderer(JSONRenderer):
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        options = OPTIONS
+        if self.get_indent(accepted_media_type, renderer_context or {}):
+            options |= orjson.OPT_INDENT_2
+        ret = orjson.dumps(data, default=_fallback, option=options)
+        # Keep the output a strict JavaScript subset, like JSONRenderer
+        if b'\xe2\x80\xa8' in ret or b'\xe2\x80\xa9' in ret:
+            ret = ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+        return ret
@@ -0,0 +1,29 @@
+"""
+Field conversions for representations built straight from ``.values()`` rows.
+
+List endpoints render many rows of a few fixed shapes, so they skip
+``ModelSerializer`` (field objects, ``to_representation`` dispatch, one
+serializer per nested object) and build plain dicts. These helpers produce
+exactly what the corresponding DRF fields would, so both paths return
+identical JSON.
+"""
+from django.core.files.storage import default_storage
+from django.utils import timezone
+
+
+def datetime_value(value):
+    """Like ``serializers.DateTimeField``: ISO 8601 in the current time zone, ``Z`` for UTC."""
+    if value is None:
+        return None
+    value = timezone.localtime(value).isoformat()
+    if value.endswith('+00:00'):
+        value = value[:-6] + 'Z'
+    return value
+
+
+def file_url(name, request=None, storage=default_storage):
+    """Like ``serializers.FileField``: the file's URL, absolute when there is a request."""
+    if not name:
+        return None
+    url = storage.url(name)
+    return request.build_absolute_uri(url) if request is not None else url
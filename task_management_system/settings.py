@@ -11,6 +11,7 @@ https://docs.djangoproject.com/en/5.1/ref/settings/
 """
 
 import os
+from datetime import timedelta
 from pathlib import Path
 
 from django.db import connection
@@ -46,10 +47,15 @@ SHARED_APPS = (
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'rest_framework',
     'corsheaders',
     'users',
     'tasks',
+    'reminders',
+    'cleanup',
+    'webhooks',
+    'guardian',
     'drf_spectacular',
 )
 
@@ -64,14 +70,21 @@ TENANT_APPS = (
     'corsheaders',
     'users',
     'tasks',
+    'guardian',
     'drf_spectacular',
 )
 
 INSTALLED_APPS = list(SHARED_APPS) + [app for app in TENANT_APPS if app not in SHARED_APPS]
 
 MIDDLEWARE = [
-    'django_tenants.middleware.main.TenantMainMiddleware',
+    'task_management_system.instrumentation.InstrumentationMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    # Static files are answered here, before the tenant lookup and throttling
+    'whitenoise.middleware.WhiteNoiseMiddleware',
+    'task_management_system.compression.CompressionMiddleware',
+    'tenants.domains.CachedTenantMiddleware',
+    'task_management_system.throttling.RateLimitHeadersMiddleware',
+    'tasks.activity.ActivityLogMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -153,6 +166,12 @@ USE_TZ = True
 
 STATIC_URL = 'static/'
 STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
+# collectstatic writes content-hashed copies plus .gz/.br versions; WhiteNoise serves
+# the hashed ones with a one-year immutable Cache-Control and picks the encoding per request
+STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {'BACKEND': 'whitenoise.storage.CompressedManifestStaticFilesStorage'},
+}
 MEDIA_URL = 'media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
@@ -164,6 +183,13 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # Custom user model
 AUTH_USER_MODEL = 'users.CustomUser'
 
+# Object-level permissions (django-guardian) are used to share single tasks
+AUTHENTICATION_BACKENDS = (
+    'django.contrib.auth.backends.ModelBackend',
+    'guardian.backends.ObjectPermissionBackend',
+)
+ANONYMOUS_USER_NAME = None
+
 # REST Framework settings
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
@@ -172,11 +198,98 @@ REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
     ),
-    'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
+    'DEFAULT_RENDERER_CLASSES': (
+        'task_management_system.renderers.ORJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
+    'DEFAULT_PARSER_CLASSES': (
+        'task_management_system.parsers.ORJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ),
+    # drf-spectacular's AutoSchema once a schema is generated (see task_management_system.docs)
+    'DEFAULT_SCHEMA_CLASS': 'task_management_system.docs.DeferredSchema',
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 10,
+    # User first: a request over its user's limit takes no token from the shared tenant bucket
+    'DEFAULT_THROTTLE_CLASSES': (
+        'task_management_system.throttling.UserRateThrottle',
+        'task_management_system.throttling.TenantRateThrottle',
+    ),
+    # Hops of trusted proxies in X-Forwarded-For, used to key anonymous clients
+    'NUM_PROXIES': int(os.environ['NUM_PROXIES']) if os.getenv('NUM_PROXIES') else None,
+}
+
+# Shared store for throttling buckets (and caches); unset keeps them in process memory
+REDIS_URL = os.getenv('REDIS_URL', '')
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': REDIS_URL,
+        'KEY_PREFIX': 'tms',
+    } if REDIS_URL else {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+}
+
+# Two-level cache (`task_management_system.cache`): per-process LRU in front of CACHES[CACHE_SHARED_ALIAS]
+CACHE_SHARED_ALIAS = 'default'
+CACHE_TIMEOUT = int(os.getenv('CACHE_TIMEOUT', '300'))
+# Also the longest another process may serve an entry after it was invalidated
+CACHE_LOCAL_TTL = int(os.getenv('CACHE_LOCAL_TTL', '5'))
+CACHE_LOCAL_MAX_ENTRIES = int(os.getenv('CACHE_LOCAL_MAX_ENTRIES', '10000'))
+
+# Token-bucket throttling (`task_management_system.throttling`), by request class:
+# reads, writes, multipart uploads and bulk endpoints. A missing rate disables that bucket.
+THROTTLE_ENABLED = os.getenv('THROTTLE_ENABLED', 'True') == 'True'
+THROTTLE_TENANT_RATES = {
+    'read': os.getenv('THROTTLE_TENANT_READ_RATE', '6000/min'),
+    'write': os.getenv('THROTTLE_TENANT_WRITE_RATE', '1500/min'),
+    'upload': os.getenv('THROTTLE_TENANT_UPLOAD_RATE', '300/min'),
+    'bulk': os.getenv('THROTTLE_TENANT_BULK_RATE', '60/min'),
+}
+THROTTLE_USER_RATES = {
+    'admin': {'read': '1200/min', 'write': '300/min', 'upload': '60/min', 'bulk': '20/min'},
+    'manager': {'read': '900/min', 'write': '240/min', 'upload': '60/min', 'bulk': '10/min'},
+    'employee': {'read': '600/min', 'write': '120/min', 'upload': '30/min', 'bulk': '5/min'},
+    'anonymous': {'read': '60/min', 'write': '20/min', 'upload': '5/min', 'bulk': '1/min'},
 }
 
+# Number of latest comments/attachments embedded in each task response
+TASK_THREAD_PREVIEW_SIZE = 3
+
+# Done task trees older than this are moved to the archive tables by `archive_tasks`
+TASK_ARCHIVE_AFTER_DAYS = int(os.getenv('TASK_ARCHIVE_AFTER_DAYS', '180'))
+
+# Board columns whose longest rank is longer than this are compacted by `rebalance_task_ranks`
+TASK_RANK_REBALANCE_LENGTH = int(os.getenv('TASK_RANK_REBALANCE_LENGTH', '12'))
+
+# Task analytics (`/api/tasks/analytics/`): weeks covered by default and at most, and how the
+# per-process column snapshots of each tenant are kept (see `tasks.analytics`)
+ANALYTICS_DEFAULT_WEEKS = int(os.getenv('ANALYTICS_DEFAULT_WEEKS', '12'))
+ANALYTICS_MAX_WEEKS = 104
+ANALYTICS_REFRESH_INTERVAL = int(os.getenv('ANALYTICS_REFRESH_INTERVAL', '30'))
+ANALYTICS_REFRESH_OVERLAP = int(os.getenv('ANALYTICS_REFRESH_OVERLAP', '60'))
+# Seconds between full re-reads, which pick up rows that committed later than the overlap
+ANALYTICS_FULL_REFRESH_INTERVAL = int(os.getenv('ANALYTICS_FULL_REFRESH_INTERVAL', '900'))
+ANALYTICS_MAX_TENANTS = int(os.getenv('ANALYTICS_MAX_TENANTS', '16'))
+ANALYTICS_CHUNK_SIZE = 10000
+
+# Result cap of the user typeahead (`/api/users/lookup/`)
+USER_LOOKUP_DEFAULT_LIMIT = 10
+USER_LOOKUP_MAX_LIMIT = 25
+
+# Bulk user provisioning (`/api/users/provision/`, `provision_users`). Hashing processes are
+# fixed rather than one per CPU, which is the host's core count inside a container
+USER_PROVISION_WORKERS = int(os.getenv('USER_PROVISION_WORKERS', '2'))
+USER_PROVISION_CHUNK_SIZE = int(os.getenv('USER_PROVISION_CHUNK_SIZE', '500'))
+USER_PROVISION_MAX_ROWS = int(os.getenv('USER_PROVISION_MAX_ROWS', '10000'))
+# Users with passwords per API request, which are hashed while the request waits; invites are not limited
+USER_PROVISION_MAX_PASSWORDS = int(os.getenv('USER_PROVISION_MAX_PASSWORDS', '200'))
+# Invite link with `{uid}` and `{token}` placeholders, e.g. https://app.example.com/invite?uid={uid}&token={token}
+USER_INVITE_URL = os.getenv('USER_INVITE_URL', '')
+
 # CORS settings
 CORS_ALLOWED_ORIGINS = [
     "http://localhost:3000",
@@ -194,11 +307,24 @@ TENANT_DOMAIN_MODEL = "tenants.Domain"
 PUBLIC_SCHEMA_NAME = 'public'
 PUBLIC_SCHEMA_URLCONF = 'task_management_system.urls_public'
 
+# Seconds a hostname -> tenant lookup is cached by `CachedTenantMiddleware`
+TENANT_CACHE_TIMEOUT = int(os.getenv('TENANT_CACHE_TIMEOUT', '300'))
+
+# OpenAPI schema generated at image build time (see the Dockerfile) and served by /api/schema/;
+# without the file it is generated on the first request
+OPENAPI_SCHEMA_FILE = os.getenv('OPENAPI_SCHEMA_FILE', os.path.join(STATIC_ROOT, 'openapi.json'))
+OPENAPI_SCHEMA_MAX_AGE = int(os.getenv('OPENAPI_SCHEMA_MAX_AGE', '3600'))
+
+# Most sub-requests accepted by /api/batch/ (`task_management_system.batch`)
+BATCH_MAX_REQUESTS = int(os.getenv('BATCH_MAX_REQUESTS', '20'))
+
 SPECTACULAR_SETTINGS = {
     'TITLE': 'Task Management System API',
     'DESCRIPTION': 'API documentation for the Multi-Tenant Task Management System',
     'VERSION': '1.0.0',
     'SERVE_INCLUDE_SCHEMA': False,
+    # Applies the annotations that `task_management_system.docs` defers until generation
+    'DEFAULT_GENERATOR_CLASS': 'task_management_system.openapi.SchemaGenerator',
     'COMPONENT_SPLIT_REQUEST': True,
     'SWAGGER_UI_SETTINGS': {
         'deepLinking': True,
@@ -215,6 +341,8 @@ SPECTACULAR_SETTINGS = {
         {'name': 'Tasks', 'description': 'Task management endpoints'},
         {'name': 'Comments', 'description': 'Task comment endpoints'},
         {'name': 'Attachments', 'description': 'Task attachment endpoints'},
+        {'name': 'Batch', 'description': 'Several API requests in one round trip'},
+        {'name': 'Webhooks', 'description': 'Webhook subscription endpoints'},
     ],
     'TAG_DESCRIPTIONS': {
         'Authentication': 'Endpoints for obtaining and refreshing JWT tokens',
@@ -223,5 +351,90 @@ SPECTACULAR_SETTINGS = {
         'Tasks': 'Create, update, and manage tasks',
         'Comments': 'Add and manage comments on tasks',
         'Attachments': 'Upload and manage task attachments',
+        'Batch': 'Run several API requests in one round trip, optionally in one transaction',
+        'Webhooks': 'Subscribe endpoints to task, comment and attachment events',
+    },
+}
+
+# Response compression (`task_management_system.compression`): brotli or gzip as negotiated
+COMPRESSION_MIN_SIZE = int(os.getenv('COMPRESSION_MIN_SIZE', '1024'))
+COMPRESSION_BROTLI_QUALITY = int(os.getenv('COMPRESSION_BROTLI_QUALITY', '4'))
+COMPRESSION_GZIP_LEVEL = int(os.getenv('COMPRESSION_GZIP_LEVEL', '5'))
+
+# Instrumentation settings
+METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'True') == 'True'
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
+METRICS_MAX_SERIES = int(os.getenv('METRICS_MAX_SERIES', '2000'))
+# Requests slower than this are logged with their worst queries; 0 disables the log
+SLOW_REQUEST_THRESHOLD_MS = int(os.getenv('SLOW_REQUEST_THRESHOLD_MS', '0'))
+SLOW_REQUEST_TOP_QUERIES = 5
+
+# On-demand profiling (admins send `X-Profile: inline|disk` or `?_profile=`); off unless enabled
+PROFILING_ENABLED = os.getenv('PROFILING_ENABLED', 'False') == 'True'
+PROFILING_OUTPUT_DIR = os.getenv('PROFILING_OUTPUT_DIR', os.path.join(BASE_DIR, 'profiles'))
+PROFILING_SAMPLE_INTERVAL = 0.001
+PROFILING_STATS_LIMIT = 50
+
+# Due-date reminders (`python manage.py run_reminder_scheduler`)
+REMINDER_LEAD_TIME = timedelta(minutes=int(os.getenv('REMINDER_LEAD_MINUTES', '60')))
+REMINDER_SINK = os.getenv('REMINDER_SINK', 'reminders.sinks.LogSink')
+# FileSink needs `path`, e.g. REMINDER_SINK=reminders.sinks.FileSink REMINDER_FILE_PATH=reminders.jsonl
+REMINDER_SINK_OPTIONS = {'path': os.environ['REMINDER_FILE_PATH']} if os.getenv('REMINDER_FILE_PATH') else {}
+REMINDER_BATCH_SIZE = int(os.getenv('REMINDER_BATCH_SIZE', '500'))
+# Upper bound on how late a newly scheduled, earlier reminder can be noticed
+REMINDER_MAX_SLEEP = int(os.getenv('REMINDER_MAX_SLEEP', '60'))
+
+# Background deletion of attachment files (`python manage.py run_file_cleanup`)
+FILE_CLEANUP_BATCH_SIZE = int(os.getenv('FILE_CLEANUP_BATCH_SIZE', '200'))
+FILE_CLEANUP_POLL_INTERVAL = int(os.getenv('FILE_CLEANUP_POLL_INTERVAL', '30'))
+
+# Webhook delivery of task events (`python manage.py run_webhook_worker`)
+# Events per request to one subscriber, and requests sent at once by one worker
+WEBHOOK_BATCH_SIZE = int(os.getenv('WEBHOOK_BATCH_SIZE', '100'))
+WEBHOOK_CONCURRENCY = int(os.getenv('WEBHOOK_CONCURRENCY', '8'))
+# Seconds per request
+WEBHOOK_TIMEOUT = int(os.getenv('WEBHOOK_TIMEOUT', '10'))
+# Failed batches are retried after WEBHOOK_RETRY_DELAY seconds, doubling up to 6 hours, at most WEBHOOK_MAX_ATTEMPTS times
+WEBHOOK_MAX_ATTEMPTS = int(os.getenv('WEBHOOK_MAX_ATTEMPTS', '10'))
+WEBHOOK_RETRY_DELAY = int(os.getenv('WEBHOOK_RETRY_DELAY', '30'))
+WEBHOOK_POLL_INTERVAL = int(os.getenv('WEBHOOK_POLL_INTERVAL', '5'))
+# Seconds the event types a tenant subscribes to are cached by `webhooks.events`. Off without
+# REDIS_URL: a per-process cache cannot be invalidated across workers and would drop events
+WEBHOOK_SUBSCRIPTION_CACHE_TIMEOUT = int(os.getenv('WEBHOOK_SUBSCRIPTION_CACHE_TIMEOUT', '300' if REDIS_URL else '0'))
+# Allow subscription URLs on private, loopback and link-local addresses (local development only)
+WEBHOOK_ALLOW_PRIVATE_URLS = os.getenv('WEBHOOK_ALLOW_PRIVATE_URLS', 'False') == 'True'
+
+# Cross-tenant usage reports (`/api/tenants/usage/`, `python manage.py tenant_usage`)
+USAGE_REPORT_WORKERS = int(os.getenv('USAGE_REPORT_WORKERS', '4'))
+# Cached reports younger than this are served as they are
+USAGE_REPORT_MAX_AGE = timedelta(minutes=int(os.getenv('USAGE_REPORT_MAX_AGE_MINUTES', '60')))
+USAGE_ACTIVE_DAYS = int(os.getenv('USAGE_ACTIVE_DAYS', '30'))
+USAGE_GROWTH_MONTHS = int(os.getenv('USAGE_GROWTH_MONTHS', '12'))
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'task_management_system': {
+            'handlers': ['console'],
+            'level': os.getenv('APP_LOG_LEVEL', 'INFO'),
+        },
+        'reminders': {
+            'handlers': ['console'],
+            'level': os.getenv('APP_LOG_LEVEL', 'INFO'),
+        },
+        'cleanup': {
+            'handlers': ['console'],
+            'level': os.getenv('APP_LOG_LEVEL', 'INFO'),
+        },
+        'tenants': {
+            'handlers': ['console'],
+            'level': os.getenv('APP_LOG_LEVEL', 'INFO'),
+        },
     },
 }
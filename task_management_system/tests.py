@@ -0,0 +1,395 @@
+import gzip
+import sys
+import threading
+import time
+import unittest
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.db import OperationalError, connection
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+from django_tenants.test.cases import TenantTestCase
+from django_tenants.test.client import TenantClient
+from rest_framework.response import Response
+from rest_framework.test import APIRequestFactory, force_authenticate
+from rest_framework.views import APIView
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from tasks.models import Task
+
+from . import cache, instrumentation, throttling
+from .batch import BatchSerializer, Unresolved, resolve_references
+from .compression import CompressionMiddleware, brotli, negotiate
+from .profiling import ProfilingMixin, StackSampler
+
+User = get_user_model()
+
+
+class ResolveReferencesTests(SimpleTestCase):
+    results = {
+        'task': {'status': 201, 'body': {'id': 42, 'tags': ['a', 'b'], 'owner': {'id': 7}}},
+        'broken': {'status': 400, 'body': {'title': ['This field is required.']}},
+    }
+
+    def test_a_whole_string_reference_keeps_its_type(self):
+        self.assertEqual(resolve_references('${task.id}', self.results), 42)
+        self.assertEqual(resolve_references({'parent_task': '${task.id}'}, self.results), {'parent_task': 42})
+        self.assertEqual(resolve_references(['${task.owner}'], self.results), [{'id': 7}])
+
+    def test_references_inside_strings_are_substituted(self):
+        self.assertEqual(
+            resolve_references('/api/tasks/${task.id}/comments/?user=${task.owner.id}', self.results),
+            '/api/tasks/42/comments/?user=7',
+        )
+        self.assertEqual(resolve_references('${task.tags.1}', self.results), 'b')
+
+    def test_unresolvable_references(self):
+        cases = (('${missing.id}', 400), ('${task.nope}', 400), ('${task.tags.5}', 400), ('${broken.id}', 424))
+        for value, status in cases:
+            with self.subTest(value=value), self.assertRaises(Unresolved) as raised:
+                resolve_references(value, self.results)
+            self.assertEqual(raised.exception.status, status)
+
+    @override_settings(BATCH_MAX_REQUESTS=2)
+    def test_batch_validation(self):
+        request = {'path': '/api/users/me/'}
+        self.assertFalse(BatchSerializer(data={'requests': [request] * 3}).is_valid())
+        self.assertFalse(BatchSerializer(data={'requests': [{**request, 'name': 'me'}] * 2}).is_valid())
+        self.assertFalse(BatchSerializer(data={'requests': [{'path': '/admin/'}]}).is_valid())
+        self.assertTrue(BatchSerializer(data={'requests': [request] * 2}).is_valid())
+
+
+class BatchViewTests(TenantTestCase):
+    url = '/api/batch/'
+
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user('batcher', password='x', role='employee')
+        self.other = User.objects.create_user('stranger', password='x', role='employee')
+        token = RefreshToken.for_user(self.user).access_token
+        self.client = TenantClient(self.tenant, HTTP_AUTHORIZATION=f'Bearer {token}')
+
+    def batch(self, requests, atomic=False):
+        data = {'requests': requests, 'atomic': atomic}
+        response = self.client.post(self.url, data, content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        return response.json()['responses']
+
+    def test_later_requests_use_earlier_results(self):
+        responses = self.batch([
+            {
+                'name': 'task', 'method': 'POST', 'path': '/api/tasks/',
+                'body': {'title': 'Batch', 'description': 'Made in a batch'},
+            },
+            {
+                'method': 'POST', 'path': '/api/tasks/${task.id}/add_comment/',
+                'body': {'task': '${task.id}', 'content': 'First'},
+            },
+            {'path': '/api/tasks/${task.id}/'},
+        ])
+        self.assertEqual([response['status'] for response in responses], [201, 201, 200])
+        self.assertEqual(responses[0]['name'], 'task')
+        self.assertEqual(responses[2]['body']['title'], 'Batch')
+        self.assertEqual(responses[2]['body']['comment_count'], 1)
+
+    def test_requests_that_depend_on_a_failed_one_are_not_sent(self):
+        responses = self.batch([
+            {'name': 'task', 'method': 'POST', 'path': '/api/tasks/', 'body': {}},
+            {'method': 'POST', 'path': '/api/tasks/${task.id}/add_comment/', 'body': {'content': 'Lost'}},
+            {'path': '/api/users/me/'},
+        ])
+        self.assertEqual([response['status'] for response in responses], [400, 424, 200])
+
+    def test_atomic_batches_roll_back_on_failure(self):
+        responses = self.batch([
+            {'method': 'POST', 'path': '/api/tasks/', 'body': {'title': 'Rolled back', 'description': 'Never kept'}},
+            {'path': '/api/tasks/999999999/'},
+            {'path': '/api/users/me/'},
+        ], atomic=True)
+        self.assertEqual([response['status'] for response in responses], [201, 404, 424])
+        self.assertFalse(Task.objects.filter(title='Rolled back').exists())
+
+    def test_sub_requests_keep_their_permissions(self):
+        task = Task.objects.create(title='Private', description='', created_by=self.other)
+        responses = self.batch([
+            {'path': f'/api/tasks/{task.pk}/'},
+            {'method': 'DELETE', 'path': f'/api/tasks/{task.pk}/'},
+        ])
+        self.assertEqual([response['status'] for response in responses], [404, 404])
+        self.assertTrue(Task.objects.filter(pk=task.pk).exists())
+
+    def test_unknown_paths_and_nested_batches(self):
+        responses = self.batch([
+            {'path': '/api/nothing-here/'},
+            {'method': 'POST', 'path': '/api/batch/', 'body': {'requests': [{'path': '/api/users/me/'}]}},
+        ])
+        self.assertEqual([response['status'] for response in responses], [404, 400])
+
+    def test_the_batch_needs_authentication(self):
+        response = TenantClient(self.tenant).post(
+            self.url, {'requests': [{'path': '/api/users/me/'}]}, content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 401)
+
+
+class NegotiateTests(SimpleTestCase):
+    def test_gzip(self):
+        self.assertEqual(negotiate('gzip'), 'gzip')
+        self.assertEqual(negotiate('deflate, gzip;q=0.8'), 'gzip')
+
+    def test_no_acceptable_coding(self):
+        for header in ('', 'identity', 'deflate', 'gzip;q=0', 'gzip;q=nonsense', '*;q=0'):
+            with self.subTest(header=header):
+                self.assertIsNone(negotiate(header))
+
+    @unittest.skipIf(brotli is None, 'brotli is not installed')
+    def test_brotli_wins_ties_but_not_weights(self):
+        self.assertEqual(negotiate('gzip, deflate, br'), 'br')
+        self.assertEqual(negotiate('*'), 'br')
+        self.assertEqual(negotiate('br;q=0.5, gzip'), 'gzip')
+        self.assertEqual(negotiate('br, *;q=0'), 'br')
+
+
+@override_settings(COMPRESSION_MIN_SIZE=200)
+class CompressionMiddlewareTests(SimpleTestCase):
+    body = b'{"results": [' + b','.join(b'{"id": %d, "title": "Task"}' % index for index in range(100)) + b']}'
+
+    def respond(self, response, accept_encoding='gzip'):
+        request = RequestFactory().get('/api/tasks/', HTTP_ACCEPT_ENCODING=accept_encoding)
+        return CompressionMiddleware(lambda request: response)(request)
+
+    def json(self, body=None, **kwargs):
+        return HttpResponse(self.body if body is None else body, content_type='application/json', **kwargs)
+
+    def test_json_is_gzipped(self):
+        response = self.respond(self.json())
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(response['Vary'], 'Accept-Encoding')
+        self.assertEqual(int(response['Content-Length']), len(response.content))
+        self.assertEqual(gzip.decompress(response.content), self.body)
+
+    @unittest.skipIf(brotli is None, 'brotli is not installed')
+    def test_json_is_brotli_compressed_when_preferred(self):
+        response = self.respond(self.json(), accept_encoding='gzip, br')
+        self.assertEqual(response['Content-Encoding'], 'br')
+        self.assertEqual(brotli.decompress(response.content), self.body)
+
+    def test_clients_without_a_shared_coding_get_the_plain_body(self):
+        response = self.respond(self.json(), accept_encoding='identity')
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertEqual(response.content, self.body)
+        self.assertEqual(response['Vary'], 'Accept-Encoding')
+
+    def test_small_bodies_are_left_alone(self):
+        response = self.respond(self.json(b'{"id": 1}'))
+        self.assertFalse(response.has_header('Content-Encoding'))
+
+    def test_html_is_never_compressed(self):
+        response = self.respond(HttpResponse(b'<p>' + self.body + b'</p>', content_type='text/html'))
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertFalse(response.has_header('Vary'))
+
+    def test_encoded_and_no_transform_responses_are_left_alone(self):
+        encoded = self.json()
+        encoded['Content-Encoding'] = 'br'
+        self.assertEqual(self.respond(encoded).content, self.body)
+        no_transform = self.json()
+        no_transform['Cache-Control'] = 'private, no-transform'
+        self.assertFalse(self.respond(no_transform).has_header('Content-Encoding'))
+
+    def test_strong_etags_are_weakened(self):
+        response = self.json()
+        response['ETag'] = '"abc"'
+        self.assertEqual(self.respond(response)['ETag'], 'W/"abc"')
+
+    def test_streams_are_compressed_chunk_by_chunk(self):
+        chunks = [self.body[index:index + 500] for index in range(0, len(self.body), 500)]
+        response = self.respond(StreamingHttpResponse(iter(chunks), content_type='application/json'))
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertFalse(response.has_header('Content-Length'))
+        compressed = list(response.streaming_content)
+        self.assertGreater(len(compressed), 1)
+        self.assertEqual(gzip.decompress(b''.join(compressed)), self.body)
+
+
+class ProfiledView(ProfilingMixin, APIView):
+    throttle_classes = []
+
+    def get(self, request):
+        if request.GET.get('fail'):
+            raise RuntimeError('view failed')
+        return Response({'ok': True})
+
+
+@override_settings(PROFILING_ENABLED=True)
+class ProfilingMixinTests(SimpleTestCase):
+    def request(self, path='/profiled/', role='admin'):
+        request = APIRequestFactory().get(path, HTTP_X_PROFILE='inline')
+        force_authenticate(request, User(username='profiler', role=role))
+        return ProfiledView.as_view()(request)
+
+    def assertNothingLeftRunning(self):
+        self.assertIsNone(sys.getprofile())
+        self.assertFalse([thread for thread in threading.enumerate() if isinstance(thread, StackSampler)])
+        self.assertEqual(connection.execute_wrappers, [])
+
+    def test_admins_get_an_inline_report(self):
+        response = self.request()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['status_code'], 200)
+        self.assertIn('profile', response.data)
+        self.assertNothingLeftRunning()
+
+    def test_other_users_are_not_profiled(self):
+        response = self.request(role='employee')
+        self.assertEqual(response.data, {'ok': True})
+
+    def test_the_profile_stops_when_the_view_raises(self):
+        with self.assertRaisesMessage(RuntimeError, 'view failed'):
+            self.request('/profiled/?fail=1')
+        self.assertNothingLeftRunning()
+
+
+class MemoryBucketStoreTests(SimpleTestCase):
+    def test_a_bucket_allows_bursts_up_to_its_capacity(self):
+        store = throttling.MemoryBucketStore()
+        self.assertEqual([store.take('key', 3, 0.001)[0] for _ in range(4)], [True, True, True, False])
+        # Other keys have their own bucket
+        self.assertEqual(store.take('other', 3, 0.001), (True, 2))
+
+    def test_buckets_refill_at_their_rate(self):
+        store = throttling.MemoryBucketStore()
+        with mock.patch.object(throttling.time, 'monotonic', return_value=100.0):
+            store.take('key', 2, 1)
+            store.take('key', 2, 1)
+            self.assertFalse(store.take('key', 2, 1)[0])
+        with mock.patch.object(throttling.time, 'monotonic', return_value=101.5):
+            self.assertEqual(store.take('key', 2, 1), (True, 0.5))
+
+    def test_least_recently_used_buckets_are_dropped(self):
+        store = throttling.MemoryBucketStore(max_keys=2)
+        for key in ('a', 'b', 'a', 'c'):
+            store.take(key, 5, 0.001)
+        self.assertEqual(list(store._buckets), ['a', 'c'])
+
+
+class ThrottledView(APIView):
+    def get(self, request):
+        return Response({'ok': True})
+
+
+@override_settings(
+    THROTTLE_ENABLED=True,
+    THROTTLE_TENANT_RATES={'read': '5/min'},
+    THROTTLE_USER_RATES={'employee': {'read': '2/min'}},
+)
+class ThrottleOrderTests(SimpleTestCase):
+    def setUp(self):
+        self.store = throttling.MemoryBucketStore()
+        patcher = mock.patch.object(throttling, '_store', self.store)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def statuses(self, user, count):
+        statuses = []
+        for _ in range(count):
+            request = APIRequestFactory().get('/throttled/')
+            force_authenticate(request, user)
+            statuses.append(ThrottledView.as_view()(request).status_code)
+        return statuses
+
+    def tenant_tokens(self):
+        return self.store._buckets[f'tenant:{connection.schema_name}:read'][0]
+
+    def test_requests_the_user_bucket_rejects_keep_the_tenant_tokens(self):
+        noisy = User(pk=1, username='noisy', role='employee')
+        self.assertEqual(self.statuses(noisy, 6), [200, 200, 429, 429, 429, 429])
+        self.assertAlmostEqual(self.tenant_tokens(), 3, places=2)
+
+        # The rest of the tenant still gets the remaining tokens
+        quiet = User(pk=2, username='quiet', role='employee')
+        other = User(pk=3, username='other', role='employee')
+        self.assertEqual(self.statuses(quiet, 2) + self.statuses(other, 2), [200, 200, 200, 429])
+
+
+class ReadinessTests(SimpleTestCase):
+    def test_database_errors_are_logged_but_not_returned(self):
+        error = OperationalError('connection to server at "db.internal" failed for user "tms"')
+        with mock.patch.object(instrumentation, 'connection') as database, \
+                self.assertLogs('task_management_system.instrumentation', 'ERROR') as logs:
+            database.cursor.side_effect = error
+            response = instrumentation.readiness(RequestFactory().get('/api/health/ready/'))
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.content, b'{"status": "unavailable"}')
+        self.assertIn('db.internal', logs.output[0])
+
+
+class LocalLRUTests(SimpleTestCase):
+    def test_entries_expire_after_their_ttl(self):
+        lru = cache.LocalLRU(max_entries=10, ttl=5)
+        with mock.patch.object(cache.time, 'monotonic', return_value=100.0):
+            lru.set_many({'a': 1})
+        with mock.patch.object(cache.time, 'monotonic', return_value=104.0):
+            self.assertEqual(lru.get_many(['a', 'b']), {'a': 1})
+        with mock.patch.object(cache.time, 'monotonic', return_value=106.0):
+            self.assertEqual(lru.get_many(['a']), {})
+
+    def test_least_recently_used_entries_are_dropped(self):
+        lru = cache.LocalLRU(max_entries=2, ttl=60)
+        lru.set_many({'a': 1, 'b': 2})
+        lru.get_many(['a'])
+        lru.set_many({'c': 3})
+        self.assertEqual(lru.get_many(['a', 'b', 'c']), {'a': 1, 'c': 3})
+
+
+class TwoLevelCacheTests(SimpleTestCase):
+    def setUp(self):
+        cache.local.clear()
+        caches['default'].clear()
+        self.addCleanup(cache.local.clear)
+        self.built = []
+        self.cache = cache.RepresentationCache('thing', self.build)
+
+    def build(self, ids, context=None):
+        self.built.append(list(ids))
+        return {pk: {'id': pk, 'build': len(self.built)} for pk in ids if pk != 404}
+
+    def test_only_missing_ids_are_built(self):
+        self.assertEqual(self.cache.render([1, 2, 404]), [{'id': 1, 'build': 1}, {'id': 2, 'build': 1}])
+        self.assertEqual(self.cache.render([2, 3]), [{'id': 2, 'build': 1}, {'id': 3, 'build': 2}])
+        self.assertEqual(self.built, [[1, 2, 404], [3]])
+
+    def test_the_shared_tier_refills_the_local_one(self):
+        self.cache.render([1])
+        cache.local.clear()
+        self.assertEqual(self.cache.render([1]), [{'id': 1, 'build': 1}])
+        self.assertEqual(self.built, [[1]])
+
+    def test_invalidate_drops_both_tiers(self):
+        self.cache.render([1, 2])
+        self.cache.invalidate([1])
+        self.assertEqual(self.cache.render([1, 2]), [{'id': 1, 'build': 2}, {'id': 2, 'build': 1}])
+
+    def test_bump_drops_the_whole_namespace(self):
+        self.cache.render([1, 2])
+        generation = self.cache.cache.generation()
+        self.cache.bump()
+        self.assertEqual(self.cache.cache.generation(), generation + 1)
+        self.assertEqual(self.cache.render([1, 2]), [{'id': 1, 'build': 2}, {'id': 2, 'build': 2}])
+        # Other namespaces keep their entries
+        other = cache.TwoLevelCache('other')
+        other.set_many({1: 'kept'})
+        self.cache.bump()
+        self.assertEqual(other.get_many([1]), {1: 'kept'})
+
+    def test_other_processes_pick_up_a_bump_within_the_local_ttl(self):
+        self.cache.render([1])
+        # Another process bumps the shared generation; this one still has it in its local tier
+        caches['default'].set(f'{connection.schema_name}:thing:generation', 1, None)
+        self.assertEqual(self.cache.render([1]), [{'id': 1, 'build': 1}])
+        later = time.monotonic() + settings.CACHE_LOCAL_TTL + 1
+        with mock.patch.object(cache.time, 'monotonic', return_value=later):
+            self.assertEqual(self.cache.render([1]), [{'id': 1, 'build': 2}])
@@ -0,0 +1,225 @@
+"""
+Token-bucket request throttling per tenant schema and per user.
+
+Every request is classified as a ``read``, ``write``, ``upload`` or ``bulk``
+request and then has to take one token from two buckets:
+
+* the user bucket (``THROTTLE_USER_RATES``, by role; anonymous clients are
+  keyed by IP address);
+* the tenant bucket (``THROTTLE_TENANT_RATES``), shared by everyone on the
+  tenant's schema, so one noisy integration cannot starve the other tenants.
+
+The user bucket is checked first, and a request it rejects takes nothing from
+the tenant bucket, so a client hammering past its own limit does not use up
+its tenant's budget.
+
+A rate of ``"120/min"`` is a bucket holding 120 tokens that refills at
+120 tokens per minute, so short bursts up to the full rate are allowed.
+
+Buckets live in redis when ``REDIS_URL`` is set, so every gunicorn worker
+and pod shares them; one Lua script call per bucket reads, refills and
+takes a token atomically on the redis clock. Without ``REDIS_URL`` (local
+development, tests) they live in process memory. If redis is unreachable
+requests are let through rather than failing.
+
+``RateLimitHeadersMiddleware`` adds ``RateLimit-Limit``,
+``RateLimit-Remaining`` and ``RateLimit-Reset`` for the most constrained
+bucket of the request.
+"""
+import logging
+import math
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.db import connection
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.throttling import BaseThrottle
+
+logger = logging.getLogger(__name__)
+
+READ, WRITE, UPLOAD, BULK = 'read', 'write', 'upload', 'bulk'
+ANONYMOUS = 'anonymous'
+
+PERIODS = {'s': 1, 'sec': 1, 'm': 60, 'min': 60, 'h': 3600, 'hour': 3600, 'd': 86400, 'day': 86400}
+
+
+def parse_rate(rate):
+    """``"120/min"`` -> ``(capacity, tokens per second)``; ``None`` disables the bucket."""
+    if not rate:
+        return None
+    count, period = rate.split('/')
+    count = int(count)
+    return count, count / PERIODS[period]
+
+
+class BucketState:
+    __slots__ = ('allowed', 'limit', 'remaining', 'reset', 'wait')
+
+    def __init__(self, allowed, limit, tokens, rate):
+        self.allowed = allowed
+        self.limit = limit
+        self.remaining = int(tokens)
+        # Seconds until the bucket is full again / until the next token
+        self.reset = math.ceil((limit - tokens) / rate)
+        self.wait = None if allowed else (1 - tokens) / rate
+
+
+class MemoryBucketStore:
+    """Buckets of this process only; the least recently used ones are dropped past ``max_keys``."""
+    def __init__(self, max_keys=100000):
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, key, capacity, rate):
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.pop(key, (capacity, now))
+            tokens = min(capacity, tokens + (now - updated) * rate)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            self._buckets[key] = (tokens, now)
+            if len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        return allowed, tokens
+
+
+# KEYS[1] bucket; ARGV capacity, tokens per second. Returns {allowed, tokens}.
+TAKE_SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(bucket[1]) or capacity
+local updated = tonumber(bucket[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - updated) * rate)
+local allowed = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+    allowed = 1
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('PEXPIRE', KEYS[1], math.ceil((capacity - tokens) / rate * 1000) + 1000)
+return {allowed, tostring(tokens)}
+"""
+
+
+class RedisBucketStore:
+    """Buckets shared through redis; keys expire once they would be full again."""
+    def __init__(self, url, prefix='throttle:', timeout=0.1):
+        import redis
+
+        self.prefix = prefix
+        self.error = redis.RedisError
+        self.client = redis.Redis.from_url(url, socket_timeout=timeout, socket_connect_timeout=timeout)
+        self.script = self.client.register_script(TAKE_SCRIPT)
+
+    def take(self, key, capacity, rate):
+        try:
+            allowed, tokens = self.script(keys=[self.prefix + key], args=[capacity, rate])
+        except self.error:
+            logger.warning('Throttle store unavailable, letting the request through', exc_info=True)
+            return True, capacity
+        return bool(allowed), float(tokens)
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store():
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                url = getattr(settings, 'REDIS_URL', '')
+                _store = RedisBucketStore(url) if url else MemoryBucketStore()
+    return _store
+
+
+def request_class(request, view):
+    """``bulk``/``upload`` when the view says so (``throttle_scope``), else ``read`` or ``write``."""
+    scope = getattr(view, 'throttle_scope', None)
+    if scope in (BULK, UPLOAD):
+        return scope
+    if request.method in SAFE_METHODS:
+        return READ
+    if request.content_type.startswith('multipart/'):
+        return UPLOAD
+    return WRITE
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """Takes one token from the bucket returned by ``get_bucket``; subclasses pick key and rate."""
+    def get_bucket(self, request, view, kind):
+        """Return ``(key, rate)``, or ``None`` to skip this throttle."""
+        raise NotImplementedError
+
+    def allow_request(self, request, view):
+        self.state = None
+        if not getattr(settings, 'THROTTLE_ENABLED', True):
+            return True
+        kind = request_class(request, view)
+        bucket = self.get_bucket(request, view, kind)
+        parsed = parse_rate(bucket[1]) if bucket else None
+        if parsed is None:
+            return True
+        # The headers middleware reports the most constrained bucket of the request
+        if not hasattr(request._request, 'rate_limits'):
+            request._request.rate_limits = []
+        # DRF asks every throttle; once one has rejected the request the others keep their tokens
+        if not all(state.allowed for state in request._request.rate_limits):
+            return True
+        capacity, rate = parsed
+        allowed, tokens = get_store().take(f'{bucket[0]}:{kind}', capacity, rate)
+        self.state = BucketState(allowed, capacity, tokens, rate)
+        request._request.rate_limits.append(self.state)
+        return allowed
+
+    def wait(self):
+        return self.state.wait if self.state else None
+
+
+def _schema_name(request):
+    tenant = getattr(request, 'tenant', None)
+    return tenant.schema_name if tenant is not None else connection.schema_name
+
+
+class TenantRateThrottle(TokenBucketThrottle):
+    def get_bucket(self, request, view, kind):
+        rate = getattr(settings, 'THROTTLE_TENANT_RATES', {}).get(kind)
+        return f'tenant:{_schema_name(request)}', rate
+
+
+class UserRateThrottle(TokenBucketThrottle):
+    def get_bucket(self, request, view, kind):
+        rates = getattr(settings, 'THROTTLE_USER_RATES', {})
+        user = request.user
+        if user and user.is_authenticated:
+            # User ids are per schema, so the schema is part of the key
+            key = f'user:{_schema_name(request)}:{user.pk}'
+            role = getattr(user, 'role', None)
+        else:
+            key, role = f'anon:{self.get_ident(request)}', ANONYMOUS
+        rate = rates.get(role, rates.get(ANONYMOUS, {})).get(kind)
+        return key, rate
+
+
+class RateLimitHeadersMiddleware:
+    """Adds the ``RateLimit-*`` headers recorded by the throttles above."""
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        states = getattr(request, 'rate_limits', None)
+        if states:
+            tightest = min(states, key=lambda state: (state.allowed, state.remaining / state.limit))
+            response['RateLimit-Limit'] = str(tightest.limit)
+            response['RateLimit-Remaining'] = str(tightest.remaining)
+            response['RateLimit-Reset'] = str(tightest.reset)
+        return response
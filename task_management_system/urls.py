@@ -22,21 +22,27 @@ from rest_framework.routers import DefaultRouter
 from rest_framework_simplejwt.views import (TokenObtainPairView,
                                             TokenRefreshView)
 
-from tasks.views import TaskAttachmentViewSet, TaskCommentViewSet, TaskViewSet
+from task_management_system.batch import BatchView
+from tasks.views import (TaskAttachmentViewSet, TaskCommentViewSet,
+                         TaskDependencyViewSet, TaskViewSet)
 from users.views import UserViewSet
+from webhooks.views import WebhookSubscriptionViewSet
 
 router = DefaultRouter()
 router.register(r'users', UserViewSet)
 router.register(r'tasks', TaskViewSet)
+router.register(r'webhooks', WebhookSubscriptionViewSet, basename='webhook')
 
 task_router = DefaultRouter()
 task_router.register(r'comments', TaskCommentViewSet, basename='task-comment')
 task_router.register(r'attachments', TaskAttachmentViewSet, basename='task-attachment')
+task_router.register(r'dependencies', TaskDependencyViewSet, basename='task-dependency')
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/', include(router.urls)),
     path('api/tasks/<int:task_pk>/', include(task_router.urls)),
+    path('api/batch/', BatchView.as_view(), name='batch'),
     path('api/token/', TokenObtainPairView.as_view(), name='token_obtain_pair'),
     path('api/token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
 ] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
@@ -2,34 +2,39 @@ from django.conf import settings
 from django.conf.urls.static import static
 from django.contrib import admin
 from django.urls import include, path
-from drf_spectacular.views import (SpectacularAPIView, SpectacularRedocView,
-                                   SpectacularSwaggerView)
 from rest_framework.routers import DefaultRouter
 from rest_framework_simplejwt.views import (TokenObtainPairView,
                                             TokenRefreshView)
 
-from tasks.views import TaskAttachmentViewSet, TaskCommentViewSet, TaskViewSet
+from task_management_system.batch import BatchView
+from task_management_system.docs import lazy_view, openapi_schema
+from tasks.views import (TaskAttachmentViewSet, TaskCommentViewSet,
+                         TaskDependencyViewSet, TaskViewSet)
 from tenants.views import TenantViewSet
 from users.views import UserViewSet
+from webhooks.views import WebhookSubscriptionViewSet
 
 # Main router for primary resources
 router = DefaultRouter()
 router.register(r'tenants', TenantViewSet)
 router.register(r'users', UserViewSet)
 router.register(r'tasks', TaskViewSet)
+router.register(r'webhooks', WebhookSubscriptionViewSet, basename='webhook')
 
 # Nested router for task-related resources
 task_router = DefaultRouter()
 task_router.register(r'comments', TaskCommentViewSet, basename='task-comment')
 task_router.register(r'attachments', TaskAttachmentViewSet, basename='task-attachment')
+task_router.register(r'dependencies', TaskDependencyViewSet, basename='task-dependency')
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/', include(router.urls)),
     path('api/tasks/<int:task_pk>/', include(task_router.urls)),
+    path('api/batch/', BatchView.as_view(), name='batch'),
     path('api/token/', TokenObtainPairView.as_view(), name='token_obtain_pair'),
     path('api/token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
-    path('api/schema/', SpectacularAPIView.as_view(), name='schema'),
-    path('api/docs/', SpectacularSwaggerView.as_view(url_name='schema'), name='swagger-ui'),
-    path('api/redoc/', SpectacularRedocView.as_view(url_name='schema'), name='redoc'),
+    path('api/schema/', openapi_schema, name='schema'),
+    path('api/docs/', lazy_view('drf_spectacular.views.SpectacularSwaggerView', url_name='schema'), name='swagger-ui'),
+    path('api/redoc/', lazy_view('drf_spectacular.views.SpectacularRedocView', url_name='schema'), name='redoc'),
 ] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT) 
\ No newline at end of file
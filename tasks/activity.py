@@ -0,0 +1,156 @@
+"""
+Buffered writer of the ``TaskActivity`` log.
+
+``record()`` never inserts by itself. Each entry is queued with
+``transaction.on_commit``, so events of rolled-back changes are dropped. Once
+committed, it is appended to the buffer of the current request, which
+``ActivityLogMiddleware`` writes with one multi-row INSERT when the request
+ends. Outside a request (shell, management commands) entries are written
+right after their transaction commits; wrap bulk work in ``buffered()`` to
+batch them as well.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+from datetime import timezone as dt_timezone
+from functools import partial
+
+from django.db import connection, transaction
+from django.utils import timezone
+
+BATCH_SIZE = 500
+
+TABLE = 'tasks_taskactivity'
+DEFAULT_PARTITION = f'{TABLE}_default'
+
+_buffer = ContextVar('task_activity_buffer', default=None)
+
+
+class ActivityBuffer:
+    def __init__(self, request=None):
+        self.request = request
+        self.entries = []
+
+    def actor_id(self):
+        # DRF copies the authenticated (JWT) user onto the underlying HttpRequest
+        user = getattr(self.request, 'user', None)
+        return user.pk if user is not None and user.is_authenticated else None
+
+
+def flush(entries):
+    from .models import TaskActivity
+
+    if entries:
+        TaskActivity.objects.bulk_create(entries, batch_size=BATCH_SIZE)
+
+
+@contextmanager
+def buffered(request=None):
+    """Collect the entries committed inside the block and write them in one INSERT at the end."""
+    buffer = ActivityBuffer(request)
+    token = _buffer.set(buffer)
+    try:
+        yield buffer
+    finally:
+        _buffer.reset(token)
+        flush(buffer.entries)
+
+
+def record(task_id, verb, changes=None, actor=None):
+    """Log ``verb`` on ``task_id`` once the current transaction commits."""
+    from .models import TaskActivity
+
+    buffer = _buffer.get()
+    if actor is not None:
+        actor_id = actor.pk
+    else:
+        actor_id = buffer.actor_id() if buffer is not None else None
+    entry = TaskActivity(
+        task_id=task_id, actor_id=actor_id, verb=verb, changes=changes or {}, created_at=timezone.now(),
+    )
+    if buffer is None:
+        transaction.on_commit(partial(flush, [entry]))
+    else:
+        transaction.on_commit(partial(buffer.entries.append, entry))
+
+
+class ActivityLogMiddleware:
+    """
+    Flushes the activity entries of a request in one statement after the view returns.
+
+    Must come after ``TenantMainMiddleware`` so the INSERT goes to the
+    request's tenant schema.
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with buffered(request):
+            return self.get_response(request)
+
+
+def month_start(moment, offset=0):
+    month = moment.year * 12 + moment.month - 1 + offset
+    return datetime(month // 12, month % 12 + 1, 1, tzinfo=dt_timezone.utc)
+
+
+def _partitions(cursor):
+    cursor.execute(
+        """
+        SELECT child.relname FROM pg_inherits
+        JOIN pg_class parent ON parent.oid = pg_inherits.inhparent
+        JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+        JOIN pg_namespace ns ON ns.oid = parent.relnamespace
+        WHERE parent.relname = %s AND ns.nspname = current_schema()
+        """,
+        [TABLE],
+    )
+    return {name for (name,) in cursor.fetchall()}
+
+
+def ensure_partitions(months_ahead=3, now=None):
+    """
+    Create the monthly partitions from this month to ``months_ahead`` months out.
+
+    Rows that already landed in the default partition for a new month are
+    moved into it before it is attached. Returns the names of the created
+    partitions.
+    """
+    now = now or timezone.now()
+    created = []
+    with connection.cursor() as cursor:
+        existing = _partitions(cursor)
+        for offset in range(months_ahead + 1):
+            start, end = month_start(now, offset), month_start(now, offset + 1)
+            name = f'{TABLE}_{start:%Y%m}'
+            if name in existing:
+                continue
+            with transaction.atomic():
+                cursor.execute(f'CREATE TABLE {name} (LIKE {TABLE} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)')
+                cursor.execute(
+                    f"""
+                    WITH moved AS (
+                        DELETE FROM {DEFAULT_PARTITION} WHERE created_at >= %s AND created_at < %s RETURNING *
+                    )
+                    INSERT INTO {name} SELECT * FROM moved
+                    """,
+                    [start, end],
+                )
+                cursor.execute(f'ALTER TABLE {TABLE} ATTACH PARTITION {name} FOR VALUES FROM (%s) TO (%s)', [start, end])
+            created.append(name)
+    return created
+
+
+def drop_partitions_before(cutoff):
+    """Drop whole monthly partitions that end on or before ``cutoff``; returns their names."""
+    dropped = []
+    with connection.cursor() as cursor:
+        for name in sorted(_partitions(cursor)):
+            suffix = name[len(TABLE) + 1:]
+            if not suffix.isdigit():
+                continue
+            start = datetime(int(suffix[:4]), int(suffix[4:]), 1, tzinfo=dt_timezone.utc)
+            if month_start(start, 1) <= cutoff:
+                cursor.execute(f'DROP TABLE {name}')
+                dropped.append(name)
+    return dropped
@@ -0,0 +1,317 @@
+"""
+Cycle-time and throughput analytics over columnar copies of the task tables.
+
+The columns the metrics need (ids, creator, assignee, status, priority and
+the timestamps as Unix seconds) of live and archived tasks are read with one
+streamed ``UNION ALL`` query into NumPy arrays. Each process keeps these
+arrays per tenant (``ANALYTICS_MAX_TENANTS`` at most, least recently used
+first out) and refreshes them incrementally: at most every
+``ANALYTICS_REFRESH_INTERVAL`` seconds, only rows whose ``updated_at`` is
+past the newest one seen are read and replace their old copies. The window
+starts ``ANALYTICS_REFRESH_OVERLAP`` seconds earlier, so rows saved by
+transactions that committed late are usually not missed. ``updated_at`` is
+set when a row is saved, not when it commits, so a transaction open for
+longer than that (or clock skew between app servers) can still slip past
+the window; every ``ANALYTICS_FULL_REFRESH_INTERVAL`` seconds the arrays
+are therefore read again in full, which bounds how long such a row is
+missing. ``QuerySet.update()``
+leaves ``updated_at`` alone, but it only writes tree, rank and roll-up
+columns, which the metrics do not use. Deleted tasks leave no row behind;
+when the tables hold fewer rows than the arrays, the ids are read again and
+the gone ones dropped.
+
+``summarize`` computes every metric with vectorized operations: time
+buckets with ``bincount``, and percentiles per assignee and priority from
+one sort of the whole column, so the cost does not grow with the number of
+groups. Percentiles interpolate linearly, like ``numpy.percentile``.
+"""
+import itertools
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from datetime import timezone as dt_timezone
+
+import numpy as np
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.db.models import F, FloatField, Func, Value
+from django.db.models.functions import Coalesce
+
+from .models import ArchivedTask, Task
+
+HOUR = 3600.0
+DAY = 24 * HOUR
+WEEK = 7 * DAY
+# Monday 1970-01-05 00:00 UTC; weeks start on Mondays
+EPOCH_MONDAY = 4 * DAY
+PERCENTILES = (50, 75, 85, 95)
+GROUP_PERCENTILES = (50, 85)
+# Upper bounds (days) of the work-in-progress age buckets; the last one is open-ended
+AGE_BUCKETS = (1, 3, 7, 14, 30)
+AGE_LABELS = ('<1d', '1-3d', '3-7d', '7-14d', '14-30d', '30d+')
+
+STATUSES = [value for value, label in Task.STATUS_CHOICES]
+PRIORITIES = [value for value, label in Task.PRIORITY_CHOICES]
+DONE = STATUSES.index('done')
+
+COLUMNS = {
+    'id': np.int64,
+    'created_by': np.int64,
+    'assigned_to': np.int64,  # 0 when unassigned
+    'status': np.int8,  # index into STATUSES
+    'priority': np.int8,  # index into PRIORITIES
+    'created_at': np.float64,  # Unix seconds; NaN for NULL
+    'completed_at': np.float64,
+    'due_date': np.float64,
+    'updated_at': np.float64,
+}
+CODES = {
+    'status': {value: code for code, value in enumerate(STATUSES)},
+    'priority': {value: code for code, value in enumerate(PRIORITIES)},
+}
+
+
+class Epoch(Func):
+    """A timestamp as float Unix seconds, NaN for NULL."""
+    template = "COALESCE(EXTRACT(EPOCH FROM %(expressions)s)::float8, 'NaN'::float8)"
+    output_field = FloatField()
+
+
+def _query(since=None):
+    """Live and archived tasks (changed after ``since``), as ``COLUMNS`` tuples."""
+    querysets = []
+    for model in (Task, ArchivedTask):
+        queryset = model.objects.order_by()
+        if since is not None:
+            queryset = queryset.filter(updated_at__gt=datetime.fromtimestamp(since, dt_timezone.utc))
+        querysets.append(queryset.values_list(
+            'pk', 'created_by_id', Coalesce(F('assigned_to_id'), Value(0)), 'status', 'priority',
+            Epoch('created_at'), Epoch('completed_at'), Epoch('due_date'), Epoch('updated_at'),
+        ))
+    return querysets[0].union(querysets[1], all=True)
+
+
+def load(since=None, chunk_size=None):
+    """``{column: array}`` of the rows of ``_query(since)``, streamed through a server-side cursor."""
+    chunk_size = chunk_size or getattr(settings, 'ANALYTICS_CHUNK_SIZE', 10000)
+    parts = {name: [] for name in COLUMNS}
+    rows = _query(since).iterator(chunk_size=chunk_size)
+    while chunk := list(itertools.islice(rows, chunk_size)):
+        for (name, dtype), values in zip(COLUMNS.items(), zip(*chunk)):
+            if name in CODES:
+                values = map(CODES[name].__getitem__, values)
+            parts[name].append(np.fromiter(values, dtype, len(chunk)))
+    return {
+        name: np.concatenate(chunks) if chunks else np.empty(0, COLUMNS[name])
+        for name, chunks in parts.items()
+    }
+
+
+def refresh(columns, overlap=None):
+    """``columns`` brought up to date with the rows changed or deleted since they were read."""
+    if not len(columns['id']):
+        return load()
+    overlap = getattr(settings, 'ANALYTICS_REFRESH_OVERLAP', 60) if overlap is None else overlap
+    changed = load(since=float(np.nanmax(columns['updated_at'])) - overlap)
+    if len(changed['id']):
+        # Changed rows replace their old copies
+        kept = ~np.isin(columns['id'], changed['id'])
+        columns = {name: np.concatenate((values[kept], changed[name])) for name, values in columns.items()}
+    if len(columns['id']) > Task.objects.count() + ArchivedTask.objects.count():
+        existing = np.fromiter(
+            Task.objects.order_by().values_list('pk', flat=True)
+            .union(ArchivedTask.objects.order_by().values_list('pk', flat=True), all=True),
+            np.int64,
+        )
+        kept = np.isin(columns['id'], existing)
+        columns = {name: values[kept] for name, values in columns.items()}
+    return columns
+
+
+class _Entry:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.columns = None
+        self.loaded = 0.0
+        self.refreshed = 0.0
+
+
+_entries = OrderedDict()
+_entries_lock = threading.Lock()
+
+
+def snapshot(max_age=None):
+    """
+    This process's columns of the current tenant, refreshed if older than ``max_age`` seconds.
+
+    Callers get arrays that are never modified afterwards; refreshes build new ones.
+    """
+    if max_age is None:
+        max_age = getattr(settings, 'ANALYTICS_REFRESH_INTERVAL', 30)
+    schema_name = connection.schema_name
+    with _entries_lock:
+        entry = _entries.get(schema_name)
+        if entry is None:
+            entry = _entries[schema_name] = _Entry()
+            while len(_entries) > getattr(settings, 'ANALYTICS_MAX_TENANTS', 16):
+                _entries.popitem(last=False)
+        _entries.move_to_end(schema_name)
+    # One refresh per tenant at a time; other requests wait for it instead of repeating it
+    with entry.lock:
+        now = time.monotonic()
+        if entry.columns is None or now - entry.loaded >= getattr(settings, 'ANALYTICS_FULL_REFRESH_INTERVAL', 900):
+            entry.columns = load()
+            entry.loaded = entry.refreshed = now
+        elif now - entry.refreshed >= max_age:
+            entry.columns = refresh(entry.columns)
+            entry.refreshed = now
+        return entry.columns
+
+
+def clear():
+    with _entries_lock:
+        _entries.clear()
+
+
+def group_percentiles(groups, values, count, percentiles):
+    """
+    ``{p: array}`` with the ``p``-th percentile of ``values`` within each of ``count`` groups.
+
+    ``groups`` holds each value's group index. Empty groups get NaN.
+    """
+    sizes = np.bincount(groups, minlength=count)
+    if not len(values):
+        return {p: np.full(count, np.nan) for p in percentiles}
+    # Sorted by group, then value: each group is a sorted run starting at ``starts``
+    ordered = values[np.lexsort((values, groups))]
+    starts = np.cumsum(sizes) - sizes
+    result = {}
+    for p in percentiles:
+        position = starts + np.maximum(sizes - 1, 0) * (p / 100)
+        lower = np.minimum(np.floor(position).astype(np.int64), len(ordered) - 1)
+        upper = np.minimum(lower + 1, starts + sizes - 1).clip(0, len(ordered) - 1)
+        value = ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+        result[p] = np.where(sizes > 0, value, np.nan)
+    return result
+
+
+def _number(value, digits=2):
+    # ``+ 0.0`` turns a rounded -0.0 into 0.0
+    return None if np.isnan(value) else round(float(value), digits) + 0.0
+
+
+def _iso(seconds):
+    return datetime.fromtimestamp(seconds, dt_timezone.utc).date().isoformat()
+
+
+def _breakdown(keys, completed, lead_hours, has_due, on_time, is_open, overdue):
+    """Per-key metrics of the rows that were completed in the window or are still open."""
+    labels, groups = np.unique(keys, return_inverse=True)
+    count = len(labels)
+
+    def total(mask):
+        return np.bincount(groups, weights=mask, minlength=count).astype(np.int64)
+
+    done = completed.nonzero()[0]
+    lead = group_percentiles(groups[done], lead_hours, count, GROUP_PERCENTILES)
+    completed_count, due_count, on_time_count = total(completed), total(has_due), total(on_time)
+    wip_count, overdue_count = total(is_open), total(overdue)
+    rows = []
+    for index, label in enumerate(labels):
+        rows.append((label, {
+            'completed': int(completed_count[index]),
+            'lead_time_hours': {f'p{p}': _number(lead[p][index]) for p in GROUP_PERCENTILES},
+            'with_due_date': int(due_count[index]),
+            'on_time': int(on_time_count[index]),
+            'hit_rate': _number(on_time_count[index] / due_count[index], 4) if due_count[index] else None,
+            'wip': int(wip_count[index]),
+            'overdue': int(overdue_count[index]),
+        }))
+    return rows
+
+
+def summarize(columns, task_ids=None, weeks=None, now=None):
+    """
+    Metrics of ``columns`` (restricted to the tasks ``task_ids``).
+
+    Lead times, throughput and due-date hit rates cover tasks completed in the
+    last ``weeks`` weeks, the current one included; work in progress is every
+    task that is not done.
+    """
+    weeks = weeks or getattr(settings, 'ANALYTICS_DEFAULT_WEEKS', 12)
+    now = time.time() if now is None else now
+    if task_ids is not None:
+        scope = np.isin(columns['id'], np.asarray(task_ids, dtype=np.int64))
+        columns = {name: values[scope] for name, values in columns.items()}
+
+    status, created_at, completed_at, due_date = (
+        columns['status'], columns['created_at'], columns['completed_at'], columns['due_date'],
+    )
+    window_start = EPOCH_MONDAY + (np.floor((now - EPOCH_MONDAY) / WEEK) - (weeks - 1)) * WEEK
+    is_done = status == DONE
+    # NaN compares false, so tasks without a completion time drop out here
+    completed = is_done & (completed_at >= window_start) & (completed_at <= now)
+    lead_hours = (completed_at[completed] - created_at[completed]) / HOUR
+    has_due = completed & ~np.isnan(due_date)
+    on_time = has_due & (completed_at <= due_date)
+    is_open = ~is_done
+    overdue = is_open & (due_date < now)
+    age_days = (now - created_at[is_open]) / DAY
+
+    week_index = ((completed_at[completed] - window_start) // WEEK).astype(np.int64)
+    throughput = np.bincount(week_index, minlength=weeks)[:weeks]
+    lead = group_percentiles(np.zeros(len(lead_hours), np.int64), lead_hours, 1, PERCENTILES)
+    age = group_percentiles(np.zeros(len(age_days), np.int64), age_days, 1, PERCENTILES)
+    age_buckets = np.bincount(np.searchsorted(AGE_BUCKETS, age_days, side='right'), minlength=len(AGE_LABELS))
+    by_status = np.bincount(status[is_open], minlength=len(STATUSES))
+    due_count, on_time_count = int(has_due.sum()), int(on_time.sum())
+
+    # Only tasks that count towards a metric get a row in the breakdowns
+    relevant = completed | is_open
+    flags = [mask[relevant] for mask in (completed, has_due, on_time, is_open, overdue)]
+    assignees = columns['assigned_to'][relevant]
+    # Tasks of users deleted since the columns were read count as unassigned
+    usernames = dict(
+        get_user_model().objects.filter(pk__in=np.unique(assignees).tolist()).values_list('pk', 'username')
+    )
+    assignees = np.where(np.isin(assignees, list(usernames)), assignees, 0)
+
+    def breakdown(keys):
+        return _breakdown(keys, flags[0], lead_hours, *flags[1:])
+
+    return {
+        'generated_at': datetime.fromtimestamp(now, dt_timezone.utc).isoformat(),
+        'window': {'weeks': weeks, 'start': _iso(window_start)},
+        'task_count': int(len(status)),
+        'lead_time_hours': {
+            'count': int(len(lead_hours)),
+            'mean': _number(lead_hours.mean()) if len(lead_hours) else None,
+            **{f'p{p}': _number(lead[p][0]) for p in PERCENTILES},
+        },
+        'throughput': [
+            {'week': _iso(window_start + index * WEEK), 'completed': int(count)}
+            for index, count in enumerate(throughput)
+        ],
+        'due_dates': {
+            'with_due_date': due_count,
+            'on_time': on_time_count,
+            'hit_rate': round(on_time_count / due_count, 4) if due_count else None,
+        },
+        'wip': {
+            'count': int(is_open.sum()),
+            'overdue': int(overdue.sum()),
+            'by_status': {STATUSES[code]: int(count) for code, count in enumerate(by_status) if code != DONE},
+            'age_days': {f'p{p}': _number(age[p][0]) for p in PERCENTILES},
+            'age_buckets': dict(zip(AGE_LABELS, age_buckets.tolist())),
+        },
+        'by_assignee': [
+            {'assignee': {'id': int(pk), 'username': usernames[int(pk)]} if pk else None, **metrics}
+            for pk, metrics in breakdown(assignees)
+        ],
+        'by_priority': [
+            {'priority': PRIORITIES[code], **metrics}
+            for code, metrics in breakdown(columns['priority'][relevant])
+        ],
+    }
@@ -0,0 +1,147 @@
+"""
+Archival of finished task trees into the ``Archived*`` tables.
+
+A tree is archived as a whole, once its root and every descendant are done
+and were completed before the cutoff. Roll-ups (``subtask_count ==
+done_subtask_count``) rule out trees with open subtasks without visiting
+them. Because no live task can point at an archived one, paths and roll-ups
+of live tasks stay valid.
+
+Each batch of roots is moved in one transaction with a fixed number of
+statements. The tree rows are locked first, so no comment or subtask can be
+attached to them half-way. Then ``INSERT ... SELECT`` copies tasks, comments
+and attachments, and set-based DELETEs remove the live rows together with
+their visibility rows, dependency edges and shares. Attachment files stay
+where they are; only their rows move.
+
+``restore_trees`` moves whole archived trees back the same way. Restored
+tasks go to the end of their board column and get fresh visibility rows;
+shares and dependency edges dropped on archival are not brought back.
+"""
+import operator
+from collections import Counter
+from functools import reduce
+
+from django.contrib.contenttypes.models import ContentType
+from django.db import connection, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from guardian.models import UserObjectPermission
+
+from . import ranking, visibility
+from .cache import task_representations
+from .deletion import delete_rows
+from .models import (ArchivedTask, ArchivedTaskAttachment, ArchivedTaskComment,
+                     Task, TaskAttachment, TaskComment, TaskDependency,
+                     TaskVisibility)
+
+DONE = 'done'
+BATCH_SIZE = 500
+
+
+def _columns(model, exclude=()):
+    return [field.column for field in model._meta.concrete_fields if field.column not in exclude]
+
+
+def _copy(cursor, source, target, where_column, ids, extra=None):
+    """``INSERT INTO target SELECT ... FROM source`` for the rows whose ``where_column`` is in ``ids``."""
+    extra = extra or {}
+    columns = _columns(target, exclude=extra)
+    quote = connection.ops.quote_name
+    names = ', '.join(quote(column) for column in columns + list(extra))
+    selected = ', '.join([quote(column) for column in columns] + ['%s'] * len(extra))
+    cursor.execute(
+        f'INSERT INTO {quote(target._meta.db_table)} ({names}) '
+        f'SELECT {selected} FROM {quote(source._meta.db_table)} WHERE {quote(where_column)} = ANY(%s)',
+        [*extra.values(), ids],
+    )
+    return cursor.rowcount
+
+
+def candidate_roots(cutoff, after_pk=0, limit=BATCH_SIZE):
+    """Top-level done tasks completed before ``cutoff`` with no open descendants, by ascending id."""
+    return list(
+        Task.objects.filter(
+            parent_task__isnull=True, status=DONE, completed_at__lt=cutoff,
+            subtask_count=F('done_subtask_count'), pk__gt=after_pk,
+        ).order_by('pk').values_list('pk', flat=True)[:limit]
+    )
+
+
+def archive_trees(root_ids, cutoff):
+    """Move the given task trees to the archive if they still qualify; returns row counts."""
+    trees = reduce(operator.or_, (Q(path__startswith=f'{pk}/') for pk in root_ids), Q(pk__in=root_ids))
+    counts = Counter()
+    with transaction.atomic():
+        nodes = list(Task.objects.filter(trees).select_for_update().values_list('pk', 'path', 'status', 'completed_at'))
+        rejected = {
+            int(path.split('/', 1)[0]) if path else pk
+            for pk, path, status, completed_at in nodes
+            if status != DONE or completed_at is None or completed_at >= cutoff
+        }
+        ids = [pk for pk, path, _, _ in nodes if (int(path.split('/', 1)[0]) if path else pk) not in rejected]
+        if not ids:
+            return counts
+
+        with connection.cursor() as cursor:
+            counts['tasks'] = _copy(cursor, Task, ArchivedTask, 'id', ids, extra={'archived_at': timezone.now()})
+            counts['comments'] = _copy(cursor, TaskComment, ArchivedTaskComment, 'task_id', ids)
+            counts['attachments'] = _copy(cursor, TaskAttachment, ArchivedTaskAttachment, 'task_id', ids)
+
+        delete_rows(UserObjectPermission.objects.filter(
+            content_type=ContentType.objects.get_for_model(Task), object_pk__in=[str(pk) for pk in ids],
+        ))
+        delete_rows(TaskVisibility.objects.filter(task_id__in=ids))
+        delete_rows(TaskDependency.objects.filter(Q(blocker_id__in=ids) | Q(blocked_id__in=ids)))
+        delete_rows(TaskComment.objects.filter(task_id__in=ids))
+        delete_rows(TaskAttachment.objects.filter(task_id__in=ids))
+        delete_rows(Task.objects.filter(pk__in=ids))
+    return counts
+
+
+def archive_done_tasks(cutoff, batch_size=BATCH_SIZE):
+    """Archive every qualifying tree of the current schema, ``batch_size`` roots per transaction."""
+    totals = Counter()
+    last_pk = 0
+    while True:
+        roots = candidate_roots(cutoff, last_pk, batch_size)
+        if not roots:
+            return totals
+        last_pk = roots[-1]
+        totals.update(archive_trees(roots, cutoff))
+
+
+def restore_trees(root_ids):
+    """Move the archived trees rooted at ``root_ids`` back to the live tables; returns row counts."""
+    counts = Counter()
+    with transaction.atomic():
+        roots = list(
+            ArchivedTask.objects.filter(pk__in=root_ids, parent_task__isnull=True).values_list('pk', flat=True)
+        )
+        if not roots:
+            return counts
+        trees = reduce(operator.or_, (Q(path__startswith=f'{pk}/') for pk in roots), Q(pk__in=roots))
+        nodes = list(ArchivedTask.objects.filter(trees).select_for_update().order_by('pk').values_list('pk', 'status'))
+        ids = [pk for pk, _ in nodes]
+
+        with connection.cursor() as cursor:
+            counts['tasks'] = _copy(cursor, ArchivedTask, Task, 'id', ids, extra={'rank': ''})
+            counts['comments'] = _copy(cursor, ArchivedTaskComment, TaskComment, 'task_id', ids)
+            counts['attachments'] = _copy(cursor, ArchivedTaskAttachment, TaskAttachment, 'task_id', ids)
+
+        # Archived rows have no rank; append the restored tasks to their columns in id order
+        ranks = {}
+        restored = []
+        for pk, status in nodes:
+            if status not in ranks:
+                ranks[status] = ranking.last_rank(status)
+            ranks[status] = ranking.key_between(ranks[status], None)
+            restored.append(Task(pk=pk, rank=ranks[status]))
+        Task.objects.bulk_update(restored, ['rank'], batch_size=BATCH_SIZE)
+
+        delete_rows(ArchivedTaskComment.objects.filter(task_id__in=ids))
+        delete_rows(ArchivedTaskAttachment.objects.filter(task_id__in=ids))
+        delete_rows(ArchivedTask.objects.filter(pk__in=ids))
+        visibility.refresh_tasks(ids)
+    task_representations.invalidate(ids)
+    return counts
@@ -0,0 +1,22 @@
+"""
+Cached ``TaskSerializer`` representations (see ``task_management_system.cache``),
+built from ``.values()`` rows by ``tasks.representations``.
+
+A task's representation embeds its users, comment and attachment previews,
+roll-ups and, through ``subtasks``, its descendants, so every change to a task
+also invalidates its ancestors. Changes that touch many tasks at once
+(moves, subtree deletes, user edits, roll-up rebuilds) bump the namespace.
+"""
+from task_management_system.cache import RepresentationCache
+
+from .models import Task
+from .representations import build_tasks
+
+task_representations = RepresentationCache('task', build_tasks)
+
+
+def invalidate_task(task_id, path=None):
+    """Invalidate a task and its ancestors; ``path`` is loaded when not given."""
+    if path is None:
+        path = Task.objects.filter(pk=task_id).values_list('path', flat=True).first() or ''
+    task_representations.invalidate([task_id, *(int(pk) for pk in path.split('/') if pk)])
@@ -0,0 +1,116 @@
+"""
+Set-based deletion of task subtrees.
+
+Django's collector loads every cascaded object and deletes it row by row.
+Here a whole subtree goes in a fixed number of statements, however large it
+is: each dependent table is cleared with ``DELETE ... WHERE task_id IN
+(subtree)``. Attachment files are queued for the background cleanup worker
+in the same transaction, and roll-ups of the remaining ancestors are
+adjusted once per parent. Only the roots are read into memory.
+"""
+import operator
+from collections import defaultdict
+from functools import reduce
+
+from django.contrib.contenttypes.models import ContentType
+from django.db import connection, transaction
+from django.db.models import CharField, Q
+from django.db.models.functions import Cast
+from guardian.models import UserObjectPermission
+
+from cleanup.queue import enqueue_queryset
+
+from . import activity, rollup
+from .models import (Task, TaskActivity, TaskAttachment, TaskComment,
+                     TaskDependency, TaskVisibility)
+from .signals import subtrees_deleting
+
+BATCH_SIZE = 200
+
+
+def delete_subtrees(root_ids):
+    """Delete the given tasks with all their descendants; returns the number of tasks deleted."""
+    with transaction.atomic():
+        roots = list(
+            Task.objects.filter(pk__in=root_ids).select_for_update()
+            .values('pk', 'path', 'parent_task_id', 'title', *rollup.SUBTREE_FIELDS)
+        )
+        selected = {root['pk'] for root in roots}
+        # Roots below another selected root are deleted with it
+        roots = [root for root in roots if not selected.intersection(_ancestor_ids(root['path']))]
+        if not roots:
+            return 0
+
+        subtree = Task.objects.filter(reduce(
+            operator.or_,
+            (Q(path__startswith=f"{root['path']}{root['pk']}/") for root in roots),
+            Q(pk__in=[root['pk'] for root in roots]),
+        ))
+        task_ids = subtree.values('pk')
+        subtrees_deleting.send(sender=Task, queryset=subtree)
+
+        enqueue_queryset(TaskAttachment.objects.filter(task__in=task_ids), 'file')
+        delete_rows(UserObjectPermission.objects.filter(
+            content_type=ContentType.objects.get_for_model(Task),
+            object_pk__in=subtree.annotate(object_pk=Cast('pk', CharField())).values('object_pk'),
+        ))
+        delete_rows(TaskVisibility.objects.filter(task__in=task_ids))
+        delete_rows(TaskDependency.objects.filter(Q(blocker__in=task_ids) | Q(blocked__in=task_ids)))
+        delete_rows(TaskComment.objects.filter(task__in=task_ids))
+        delete_rows(TaskAttachment.objects.filter(task__in=task_ids))
+        deleted = delete_rows(subtree)
+
+        # Sibling roots share their ancestors, so each parent is updated once
+        removed = defaultdict(list)
+        for root in roots:
+            if root['parent_task_id'] is not None:
+                removed[root['path']].append(rollup.subtree_contribution(root))
+        for path, contributions in removed.items():
+            rollup.propagate(_ancestor_ids(path), removed=rollup.combined(contributions))
+
+        for root in roots:
+            activity.record(root['pk'], TaskActivity.DELETED, {
+                'title': root['title'], 'subtask_count': root['subtask_count'],
+            })
+    return deleted
+
+
+def delete_matching(queryset, batch_size=BATCH_SIZE):
+    """
+    Delete every task of ``queryset`` with its subtree, ``batch_size`` roots per transaction.
+
+    Tasks are fetched by ascending id in pages, so memory stays bounded; the
+    query is re-run for every page, which skips tasks already removed as
+    descendants of an earlier page.
+    """
+    deleted = 0
+    last_pk = 0
+    queryset = queryset.order_by('pk')
+    while True:
+        root_ids = list(queryset.filter(pk__gt=last_pk).values_list('pk', flat=True)[:batch_size])
+        if not root_ids:
+            return deleted
+        last_pk = root_ids[-1]
+        deleted += delete_subtrees(root_ids)
+
+
+def delete_rows(queryset):
+    """
+    Delete the rows of ``queryset`` with one statement; returns the row count.
+
+    ``QuerySet.delete()`` cannot take its single-statement fast path in this
+    project (django-tenants listens to every ``post_delete``), so it would
+    SELECT all rows first. Callers are responsible for dependent rows.
+    """
+    model = queryset.model
+    quote = connection.ops.quote_name
+    sql, params = queryset.order_by().values('pk').query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {quote(model._meta.db_table)} WHERE {quote(model._meta.pk.column)} IN ({sql})', params,
+        )
+        return cursor.rowcount
+
+
+def _ancestor_ids(path):
+    return [int(pk) for pk in path.split('/') if pk]
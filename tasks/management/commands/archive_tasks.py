@@ -0,0 +1,26 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from tasks.archive import BATCH_SIZE, archive_done_tasks
+
+
+class Command(BaseCommand):
+    help = (
+        'Moves task trees that were completed more than --older-than-days ago, with their comments '
+        'and attachments, into the archive tables. Run it through `all_tenants_command`.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--older-than-days', type=int, default=getattr(settings, 'TASK_ARCHIVE_AFTER_DAYS', 180))
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE, help='Task trees moved per transaction')
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(days=options['older_than_days'])
+        totals = archive_done_tasks(cutoff, options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Archived {totals['tasks']} tasks, {totals['comments']} comments and "
+            f"{totals['attachments']} attachments completed before {cutoff:%Y-%m-%d}"
+        ))
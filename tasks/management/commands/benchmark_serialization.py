@@ -0,0 +1,111 @@
+import time
+
+import orjson
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from rest_framework.renderers import JSONRenderer
+
+from task_management_system.renderers import ORJSONRenderer
+from tasks.models import Task, TaskAttachment, TaskComment
+from tasks.representations import build_tasks
+from tasks.serializers import TaskSerializer
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = (
+        'Compares the CPU time of rendering task list pages with TaskSerializer and the stdlib JSON '
+        'renderer against the .values() fast path and orjson, per 1,000 tasks, and checks that both '
+        'produce the same JSON. Seeds --tasks synthetic tasks (rolled back afterwards) unless '
+        '--existing is given. Run it through `tenant_command`.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tasks', type=int, default=1000, help='Tasks per rendered batch')
+        parser.add_argument('--repeat', type=int, default=5, help='Runs per variant; the fastest one is reported')
+        parser.add_argument('--existing', action='store_true', help='Use the newest existing tasks instead of seeding')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            if not options['existing']:
+                self.seed(options['tasks'])
+            ids = list(Task.objects.order_by('-created_at', '-pk').values_list('pk', flat=True)[:options['tasks']])
+            if not ids:
+                raise CommandError('No tasks to render.')
+            self.compare(ids, options['repeat'])
+            transaction.set_rollback(True)
+
+    def seed(self, count):
+        """``count`` tasks: roots with three subtasks each, two comments and an attachment per task."""
+        user = User.objects.create(username=f'benchmark-{time.time_ns()}', role='admin')
+        tasks = []
+        while len(tasks) < count:
+            root = Task.objects.create(title=f'Task {len(tasks)}', description='Benchmark task', created_by=user)
+            tasks.append(root)
+            for _ in range(min(3, count - len(tasks))):
+                tasks.append(Task.objects.create(
+                    title=f'Task {len(tasks)}', description='Benchmark subtask', created_by=user,
+                    assigned_to=user, parent_task=root,
+                ))
+        TaskComment.objects.bulk_create(
+            TaskComment(task=task, user=user, content=f'Comment {n}') for task in tasks for n in range(2)
+        )
+        TaskAttachment.objects.bulk_create(
+            TaskAttachment(task=task, file='task_attachments/benchmark.txt', uploaded_by=user, size=0)
+            for task in tasks
+        )
+
+    def compare(self, ids, repeat):
+        def serializer():
+            tasks = Task.objects.select_related('created_by', 'assigned_to').with_thread_summary().in_bulk(ids)
+            Task.objects.attach_subtrees(tasks.values())
+            return [TaskSerializer(tasks[pk]).data for pk in ids]
+
+        def fast_path():
+            data = build_tasks(ids)
+            return [data[pk] for pk in ids]
+
+        variants = (
+            ('TaskSerializer + JSONRenderer', serializer, JSONRenderer()),
+            ('.values() + ORJSONRenderer', fast_path, ORJSONRenderer()),
+        )
+        queries = []
+
+        def count_queries(execute, sql, params, many, context):
+            queries.append(sql)
+            return execute(sql, params, many, context)
+
+        results, documents = [], []
+        for label, build, renderer in variants:
+            build_cpu = render_cpu = float('inf')
+            for _ in range(repeat):
+                queries.clear()
+                with connection.execute_wrapper(count_queries):
+                    started = time.process_time()
+                    data = build()
+                    built = time.process_time()
+                    body = renderer.render(data)
+                    rendered = time.process_time()
+                build_cpu = min(build_cpu, built - started)
+                render_cpu = min(render_cpu, rendered - built)
+            results.append((label, build_cpu, render_cpu, len(queries), len(body)))
+            documents.append(orjson.loads(body))
+
+        if documents[0] != documents[1]:
+            raise CommandError('The fast path and TaskSerializer rendered different documents.')
+
+        scale = 1000 / len(ids)
+        self.stdout.write(f'{len(ids)} tasks, best of {repeat}; CPU milliseconds per 1,000 tasks')
+        self.stdout.write(f"{'':32}{'build':>10}{'render':>10}{'total':>10}{'queries':>10}{'bytes':>12}")
+        for label, build_cpu, render_cpu, query_count, size in results:
+            self.stdout.write(
+                f'{label:32}{build_cpu * 1000 * scale:>10.1f}{render_cpu * 1000 * scale:>10.1f}'
+                f'{(build_cpu + render_cpu) * 1000 * scale:>10.1f}{query_count:>10}{size:>12}'
+            )
+        baseline, fast = (build_cpu + render_cpu for _, build_cpu, render_cpu, _, _ in results)
+        self.stdout.write(self.style.SUCCESS(
+            f'Identical output; {(baseline - fast) * 1000 * scale:.1f} ms of CPU saved per 1,000 tasks '
+            f'({baseline / fast:.1f}x faster)'
+        ))
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from tasks.activity import (drop_partitions_before, ensure_partitions,
+                            month_start)
+
+
+class Command(BaseCommand):
+    help = (
+        'Creates the monthly partitions of the task activity log ahead of time and optionally '
+        'drops expired ones. Run it daily through `all_tenants_command`.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--months-ahead', type=int, default=3, help='Months to create beyond the current one')
+        parser.add_argument('--retain-months', type=int, help='Drop partitions older than this many months')
+
+    def handle(self, *args, **options):
+        created = ensure_partitions(options['months_ahead'])
+        self.stdout.write(f'Created partitions: {", ".join(created) or "none"}')
+        if options['retain_months']:
+            dropped = drop_partitions_before(month_start(timezone.now(), -options['retain_months']))
+            self.stdout.write(f'Dropped partitions: {", ".join(dropped) or "none"}')
+        self.stdout.write(self.style.SUCCESS('Task activity partitions are up to date'))
@@ -0,0 +1,143 @@
+import http.client
+import itertools
+import json
+import threading
+import time
+from collections import Counter
+from urllib.parse import urlsplit
+
+from django.core.management.base import BaseCommand, CommandError
+
+RETRYABLE = (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError)
+
+
+def percentile(ordered, fraction):
+    if not ordered:
+        return 0
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+class Client:
+    """One keep-alive connection; a GET on a reused connection the server closed meanwhile is retried once."""
+    def __init__(self, base_url, host, headers, timeout):
+        parts = urlsplit(base_url)
+        connection_class = http.client.HTTPSConnection if parts.scheme == 'https' else http.client.HTTPConnection
+        self.connection = connection_class(parts.hostname, parts.port, timeout=timeout)
+        self.headers = {'Host': host or parts.netloc, 'Accept': 'application/json', **headers}
+        self.reused = False
+
+    def request(self, method, path, body=None):
+        headers = dict(self.headers)
+        if body is not None:
+            body = json.dumps(body).encode()
+            headers['Content-Type'] = 'application/json'
+        for attempt in range(2):
+            reused = self.reused
+            try:
+                self.connection.request(method, path, body, headers)
+                response = self.connection.getresponse()
+                data = response.read()
+            except OSError as exc:
+                # http.client reconnects on the next request once the connection is closed
+                self.connection.close()
+                self.reused = False
+                if attempt or not reused or method != 'GET' or not isinstance(exc, RETRYABLE):
+                    raise
+                continue
+            self.reused = not response.will_close
+            return response.status, data
+
+
+class Command(BaseCommand):
+    help = (
+        'Load-tests a running server: --concurrency clients send GET requests to --path (round robin) '
+        'for --duration seconds, then throughput, latency percentiles, status codes and connection '
+        'errors are reported. Run it during a rolling restart with --fail-on-errors to check that '
+        'deploys and worker recycling drop no requests.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', default='http://localhost:8000', help='Server base URL')
+        parser.add_argument('--host', default='', help='Host header, i.e. the tenant domain')
+        parser.add_argument('--token', default='', help='JWT access token')
+        parser.add_argument('--username', default='', help='Obtain a token with these credentials instead')
+        parser.add_argument('--password', default='')
+        parser.add_argument('--path', action='append', default=[], help='Path to request (repeatable)')
+        parser.add_argument('--concurrency', type=int, default=16)
+        parser.add_argument('--duration', type=float, default=30, help='Seconds')
+        parser.add_argument('--timeout', type=float, default=10, help='Seconds per request')
+        parser.add_argument(
+            '--fail-on-errors', action='store_true', help='Exit with an error on any 5xx or connection error',
+        )
+
+    def handle(self, *args, **options):
+        paths = options['path'] or ['/api/tasks/', '/api/users/']
+        headers = {}
+        token = options['token'] or self.obtain_token(options)
+        if token:
+            headers['Authorization'] = f'Bearer {token}'
+
+        statuses, errors, latencies = Counter(), Counter(), []
+        lock = threading.Lock()
+        cycle = itertools.cycle(paths)
+        deadline = time.monotonic() + options['duration']
+
+        def run():
+            client = Client(options['url'], options['host'], headers, options['timeout'])
+            own_statuses, own_errors, own_latencies = Counter(), Counter(), []
+            while time.monotonic() < deadline:
+                with lock:
+                    path = next(cycle)
+                started = time.perf_counter()
+                try:
+                    status, _ = client.request('GET', path)
+                except OSError as exc:
+                    own_errors[type(exc).__name__] += 1
+                    # e.g. connection refused while nothing listens; don't spin
+                    time.sleep(0.05)
+                    continue
+                own_latencies.append(time.perf_counter() - started)
+                own_statuses[status] += 1
+            with lock:
+                statuses.update(own_statuses)
+                errors.update(own_errors)
+                latencies.extend(own_latencies)
+
+        started = time.monotonic()
+        clients = [threading.Thread(target=run) for _ in range(options['concurrency'])]
+        for thread in clients:
+            thread.start()
+        for thread in clients:
+            thread.join()
+        elapsed = time.monotonic() - started
+
+        latencies.sort()
+        total = sum(statuses.values())
+        self.stdout.write(
+            f"{total} responses in {elapsed:.1f}s from {options['concurrency']} clients "
+            f'({total / elapsed:.1f} requests/s)'
+        )
+        self.stdout.write('latency ms: ' + '  '.join(
+            f'{label} {percentile(latencies, fraction) * 1000:.1f}'
+            for label, fraction in (('p50', 0.5), ('p90', 0.9), ('p99', 0.99), ('max', 1))
+        ))
+        self.stdout.write('status: ' + ', '.join(f'{status}: {count}' for status, count in sorted(statuses.items())))
+        if errors:
+            self.stdout.write('connection errors: ' + ', '.join(f'{name}: {count}' for name, count in errors.items()))
+
+        failed = sum(errors.values()) + sum(count for status, count in statuses.items() if status >= 500)
+        if options['fail_on_errors'] and failed:
+            raise CommandError(f'{failed} requests failed')
+        if not failed:
+            self.stdout.write(self.style.SUCCESS('No failed requests'))
+
+    def obtain_token(self, options):
+        if not options['username']:
+            return ''
+        client = Client(options['url'], options['host'], {}, options['timeout'])
+        status, body = client.request(
+            'POST', '/api/token/', {'username': options['username'], 'password': options['password']},
+        )
+        if status != 200:
+            raise CommandError(f'Could not obtain a token ({status}): {body[:200]!r}')
+        return json.loads(body)['access']
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from tasks import ranking
+from tasks.models import Task
+
+
+class Command(BaseCommand):
+    help = (
+        'Rewrites the board ranks of status columns whose longest rank is longer than '
+        'TASK_RANK_REBALANCE_LENGTH (or that contain unranked tasks) with short consecutive keys, '
+        'keeping their order. Run it through `tenant_command` or `all_tenants_command`.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help='Rebalance every column')
+        parser.add_argument('--max-length', type=int, help='Override TASK_RANK_REBALANCE_LENGTH')
+
+    def handle(self, *args, **options):
+        if options['all']:
+            statuses = [value for value, _ in Task.STATUS_CHOICES]
+        else:
+            statuses = ranking.columns_to_rebalance(options['max_length'])
+        for status in statuses:
+            changed = ranking.rebalance(status)
+            self.stdout.write(f'{status}: {changed} tasks re-ranked')
+        self.stdout.write(self.style.SUCCESS(f'Rebalanced {len(statuses)} columns'))
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from tasks.cache import task_representations
+from tasks.models import Task
+from tasks.rollup import rebuild
+
+
+class Command(BaseCommand):
+    help = (
+        'Recomputes the subtask roll-ups of every task in the current schema. '
+        'Run it through `tenant_command` or `all_tenants_command` after bulk updates.'
+    )
+
+    def handle(self, *args, **options):
+        rebuild(Task)
+        task_representations.bump()
+        self.stdout.write(self.style.SUCCESS('Rebuilt task roll-ups'))
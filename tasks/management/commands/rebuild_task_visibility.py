@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from tasks.models import TaskVisibility
+from tasks.visibility import rebuild_all
+
+
+class Command(BaseCommand):
+    help = (
+        'Rebuilds the task visibility index of the current schema. '
+        'Run it through `tenant_command` or `all_tenants_command`.'
+    )
+
+    def handle(self, *args, **options):
+        rebuild_all()
+        self.stdout.write(self.style.SUCCESS(
+            f'Rebuilt task visibility ({TaskVisibility.objects.count()} rows)'
+        ))
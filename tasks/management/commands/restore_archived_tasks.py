@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from tasks.archive import restore_trees
+
+
+class Command(BaseCommand):
+    help = (
+        'Moves archived task trees, given by the ids of their root tasks, back to the live tables '
+        'with their comments and attachments. Run it through `tenant_command`.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('task_ids', nargs='+', type=int, help='Ids of archived top-level tasks')
+
+    def handle(self, *args, **options):
+        totals = restore_trees(options['task_ids'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Restored {totals['tasks']} tasks, {totals['comments']} comments and "
+            f"{totals['attachments']} attachments"
+        ))
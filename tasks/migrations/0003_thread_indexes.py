@@ -0,0 +1,23 @@
+# Generated by Django 5.1.7 on 2026-10-19 08:53
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0002_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='taskattachment',
+            index=models.Index(fields=['task', 'uploaded_at'], name='taskattach_task_uploaded_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='taskcomment',
+            index=models.Index(fields=['task', 'created_at'], name='taskcomment_task_created_idx'),
+        ),
+    ]
@@ -0,0 +1,69 @@
+# Generated by Django 5.1.7 on 2026-10-19 08:55
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_visibility(apps, schema_editor):
+    # Shares did not exist before this migration, so creators, assignees and
+    # department managers are all there is to backfill.
+    Task = apps.get_model('tasks', 'Task')
+    TaskVisibility = apps.get_model('tasks', 'TaskVisibility')
+    User = apps.get_model(*settings.AUTH_USER_MODEL.split('.'))
+
+    managers = {}
+    for manager_id, department in User.objects.filter(role='manager').exclude(department='').values_list('pk', 'department'):
+        managers.setdefault(department, []).append(manager_id)
+
+    rows = {}
+    tasks = Task.objects.values_list(
+        'pk', 'created_by_id', 'created_by__department', 'assigned_to_id', 'assigned_to__department',
+    ).iterator(chunk_size=2000)
+    for task_id, creator_id, creator_department, assignee_id, assignee_department in tasks:
+        rows[(task_id, creator_id)] = ('creator', True)
+        if assignee_id:
+            rows.setdefault((task_id, assignee_id), ('assignee', True))
+        for department in {creator_department, assignee_department}:
+            for manager_id in managers.get(department, ()):
+                rows.setdefault((task_id, manager_id), ('department', True))
+        if len(rows) >= 5000:
+            _flush(TaskVisibility, rows)
+    _flush(TaskVisibility, rows)
+
+
+def _flush(TaskVisibility, rows):
+    TaskVisibility.objects.bulk_create(
+        [
+            TaskVisibility(task_id=task_id, user_id=user_id, reason=reason, can_change=can_change)
+            for (task_id, user_id), (reason, can_change) in rows.items()
+        ],
+        batch_size=1000,
+        ignore_conflicts=True,
+    )
+    rows.clear()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0003_thread_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TaskVisibility',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('reason', models.CharField(choices=[('creator', 'Creator'), ('assignee', 'Assignee'), ('department', 'Department manager'), ('shared', 'Shared')], max_length=20)),
+                ('can_change', models.BooleanField(default=False)),
+                ('task', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='visibility', to='tasks.task')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='task_visibility', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('user', 'task'), name='taskvisibility_user_task_uniq')],
+            },
+        ),
+        migrations.RunPython(backfill_visibility, migrations.RunPython.noop),
+    ]
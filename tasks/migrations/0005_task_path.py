@@ -0,0 +1,46 @@
+# Generated by Django 5.1.7 on 2026-10-19 08:57
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_paths(apps, schema_editor):
+    # Walk the forest one level at a time, starting from the root tasks
+    Task = apps.get_model('tasks', 'Task')
+    level = {pk: '' for pk in Task.objects.filter(parent_task__isnull=True).values_list('pk', flat=True)}
+    while level:
+        next_level = {}
+        children = Task.objects.filter(parent_task_id__in=list(level)).values_list('pk', 'parent_task_id')
+        updates = []
+        for pk, parent_id in children.iterator(chunk_size=2000):
+            path = f'{level[parent_id]}{parent_id}/'
+            next_level[pk] = path
+            updates.append(Task(pk=pk, path=path, depth=path.count('/')))
+        Task.objects.bulk_update(updates, ['path', 'depth'], batch_size=1000)
+        level = next_level
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0004_task_visibility'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='task',
+            name='depth',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='task',
+            name='path',
+            field=models.CharField(blank=True, default='', editable=False, max_length=1000),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['path'], name='task_path_idx', opclasses=['varchar_pattern_ops']),
+        ),
+        migrations.RunPython(backfill_paths, migrations.RunPython.noop),
+    ]
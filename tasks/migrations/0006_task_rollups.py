@@ -0,0 +1,60 @@
+# Generated by Django 5.1.7 on 2026-10-19 08:59
+
+from django.db import migrations, models
+
+BATCH_SIZE = 1000
+
+
+def _earliest(*values):
+    values = [value for value in values if value is not None]
+    return min(values) if values else None
+
+
+def backfill_rollups(apps, schema_editor):
+    # Frozen copy of tasks.rollup.rebuild: deepest first, so subtree totals are complete when a task is reached
+    Task = apps.get_model('tasks', 'Task')
+    pending = {}
+    changed = []
+    rows = Task.objects.order_by('-depth').values_list('pk', 'parent_task_id', 'status', 'due_date')
+    for pk, parent_id, status, due_date in rows.iterator(chunk_size=BATCH_SIZE):
+        total, done, earliest = pending.pop(pk, (0, 0, None))
+        if total:
+            changed.append(Task(pk=pk, subtask_count=total, done_subtask_count=done, earliest_due_date=earliest))
+        if parent_id is not None:
+            parent = pending.get(parent_id, (0, 0, None))
+            pending[parent_id] = (
+                parent[0] + 1 + total,
+                parent[1] + int(status == 'done') + done,
+                _earliest(parent[2], earliest, due_date if status != 'done' else None),
+            )
+        if len(changed) >= BATCH_SIZE:
+            Task.objects.bulk_update(changed, ['subtask_count', 'done_subtask_count', 'earliest_due_date'])
+            changed = []
+    if changed:
+        Task.objects.bulk_update(changed, ['subtask_count', 'done_subtask_count', 'earliest_due_date'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0005_task_path'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='task',
+            name='done_subtask_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='task',
+            name='earliest_due_date',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='task',
+            name='subtask_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(backfill_rollups, migrations.RunPython.noop),
+    ]
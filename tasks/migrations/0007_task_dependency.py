@@ -0,0 +1,27 @@
+# Generated by Django 5.1.7 on 2026-10-19 09:02
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0006_task_rollups'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TaskDependency',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('blocked', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='blocked_by', to='tasks.task')),
+                ('blocker', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='blocking', to='tasks.task')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['blocked', 'blocker'], name='taskdependency_blocked_idx')],
+                'constraints': [models.UniqueConstraint(fields=('blocker', 'blocked'), name='taskdependency_edge_uniq'), models.CheckConstraint(condition=models.Q(('blocker', models.F('blocked')), _negated=True), name='taskdependency_no_self_edge')],
+            },
+        ),
+    ]
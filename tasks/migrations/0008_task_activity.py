@@ -0,0 +1,69 @@
+# Generated by Django 5.1.7 on 2026-10-19 09:08
+
+from datetime import datetime
+from datetime import timezone as dt_timezone
+
+import django.core.serializers.json
+import django.utils.timezone
+from django.db import migrations, models
+
+CREATE_PARTITIONED_TABLE = """
+    CREATE TABLE tasks_taskactivity (
+        id bigserial NOT NULL,
+        task_id bigint NOT NULL,
+        actor_id bigint NULL,
+        verb varchar(20) NOT NULL,
+        changes jsonb NOT NULL,
+        created_at timestamp with time zone NOT NULL,
+        PRIMARY KEY (id, created_at)
+    ) PARTITION BY RANGE (created_at);
+    CREATE TABLE tasks_taskactivity_default PARTITION OF tasks_taskactivity DEFAULT;
+    CREATE INDEX taskactivity_task_created_idx ON tasks_taskactivity (task_id, created_at DESC, id DESC);
+"""
+
+
+def create_partitions(apps, schema_editor):
+    # This month and the next three; `ensure_activity_partitions` keeps adding them from there
+    now = django.utils.timezone.now()
+    for offset in range(4):
+        month = now.year * 12 + now.month - 1 + offset
+        start = datetime(month // 12, month % 12 + 1, 1, tzinfo=dt_timezone.utc)
+        end = datetime((month + 1) // 12, (month + 1) % 12 + 1, 1, tzinfo=dt_timezone.utc)
+        schema_editor.execute(
+            f'CREATE TABLE tasks_taskactivity_{start:%Y%m} PARTITION OF tasks_taskactivity '
+            'FOR VALUES FROM (%s) TO (%s)',
+            [start, end],
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0007_task_dependency'),
+    ]
+
+    operations = [
+        # Postgres needs the partition key in the primary key, which Django cannot express
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                migrations.RunSQL(CREATE_PARTITIONED_TABLE, 'DROP TABLE tasks_taskactivity'),
+            ],
+            state_operations=[
+                migrations.CreateModel(
+                    name='TaskActivity',
+                    fields=[
+                        ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                        ('task_id', models.BigIntegerField()),
+                        ('actor_id', models.BigIntegerField(blank=True, null=True)),
+                        ('verb', models.CharField(choices=[('created', 'Created'), ('updated', 'Updated'), ('deleted', 'Deleted'), ('commented', 'Commented'), ('comment_deleted', 'Comment deleted'), ('attached', 'Attached a file'), ('attachment_deleted', 'Attachment deleted'), ('shared', 'Shared'), ('unshared', 'Unshared')], max_length=20)),
+                        ('changes', models.JSONField(default=dict, encoder=django.core.serializers.json.DjangoJSONEncoder)),
+                        ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                    ],
+                    options={
+                        'indexes': [models.Index(fields=['task_id', '-created_at', '-id'], name='taskactivity_task_created_idx')],
+                    },
+                ),
+            ],
+        ),
+        migrations.RunPython(create_partitions, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,74 @@
+# Generated by Django 5.1.7 on 2026-10-19 09:11
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0008_task_activity'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedTask',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('title', models.CharField(max_length=200)),
+                ('description', models.TextField()),
+                ('priority', models.CharField(choices=[('low', 'Low'), ('medium', 'Medium'), ('high', 'High'), ('urgent', 'Urgent')], max_length=10)),
+                ('status', models.CharField(choices=[('todo', 'To Do'), ('in_progress', 'In Progress'), ('review', 'In Review'), ('done', 'Done')], max_length=20)),
+                ('due_date', models.DateTimeField(blank=True, null=True)),
+                ('created_at', models.DateTimeField()),
+                ('updated_at', models.DateTimeField()),
+                ('completed_at', models.DateTimeField(blank=True, null=True)),
+                ('path', models.CharField(blank=True, default='', max_length=1000)),
+                ('depth', models.PositiveIntegerField(default=0)),
+                ('subtask_count', models.PositiveIntegerField(default=0)),
+                ('done_subtask_count', models.PositiveIntegerField(default=0)),
+                ('earliest_due_date', models.DateTimeField(blank=True, null=True)),
+                ('archived_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('assigned_to', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('created_by', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('parent_task', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='subtasks', to='tasks.archivedtask')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ArchivedTaskAttachment',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('file', models.FileField(upload_to='task_attachments/')),
+                ('uploaded_at', models.DateTimeField()),
+                ('description', models.CharField(blank=True, max_length=200)),
+                ('task', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='attachments', to='tasks.archivedtask')),
+                ('uploaded_by', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ArchivedTaskComment',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('content', models.TextField()),
+                ('created_at', models.DateTimeField()),
+                ('updated_at', models.DateTimeField()),
+                ('task', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='comments', to='tasks.archivedtask')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='archivedtask',
+            index=models.Index(fields=['path'], name='archivedtask_path_idx', opclasses=['varchar_pattern_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='archivedtaskattachment',
+            index=models.Index(fields=['task', 'uploaded_at'], name='archivedattach_task_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='archivedtaskcomment',
+            index=models.Index(fields=['task', 'created_at'], name='archivedcomment_task_idx'),
+        ),
+    ]
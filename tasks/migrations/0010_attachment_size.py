@@ -0,0 +1,42 @@
+# Generated by Django 5.1.7 on 2026-10-19 09:16
+
+from django.core.files.storage import default_storage
+from django.db import migrations, models
+
+
+def backfill_sizes(apps, schema_editor):
+    # Files that are already gone keep a size of 0 rather than failing the migration
+    for model_name in ('TaskAttachment', 'ArchivedTaskAttachment'):
+        model = apps.get_model('tasks', model_name)
+        changed = []
+        for pk, name in model.objects.filter(size=0).exclude(file='').values_list('pk', 'file').iterator(chunk_size=1000):
+            try:
+                size = default_storage.size(name)
+            except (OSError, NotImplementedError):
+                continue
+            changed.append(model(pk=pk, size=size))
+            if len(changed) >= 1000:
+                model.objects.bulk_update(changed, ['size'])
+                changed = []
+        if changed:
+            model.objects.bulk_update(changed, ['size'])
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0009_task_archive'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='archivedtaskattachment',
+            name='size',
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='taskattachment',
+            name='size',
+            field=models.PositiveBigIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(backfill_sizes, migrations.RunPython.noop),
+    ]
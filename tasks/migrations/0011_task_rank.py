@@ -0,0 +1,52 @@
+# Generated by Django 5.1.7 on 2026-10-19 09:50
+
+from django.conf import settings
+from django.db import migrations, models
+
+DIGITS = '0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz'
+
+
+def sequential_keys(count):
+    """Frozen copy of ``tasks.ranking.sequential_keys``: ``a0``, ``a1``, ... ``az``, ``b00``, ..."""
+    head, digits = 'a', [DIGITS[0]]
+    for _ in range(count):
+        yield head + ''.join(digits)
+        for i in range(len(digits) - 1, -1, -1):
+            value = DIGITS.index(digits[i]) + 1
+            if value < len(DIGITS):
+                digits[i] = DIGITS[value]
+                break
+            digits[i] = DIGITS[0]
+        else:
+            # Every digit wrapped around: one more integer digit, announced by the next head
+            head = chr(ord(head) + 1)
+            digits.append(DIGITS[0])
+
+
+def backfill_ranks(apps, schema_editor):
+    # Existing columns start out oldest first
+    Task = apps.get_model('tasks', 'Task')
+    for status in Task.objects.values_list('status', flat=True).distinct():
+        ids = Task.objects.filter(status=status).order_by('created_at', 'id').values_list('id', flat=True)
+        changed = [Task(pk=pk, rank=key) for pk, key in zip(ids, sequential_keys(len(ids)))]
+        Task.objects.bulk_update(changed, ['rank'], batch_size=1000)
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0010_attachment_size'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='task',
+            name='rank',
+            field=models.CharField(blank=True, db_collation='C', default='', editable=False, max_length=255),
+        ),
+        migrations.RunPython(backfill_ranks, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['status', 'rank', 'id'], name='task_status_rank_idx'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.1.7 on 2026-10-19 10:06
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0011_task_rank'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='archivedtask',
+            index=models.Index(fields=['updated_at'], name='archivedtask_updated_at_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['updated_at'], name='task_updated_at_idx'),
+        ),
+    ]
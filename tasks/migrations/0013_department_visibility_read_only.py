@@ -0,0 +1,31 @@
+from django.db import migrations
+from django.db.models import CharField, Exists, OuterRef
+from django.db.models.functions import Cast
+
+
+def revoke_department_changes(apps, schema_editor):
+    # Department managers only read their department's tasks; write access from a change_task share stays
+    TaskVisibility = apps.get_model('tasks', 'TaskVisibility')
+    UserObjectPermission = apps.get_model('guardian', 'UserObjectPermission')
+    shared = UserObjectPermission.objects.filter(
+        content_type__app_label='tasks',
+        content_type__model='task',
+        permission__codename='change_task',
+        user_id=OuterRef('user_id'),
+        object_pk=Cast(OuterRef('task_id'), CharField()),
+    )
+    TaskVisibility.objects.filter(reason='department', can_change=True).exclude(Exists(shared)).update(
+        can_change=False,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0012_updated_at_indexes'),
+        ('guardian', '0002_generic_permissions_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(revoke_department_changes, migrations.RunPython.noop),
+    ]
@@ -1,7 +1,128 @@
 from django.conf import settings
-from django.db import models
+from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import models, transaction
+from django.db.models import Count, F, OuterRef, Prefetch, Subquery, Value
+from django.db.models.functions import Coalesce, Concat, Substr
 from django.utils import timezone
 
+from cleanup.queue import enqueue_queryset
+
+from . import activity, ranking, rollup
+
+ROLLUP_FIELDS = ('subtask_count', 'done_subtask_count', 'earliest_due_date')
+TREE_FIELDS = ('path', 'depth') + ROLLUP_FIELDS
+# Board position, written by ``tasks.ranking`` (moves, rebalancing) rather than by regular saves
+BOARD_FIELDS = ('rank',)
+# Columns that are bookkeeping rather than user-visible state; never logged as changes
+UNTRACKED_FIELDS = ('id', 'created_at', 'updated_at') + TREE_FIELDS + BOARD_FIELDS
+
+
+def _count_per_task(model):
+    return Coalesce(
+        Subquery(
+            model.objects.filter(task=OuterRef('pk'))
+            .order_by()
+            .values('task')
+            .annotate(count=Count('pk'))
+            .values('count')
+        ),
+        0,
+    )
+
+
+class TaskQuerySet(models.QuerySet):
+    def visible_to(self, user, for_change=False):
+        """
+        Restrict to tasks ``user`` may see (or change) through ``TaskVisibility``.
+
+        Admins see everything; everyone else is resolved with a single join on
+        the precomputed visibility table.
+        """
+        if user.role == 'admin':
+            return self
+        if for_change:
+            return self.filter(visibility__user=user, visibility__can_change=True)
+        return self.filter(visibility__user=user)
+
+    def descendants_of(self, task):
+        """All tasks below ``task``, as one indexed prefix scan on ``path``."""
+        return self.filter(path__startswith=task.subtree_prefix)
+
+    def with_thread_summary(self, preview_size=None):
+        """
+        Annotate comment/attachment counts and prefetch the latest few of each.
+
+        Counts are correlated subqueries on the ``task_id`` indexes, and the
+        previews are sliced prefetches (one windowed query per relation), so
+        the cost does not grow with the size of a task's thread.
+        """
+        if preview_size is None:
+            preview_size = getattr(settings, 'TASK_THREAD_PREVIEW_SIZE', 3)
+        # Live and archived tasks each have their own comment/attachment tables
+        comment_model = self.model._meta.get_field('comments').related_model
+        attachment_model = self.model._meta.get_field('attachments').related_model
+        return self.annotate(
+            comment_count=_count_per_task(comment_model),
+            attachment_count=_count_per_task(attachment_model),
+        ).prefetch_related(
+            Prefetch(
+                'comments',
+                queryset=comment_model.objects.select_related('user').order_by('-created_at', '-id')[:preview_size],
+                to_attr='latest_comments',
+            ),
+            Prefetch(
+                'attachments',
+                queryset=attachment_model.objects.order_by('-uploaded_at', '-id')[:preview_size],
+                to_attr='latest_attachments',
+            ),
+        )
+
+
+    def attach_subtrees(self, tasks):
+        """
+        Load the descendants of ``tasks`` and set ``loaded_subtasks`` on every task of the trees.
+
+        All subtrees are read with one prefix scan, with thread summaries and
+        users, so ``TaskSerializer`` renders the nested subtasks without
+        further queries. Returns ``tasks``.
+        """
+        tasks = list(tasks)
+        # The subtask_count roll-up tells which tasks have any descendants
+        query = models.Q()
+        for task in tasks:
+            if task.subtask_count:
+                query |= models.Q(path__startswith=task.subtree_prefix)
+        descendants = []
+        if query:
+            descendants = list(
+                self.filter(query).select_related('created_by', 'assigned_to').with_thread_summary().order_by('pk')
+            )
+        children = {}
+        for task in descendants:
+            children.setdefault(task.parent_task_id, []).append(task)
+        for task in tasks + descendants:
+            task.loaded_subtasks = children.get(task.pk, [])
+        return tasks
+
+
+class ArchivedTaskQuerySet(TaskQuerySet):
+    def visible_to(self, user, for_change=False):
+        """
+        Archived tasks are read-only and have no visibility rows or shares.
+
+        Their creators, assignees and the managers of those users' departments
+        can read them; admins see all of them.
+        """
+        if for_change:
+            return self.none()
+        if user.role == 'admin':
+            return self
+        query = models.Q(created_by=user) | models.Q(assigned_to=user)
+        if user.role == 'manager' and user.department:
+            query |= models.Q(created_by__department=user.department) | models.Q(assigned_to__department=user.department)
+        return self.filter(query)
+
 
 class Task(models.Model):
     PRIORITY_CHOICES = (
@@ -29,14 +150,194 @@ class Task(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
     completed_at = models.DateTimeField(null=True, blank=True)
     parent_task = models.ForeignKey('self', on_delete=models.CASCADE, null=True, blank=True, related_name='subtasks')
+    # Materialized path of ancestor ids, root first, e.g. "1/5/" for a task
+    # whose parent is 5 and grandparent 1. Maintained by save().
+    path = models.CharField(max_length=1000, blank=True, default='', editable=False)
+    depth = models.PositiveIntegerField(default=0, editable=False)
+    # Roll-ups over all descendants, maintained incrementally by ``tasks.rollup``
+    subtask_count = models.PositiveIntegerField(default=0, editable=False)
+    done_subtask_count = models.PositiveIntegerField(default=0, editable=False)
+    earliest_due_date = models.DateTimeField(null=True, blank=True, editable=False)
+    # Fractional position within the status column (see ``tasks.ranking``); byte-ordered
+    rank = models.CharField(max_length=255, blank=True, default='', editable=False, db_collation='C')
+
+    objects = TaskQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['path'], name='task_path_idx', opclasses=['varchar_pattern_ops']),
+            models.Index(fields=['status', 'rank', 'id'], name='task_status_rank_idx'),
+            # Incremental refreshes of ``tasks.analytics`` read the rows changed since the last one
+            models.Index(fields=['updated_at'], name='task_updated_at_idx'),
+        ]
 
     def __str__(self):
         return self.title
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the loaded values so save hooks can tell what changed
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
+
+    def has_changed(self, *attnames):
+        loaded = getattr(self, '_loaded_values', None)
+        if loaded is None:
+            return True
+        return any(loaded.get(attname) != getattr(self, attname) for attname in attnames)
+
+    @property
+    def ancestor_ids(self):
+        return [int(pk) for pk in self.path.split('/') if pk]
+
+    @property
+    def subtree_prefix(self):
+        """Path prefix shared by every descendant of this task."""
+        return f'{self.path}{self.pk}/'
+
+    def get_ancestors(self):
+        return Task.objects.filter(pk__in=self.ancestor_ids).order_by('depth')
+
+    def get_descendants(self):
+        return Task.objects.descendants_of(self)
+
+    def _path_under(self, parent_id, lock=False):
+        if parent_id is None:
+            return ''
+        parent_path = Task.objects.filter(pk=parent_id).values_list('path', flat=True).first()
+        while lock and parent_path is not None:
+            # Lock this task, the new parent and its ancestors in one statement (pk order), so that two
+            # concurrent moves cannot both pass the check below and close a cycle between them
+            chain = [self.pk, parent_id, *(int(pk) for pk in parent_path.split('/') if pk)]
+            locked = dict(
+                Task.objects.select_for_update().filter(pk__in=[pk for pk in chain if pk is not None])
+                .order_by('pk').values_list('pk', 'path')
+            )
+            if locked.get(parent_id) == parent_path:
+                break
+            # The parent moved before we got the lock; check against its new ancestors
+            parent_path = locked.get(parent_id)
+        if parent_path is None:
+            raise ValidationError({'parent_task': 'Parent task does not exist.'})
+        path = f'{parent_path}{parent_id}/'
+        if self.pk is not None and str(self.pk) in path.split('/'):
+            raise ValidationError({'parent_task': 'A task cannot be moved below itself or one of its subtasks.'})
+        return path
+
+    def validate_parent(self, parent_id):
+        """Raise ``ValidationError`` if re-parenting to ``parent_id`` would create a cycle."""
+        self._path_under(parent_id)
+
     def save(self, *args, **kwargs):
         if self.status == 'done' and not self.completed_at:
             self.completed_at = timezone.now()
-        super().save(*args, **kwargs)
+
+        adding = self._state.adding
+        update_fields = kwargs.get('update_fields')
+        if not adding and update_fields is None:
+            # Tree columns are maintained with set-based UPDATEs and ranks by moves; never write back stale copies
+            update_fields = kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in TREE_FIELDS + BOARD_FIELDS
+            ]
+
+        def touches(*names):
+            return update_fields is None or any(name in update_fields for name in names)
+
+        if adding and not self.rank:
+            self.rank = ranking.rank_at_end(self.status)
+        elif not adding and touches('status') and self.has_changed('status') and not self.has_changed('rank'):
+            # A card that changes columns without a move goes to the end of its new column
+            self.rank = ranking.rank_at_end(self.status, exclude_pk=self.pk)
+            update_fields = kwargs['update_fields'] = set(update_fields) | {'rank'}
+
+        moving = adding or (touches('parent_task', 'parent_task_id') and self.has_changed('parent_task_id'))
+        rollup_changed = not moving and touches('status', 'due_date') and self.has_changed('status', 'due_date')
+
+        # post_save receivers (reminder index, webhook outbox) write in the same transaction. Moves
+        # take a savepoint, so a rejected cycle leaves the caller's transaction usable
+        with transaction.atomic(savepoint=moving):
+            moved_from = None
+            if moving:
+                self.path = self._path_under(self.parent_task_id, lock=True)
+                self.depth = self.path.count('/')
+                if not adding:
+                    # Read after the lock above, so the subtree totals cannot be stale
+                    moved_from = (
+                        Task.objects.filter(pk=self.pk).values('path', 'depth', *rollup.SUBTREE_FIELDS).first()
+                    )
+                    for name in ROLLUP_FIELDS:
+                        setattr(self, name, moved_from[name])
+                    kwargs['update_fields'] = set(update_fields) | {'path', 'depth'}
+            super().save(*args, **kwargs)
+            if adding:
+                rollup.propagate(self.ancestor_ids, added=rollup.own_contribution(self.status, self.due_date))
+            elif moved_from is not None:
+                self._move_subtree(moved_from)
+            elif rollup_changed:
+                rollup.propagate(
+                    self.ancestor_ids,
+                    added=rollup.own_contribution(self.status, self.due_date),
+                    removed=rollup.own_contribution(self._loaded_values['status'], self._loaded_values['due_date']),
+                )
+        changes = self.activity_changes(None if adding else kwargs['update_fields'])
+        if adding or changes:
+            activity.record(self.pk, TaskActivity.CREATED if adding else TaskActivity.UPDATED, changes)
+        self._loaded_values = {field.attname: getattr(self, field.attname) for field in self._meta.concrete_fields}
+
+    def activity_changes(self, update_fields=None):
+        """``{field: [old, new]}`` for the tracked fields written by this save."""
+        loaded = getattr(self, '_loaded_values', None)
+        changes = {}
+        for field in self._meta.concrete_fields:
+            if field.name in UNTRACKED_FIELDS:
+                continue
+            if update_fields is not None and field.name not in update_fields and field.attname not in update_fields:
+                continue
+            if loaded is not None and field.attname not in loaded:
+                continue  # deferred and never read, so not changed either
+            old = loaded[field.attname] if loaded is not None else None
+            new = getattr(self, field.attname)
+            if old != new:
+                changes[field.name] = [old, new]
+        return changes
+
+    def _move_subtree(self, moved_from):
+        old_prefix = f"{moved_from['path']}{self.pk}/"
+        if old_prefix != self.subtree_prefix:
+            # Move the whole subtree in one statement
+            Task.objects.filter(path__startswith=old_prefix).update(
+                path=Concat(Value(self.subtree_prefix), Substr('path', len(old_prefix) + 1)),
+                depth=F('depth') + (self.depth - moved_from['depth']),
+            )
+        old_ancestors = [int(pk) for pk in moved_from['path'].split('/') if pk]
+        rollup.propagate(old_ancestors, removed=rollup.subtree_contribution(moved_from))
+        rollup.propagate(
+            self.ancestor_ids,
+            added=rollup.subtree_contribution({name: getattr(self, name) for name in rollup.SUBTREE_FIELDS}),
+        )
+
+    def delete(self, *args, **kwargs):
+        # QuerySet.delete() bypasses this; use tasks.deletion for bulk deletes
+        current = Task.objects.filter(pk=self.pk).values('path', *rollup.SUBTREE_FIELDS).first()
+        task_id = self.pk
+        with transaction.atomic():
+            # Cascaded attachment rows go with the subtree; their files go to the cleanup queue
+            enqueue_queryset(
+                TaskAttachment.objects.filter(models.Q(task=self) | models.Q(task__path__startswith=self.subtree_prefix)),
+                'file',
+            )
+            result = super().delete(*args, **kwargs)
+            if current is not None:
+                rollup.propagate(
+                    [int(pk) for pk in current['path'].split('/') if pk],
+                    removed=rollup.subtree_contribution(current),
+                )
+                activity.record(
+                    task_id, TaskActivity.DELETED, {'title': self.title, 'subtask_count': current['subtask_count']},
+                )
+        return result
 
 class TaskComment(models.Model):
     task = models.ForeignKey(Task, on_delete=models.CASCADE, related_name='comments')
@@ -45,15 +346,207 @@ class TaskComment(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['task', 'created_at'], name='taskcomment_task_created_idx'),
+        ]
+
     def __str__(self):
         return f'Comment by {self.user.username} on {self.task.title}'
 
+    def save(self, *args, **kwargs):
+        # post_save receivers (webhook outbox) write in the same transaction
+        with transaction.atomic(savepoint=False):
+            super().save(*args, **kwargs)
+
 class TaskAttachment(models.Model):
     task = models.ForeignKey(Task, on_delete=models.CASCADE, related_name='attachments')
     file = models.FileField(upload_to='task_attachments/')
     uploaded_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
     uploaded_at = models.DateTimeField(auto_now_add=True)
     description = models.CharField(max_length=200, blank=True)
+    # Stored so usage reports can sum bytes without touching the storage
+    size = models.PositiveBigIntegerField(default=0, editable=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['task', 'uploaded_at'], name='taskattach_task_uploaded_idx'),
+        ]
 
     def __str__(self):
         return f'Attachment for {self.task.title}'
+
+    def save(self, *args, **kwargs):
+        if self.file and not self.size:
+            self.size = self.file.size
+        with transaction.atomic(savepoint=False):
+            super().save(*args, **kwargs)
+
+class TaskVisibility(models.Model):
+    """
+    Precomputed "who can see which task" index.
+
+    One row per (task, user) pair for creators, assignees, managers of the
+    creator's or assignee's department and users the task was shared with
+    through django-guardian. Maintained incrementally by ``tasks.visibility``.
+    """
+    CREATOR = 'creator'
+    ASSIGNEE = 'assignee'
+    DEPARTMENT = 'department'
+    SHARED = 'shared'
+    REASON_CHOICES = (
+        (CREATOR, 'Creator'),
+        (ASSIGNEE, 'Assignee'),
+        (DEPARTMENT, 'Department manager'),
+        (SHARED, 'Shared'),
+    )
+
+    task = models.ForeignKey(Task, on_delete=models.CASCADE, related_name='visibility')
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='task_visibility')
+    reason = models.CharField(max_length=20, choices=REASON_CHOICES)
+    can_change = models.BooleanField(default=False)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'task'], name='taskvisibility_user_task_uniq'),
+        ]
+
+    def __str__(self):
+        return f'{self.user_id} can see {self.task_id} ({self.reason})'
+
+class TaskDependency(models.Model):
+    """Directed edge: ``blocked`` cannot be finished before ``blocker``."""
+    blocker = models.ForeignKey(Task, on_delete=models.CASCADE, related_name='blocking')
+    blocked = models.ForeignKey(Task, on_delete=models.CASCADE, related_name='blocked_by')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['blocker', 'blocked'], name='taskdependency_edge_uniq'),
+            models.CheckConstraint(condition=~models.Q(blocker=models.F('blocked')), name='taskdependency_no_self_edge'),
+        ]
+        indexes = [
+            models.Index(fields=['blocked', 'blocker'], name='taskdependency_blocked_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.blocker_id} blocks {self.blocked_id}'
+
+class TaskActivity(models.Model):
+    """
+    One entry of a task's append-only history.
+
+    The table is range-partitioned by month on ``created_at`` (migration
+    0008, ``ensure_activity_partitions``), which is why the primary key is
+    ``(id, created_at)`` in the database. Task and actor are plain ids so
+    that entries outlive the rows they describe. Written by ``tasks.activity``.
+    """
+    CREATED = 'created'
+    UPDATED = 'updated'
+    DELETED = 'deleted'
+    COMMENTED = 'commented'
+    COMMENT_DELETED = 'comment_deleted'
+    ATTACHED = 'attached'
+    ATTACHMENT_DELETED = 'attachment_deleted'
+    SHARED = 'shared'
+    UNSHARED = 'unshared'
+    VERB_CHOICES = (
+        (CREATED, 'Created'),
+        (UPDATED, 'Updated'),
+        (DELETED, 'Deleted'),
+        (COMMENTED, 'Commented'),
+        (COMMENT_DELETED, 'Comment deleted'),
+        (ATTACHED, 'Attached a file'),
+        (ATTACHMENT_DELETED, 'Attachment deleted'),
+        (SHARED, 'Shared'),
+        (UNSHARED, 'Unshared'),
+    )
+
+    task_id = models.BigIntegerField()
+    actor_id = models.BigIntegerField(null=True, blank=True)
+    verb = models.CharField(max_length=20, choices=VERB_CHOICES)
+    changes = models.JSONField(default=dict, encoder=DjangoJSONEncoder)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['task_id', '-created_at', '-id'], name='taskactivity_task_created_idx'),
+        ]
+
+    def __str__(self):
+        return f'Task {self.task_id} {self.verb} by {self.actor_id} at {self.created_at}'
+
+class ArchivedTask(models.Model):
+    """
+    Cold copy of a finished task tree, moved out of ``Task`` by ``tasks.archive``.
+
+    Rows keep their original ids, so live and archived tasks never collide and
+    history entries (``TaskActivity.task_id``) still point at them. The columns
+    mirror ``Task`` so ``TaskSerializer`` can render both.
+    """
+    id = models.BigIntegerField(primary_key=True)
+    title = models.CharField(max_length=200)
+    description = models.TextField()
+    created_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='+')
+    assigned_to = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    priority = models.CharField(max_length=10, choices=Task.PRIORITY_CHOICES)
+    status = models.CharField(max_length=20, choices=Task.STATUS_CHOICES)
+    due_date = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    completed_at = models.DateTimeField(null=True, blank=True)
+    parent_task = models.ForeignKey('self', on_delete=models.CASCADE, null=True, blank=True, related_name='subtasks')
+    path = models.CharField(max_length=1000, blank=True, default='')
+    depth = models.PositiveIntegerField(default=0)
+    subtask_count = models.PositiveIntegerField(default=0)
+    done_subtask_count = models.PositiveIntegerField(default=0)
+    earliest_due_date = models.DateTimeField(null=True, blank=True)
+    archived_at = models.DateTimeField(default=timezone.now)
+
+    objects = ArchivedTaskQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['path'], name='archivedtask_path_idx', opclasses=['varchar_pattern_ops']),
+            models.Index(fields=['updated_at'], name='archivedtask_updated_at_idx'),
+        ]
+
+    def __str__(self):
+        return self.title
+
+    @property
+    def subtree_prefix(self):
+        return f'{self.path}{self.pk}/'
+
+class ArchivedTaskComment(models.Model):
+    id = models.BigIntegerField(primary_key=True)
+    task = models.ForeignKey(ArchivedTask, on_delete=models.CASCADE, related_name='comments')
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='+')
+    content = models.TextField()
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['task', 'created_at'], name='archivedcomment_task_idx'),
+        ]
+
+    def __str__(self):
+        return f'Archived comment {self.pk} on task {self.task_id}'
+
+class ArchivedTaskAttachment(models.Model):
+    id = models.BigIntegerField(primary_key=True)
+    task = models.ForeignKey(ArchivedTask, on_delete=models.CASCADE, related_name='attachments')
+    file = models.FileField(upload_to='task_attachments/')
+    uploaded_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='+')
+    uploaded_at = models.DateTimeField()
+    description = models.CharField(max_length=200, blank=True)
+    size = models.PositiveBigIntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['task', 'uploaded_at'], name='archivedattach_task_idx'),
+        ]
+
+    def __str__(self):
+        return f'Archived attachment {self.pk} of task {self.task_id}'
@@ -0,0 +1,42 @@
+from rest_framework.pagination import CursorPagination
+
+
+class TaskCommentCursorPagination(CursorPagination):
+    """
+    Keyset pagination over a task's comments, newest first.
+
+    Pages are resolved on the ``(task_id, created_at)`` index instead of with
+    an OFFSET, so deep pages of busy threads cost the same as the first one.
+    """
+    ordering = ('-created_at', '-id')
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+
+class TaskAttachmentCursorPagination(CursorPagination):
+    """Keyset pagination over a task's attachments on ``(task_id, uploaded_at)``."""
+    ordering = ('-uploaded_at', '-id')
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+
+class TaskActivityCursorPagination(CursorPagination):
+    """Keyset pagination over a task's history on ``(task_id, created_at, id)``, newest first."""
+    ordering = ('-created_at', '-id')
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 200
+
+
+class TaskBoardCursorPagination(CursorPagination):
+    """
+    Keyset pagination over one board column on the ``(status, rank, id)``
+    index. The board view runs one per column, each with its own
+    ``<status>_cursor`` query parameter.
+    """
+    ordering = ('rank', 'id')
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
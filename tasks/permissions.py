@@ -1,29 +1,35 @@
 from rest_framework import permissions
 
+# Object checks are pushed down into SQL: views pass their querysets through
+# ``filter_queryset`` of each permission, so tasks the user may not access are
+# simply never loaded (404) instead of being loaded and rejected one by one.
+
 
 class IsTaskAssigneeOrAdmin(permissions.BasePermission):
     """
-    Custom permission to only allow task assignees, creators, or admins to edit tasks.
+    Custom permission to only allow admins and users listed in the task's
+    visibility index (creators, assignees, department managers, shared users)
+    to view tasks, and only those with change rights to edit them.
     """
     def has_permission(self, request, view):
         return request.user and request.user.is_authenticated
 
-    def has_object_permission(self, request, view, obj):
-        # Allow admins to perform any action
-        if request.user.role == 'admin':
-            return True
-        
-        # Allow task creators and assignees to view and edit their tasks
-        return obj.created_by == request.user or obj.assigned_to == request.user
+    def filter_queryset(self, request, view, queryset):
+        # Commenting and attaching files only needs the task to be visible
+        for_change = (
+            request.method not in permissions.SAFE_METHODS
+            and getattr(view, 'action', None) not in getattr(view, 'participation_actions', ())
+        )
+        return queryset.visible_to(request.user, for_change=for_change)
 
 class IsTaskCreatorOrAdmin(permissions.BasePermission):
     """
     Custom permission to only allow task creators or admins to delete tasks.
     """
-    def has_object_permission(self, request, view, obj):
+    def filter_queryset(self, request, view, queryset):
         # Allow admins to perform any action
         if request.user.role == 'admin':
-            return True
-        
+            return queryset
+
         # Allow task creators to delete their tasks
-        return obj.created_by == request.user 
\ No newline at end of file
+        return queryset.filter(created_by=request.user)
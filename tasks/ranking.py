@@ -0,0 +1,246 @@
+"""
+Board order of tasks as fractional, lexicographically sortable keys.
+
+Every task has a ``rank`` within its status column. Moving a card computes
+a key between the ranks of its new neighbours, so a move writes exactly one
+row no matter how many cards the column holds; nothing is renumbered.
+
+Keys are base-62 strings with an integer part and an optional fraction.
+The first character encodes the length of the integer part ('a' = one
+digit, 'b' = two, ...). Appending to a column increments the integer, so
+keys grow logarithmically with the column. Inserting between two cards
+extends the fraction, which grows by about one character every five
+inserts at the same spot. ``rebalance()`` rewrites a column with short,
+consecutive keys. ``rebalance_task_ranks`` runs it for columns whose
+longest key passed ``TASK_RANK_REBALANCE_LENGTH``. A move that would exceed
+``RANK_MAX_LENGTH``, or that lands between two cards of equal rank, also
+rebalances the column first.
+
+Keys compare as byte strings; the column uses the "C" collation so that
+PostgreSQL orders them the same way Python does.
+"""
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Max, Min, Q
+from django.db.models.functions import Length
+
+DIGITS = '0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz'
+BASE = len(DIGITS)
+FIRST_KEY = 'a' + DIGITS[0]
+SMALLEST_INTEGER = 'A' + DIGITS[0] * 26
+RANK_MAX_LENGTH = 200
+
+
+class RankError(ValueError):
+    pass
+
+
+def _integer_length(head):
+    if 'a' <= head <= 'z':
+        return ord(head) - ord('a') + 2
+    if 'A' <= head <= 'Z':
+        return ord('Z') - ord(head) + 2
+    raise RankError(f'Invalid rank head {head!r}.')
+
+
+def _split(key):
+    """``(integer part, fraction)`` of a key."""
+    length = _integer_length(key[0])
+    if length > len(key) or key == SMALLEST_INTEGER or key[length:].endswith(DIGITS[0]):
+        raise RankError(f'Invalid rank {key!r}.')
+    return key[:length], key[length:]
+
+
+def _midpoint(a, b):
+    """A fraction strictly between fractions ``a`` and ``b`` (``None``: 1)."""
+    if b is not None:
+        n = 0
+        while n < len(b) and (a[n] if n < len(a) else DIGITS[0]) == b[n]:
+            n += 1
+        if n:
+            return b[:n] + _midpoint(a[n:], b[n:])
+    low = DIGITS.index(a[0]) if a else 0
+    high = DIGITS.index(b[0]) if b is not None else BASE
+    if high - low > 1:
+        return DIGITS[(low + high + 1) // 2]
+    if b is not None and len(b) > 1:
+        return b[0]
+    return DIGITS[low] + _midpoint(a[1:], None)
+
+
+def _increment(integer):
+    head, digits = integer[0], list(integer[1:])
+    for i in range(len(digits) - 1, -1, -1):
+        value = DIGITS.index(digits[i]) + 1
+        if value < BASE:
+            digits[i] = DIGITS[value]
+            return head + ''.join(digits)
+        digits[i] = DIGITS[0]
+    if head == 'Z':
+        return 'a' + DIGITS[0]
+    if head == 'z':
+        return None
+    head = chr(ord(head) + 1)
+    if head > 'a':
+        digits.append(DIGITS[0])
+    else:
+        digits.pop()
+    return head + ''.join(digits)
+
+
+def _decrement(integer):
+    head, digits = integer[0], list(integer[1:])
+    for i in range(len(digits) - 1, -1, -1):
+        value = DIGITS.index(digits[i]) - 1
+        if value >= 0:
+            digits[i] = DIGITS[value]
+            return head + ''.join(digits)
+        digits[i] = DIGITS[-1]
+    if head == 'a':
+        return 'Z' + DIGITS[-1]
+    if head == 'A':
+        return None
+    head = chr(ord(head) - 1)
+    if head < 'Z':
+        digits.append(DIGITS[-1])
+    else:
+        digits.pop()
+    return head + ''.join(digits)
+
+
+def key_between(a, b):
+    """A key sorting strictly between ``a`` and ``b``; ``None`` (or ``''``) leaves that side open."""
+    a, b = a or None, b or None
+    if a is not None and b is not None and a >= b:
+        raise RankError(f'{a!r} does not sort before {b!r}.')
+    if a is None and b is None:
+        return FIRST_KEY
+    if a is None:
+        integer, fraction = _split(b)
+        if integer == SMALLEST_INTEGER:
+            return integer + _midpoint('', fraction)
+        if integer < b:
+            return integer
+        lower = _decrement(integer)
+        if lower is None:
+            raise RankError('No key sorts before the smallest one.')
+        return lower
+    integer, fraction = _split(a)
+    if b is None:
+        higher = _increment(integer)
+        return integer + _midpoint(fraction, None) if higher is None else higher
+    other_integer, other_fraction = _split(b)
+    if integer == other_integer:
+        return integer + _midpoint(fraction, other_fraction)
+    higher = _increment(integer)
+    if higher is not None and higher < b:
+        return higher
+    return integer + _midpoint(fraction, None)
+
+
+def sequential_keys(count):
+    """``count`` short, consecutive keys: ``a0``, ``a1``, ... ``az``, ``b00``, ..."""
+    key = FIRST_KEY
+    for _ in range(count):
+        yield key
+        key = _increment(key)
+
+
+def last_rank(status, exclude_pk=None):
+    """The highest rank in a column: one backward scan of the ``(status, rank)`` index."""
+    from .models import Task
+
+    queryset = Task.objects.filter(status=status)
+    if exclude_pk is not None:
+        queryset = queryset.exclude(pk=exclude_pk)
+    return queryset.order_by('-rank', '-pk').values_list('rank', flat=True).first()
+
+
+def rank_at_end(status, exclude_pk=None):
+    return key_between(last_rank(status, exclude_pk), None)
+
+
+def neighbours(task_id, status, after=None, before=None):
+    """
+    ``(lower, upper)`` ranks of the gap between the cards ``after`` and
+    ``before``. When only one of them is given, the card next to it in the
+    column is looked up. Without either, the gap is the end of the column.
+    """
+    from .models import Task
+
+    column = Task.objects.filter(status=status).exclude(pk=task_id)
+    if after is None and before is None:
+        return last_rank(status, exclude_pk=task_id), None
+    if after is not None:
+        lower = after.rank
+        if before is not None:
+            return lower, before.rank
+        upper = (
+            column.filter(Q(rank__gt=after.rank) | Q(rank=after.rank, pk__gt=after.pk))
+            .order_by('rank', 'pk').values_list('rank', flat=True).first()
+        )
+        return lower, upper
+    lower = (
+        column.filter(Q(rank__lt=before.rank) | Q(rank=before.rank, pk__lt=before.pk))
+        .order_by('-rank', '-pk').values_list('rank', flat=True).first()
+    )
+    return lower, before.rank
+
+
+def move(task, status, after=None, before=None):
+    """Put ``task`` in column ``status`` between the tasks ``after`` (above) and ``before`` (below)."""
+    for attempt in range(2):
+        lower, upper = neighbours(task.pk, status, after, before)
+        try:
+            rank = key_between(lower, upper)
+        except RankError:
+            rank = None
+        if rank is not None and len(rank) <= RANK_MAX_LENGTH:
+            break
+        if attempt:
+            raise RankError(f'Cannot place task {task.pk} between {lower!r} and {upper!r}.')
+        # Equal neighbours or an overlong key: spread the column out and look the neighbours up again
+        rebalance(status)
+        for neighbour in (after, before):
+            if neighbour is not None:
+                neighbour.refresh_from_db(fields=['rank'])
+
+    task.rank = rank
+    if task.status == status:
+        task.save(update_fields=['rank'])
+    else:
+        task.status = status
+        task.save(update_fields=['rank', 'status', 'completed_at', 'updated_at'])
+    return task
+
+
+def rebalance(status):
+    """Rewrite a column with consecutive keys in its current order; returns the number of rows changed."""
+    from .models import Task
+
+    with transaction.atomic():
+        rows = list(
+            Task.objects.filter(status=status).select_for_update().order_by('rank', 'pk').values_list('pk', 'rank')
+        )
+        changed = [
+            Task(pk=pk, rank=key)
+            for (pk, rank), key in zip(rows, sequential_keys(len(rows)))
+            if rank != key
+        ]
+        Task.objects.bulk_update(changed, ['rank'], batch_size=1000)
+    return len(changed)
+
+
+def columns_to_rebalance(max_length=None):
+    """Statuses whose longest rank is longer than ``max_length``, or that contain unranked tasks."""
+    from .models import Task
+
+    if max_length is None:
+        max_length = getattr(settings, 'TASK_RANK_REBALANCE_LENGTH', 12)
+    return list(
+        Task.objects.values('status')
+        .annotate(longest=Max(Length('rank')), shortest=Min(Length('rank')))
+        .filter(Q(longest__gt=max_length) | Q(shortest=0))
+        .order_by('status')
+        .values_list('status', flat=True)
+    )
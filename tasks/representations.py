@@ -0,0 +1,160 @@
+"""
+``TaskSerializer`` output built from ``.values()`` rows (see
+``task_management_system.representations``).
+
+A batch of tasks is loaded with a fixed number of queries, however many
+tasks, subtasks, comments and users it touches: the tasks, their
+descendants (one prefix scan per task that has any, according to the
+``subtask_count`` roll-up), comment and attachment counts with the latest
+few of each (one windowed query per relation) and the users they refer to.
+Subtask trees are assembled deepest first, so nothing recurses.
+"""
+from django.conf import settings
+from django.db.models import Count, F, Q, Window
+from django.db.models.functions import RowNumber
+
+from task_management_system.representations import datetime_value, file_url
+from users.representations import USER_COLUMNS, User, user_representation
+
+from .models import Task, TaskAttachment, TaskComment
+
+TASK_COLUMNS = (
+    'id', 'title', 'description', 'created_by', 'assigned_to', 'priority', 'status',
+    'due_date', 'created_at', 'updated_at', 'completed_at', 'parent_task', 'path', 'depth',
+    'subtask_count', 'done_subtask_count', 'earliest_due_date',
+)
+COMMENT_COLUMNS = ('id', 'task', 'user', 'content', 'created_at', 'updated_at')
+ATTACHMENT_COLUMNS = ('id', 'file', 'uploaded_by', 'uploaded_at', 'description')
+
+
+def _latest(model, task_ids, columns, order_by, preview_size):
+    """``({task_id: count}, {task_id: [latest rows]})`` in one windowed query."""
+    rows = (
+        model.objects.filter(task_id__in=task_ids)
+        # values() goes first: selecting columns after filtering on a window breaks the outer query
+        .values(*columns, owner=F('task_id'))
+        .annotate(
+            rank=Window(RowNumber(), partition_by=F('task_id'), order_by=[F(order_by).desc(), F('id').desc()]),
+            total=Window(Count('id'), partition_by=F('task_id')),
+        )
+        .filter(rank__lte=preview_size)
+        .order_by('owner', 'rank')
+    )
+    counts, latest = {}, {}
+    for row in rows:
+        task_id = row.pop('owner')
+        del row['rank']
+        counts[task_id] = row.pop('total')
+        latest.setdefault(task_id, []).append(row)
+    return counts, latest
+
+
+class _Batch:
+    """Rows loaded for one ``build_tasks`` call and the representations built from them."""
+    def __init__(self, task_rows, preview_size):
+        task_ids = [row['id'] for row in task_rows]
+        self.comment_counts, self.comments = _latest(
+            TaskComment, task_ids, COMMENT_COLUMNS, 'created_at', preview_size,
+        )
+        self.attachment_counts, self.attachments = _latest(
+            TaskAttachment, task_ids, ATTACHMENT_COLUMNS, 'uploaded_at', preview_size,
+        )
+        user_ids = {row['created_by'] for row in task_rows}
+        user_ids.update(row['assigned_to'] for row in task_rows)
+        user_ids.update(row['user'] for rows in self.comments.values() for row in rows)
+        user_ids.discard(None)
+        self.users = {row['id']: row for row in User.objects.filter(pk__in=user_ids).values(*USER_COLUMNS)}
+        self.attachment_storage = TaskAttachment._meta.get_field('file').storage
+        self._user_representations = {}
+
+    def user(self, pk, request):
+        if pk is None:
+            return None
+        key = (pk, request is not None)
+        if key not in self._user_representations:
+            self._user_representations[key] = user_representation(self.users[pk], request)
+        return self._user_representations[key]
+
+    def comment(self, row, request):
+        return {
+            'id': row['id'],
+            'task': row['task'],
+            'user': self.user(row['user'], request),
+            'content': row['content'],
+            'created_at': datetime_value(row['created_at']),
+            'updated_at': datetime_value(row['updated_at']),
+        }
+
+    def attachment(self, row, request):
+        return {
+            'id': row['id'],
+            'file': file_url(row['file'], request, self.attachment_storage),
+            'uploaded_by': row['uploaded_by'],
+            'uploaded_at': datetime_value(row['uploaded_at']),
+            'description': row['description'],
+        }
+
+    def task(self, row, request, subtasks):
+        pk = row['id']
+        total, done = row['subtask_count'], row['done_subtask_count']
+        return {
+            'id': pk,
+            'title': row['title'],
+            'description': row['description'],
+            'created_by': self.user(row['created_by'], request),
+            'assigned_to': self.user(row['assigned_to'], request),
+            'priority': row['priority'],
+            'status': row['status'],
+            'due_date': datetime_value(row['due_date']),
+            'created_at': datetime_value(row['created_at']),
+            'updated_at': datetime_value(row['updated_at']),
+            'completed_at': datetime_value(row['completed_at']),
+            'parent_task': row['parent_task'],
+            'path': row['path'],
+            'depth': row['depth'],
+            'subtask_count': total,
+            'done_subtask_count': done,
+            'open_subtask_count': total - done,
+            'progress': round(100 * done / total, 1) if total else None,
+            'earliest_due_date': datetime_value(row['earliest_due_date']),
+            'comment_count': self.comment_counts.get(pk, 0),
+            'latest_comments': [self.comment(comment, request) for comment in self.comments.get(pk, ())],
+            'attachment_count': self.attachment_counts.get(pk, 0),
+            'latest_attachments': [
+                self.attachment(attachment, request) for attachment in self.attachments.get(pk, ())
+            ],
+            'subtasks': subtasks,
+        }
+
+
+def build_tasks(ids, context=None):
+    """
+    ``{pk: representation}`` of the tasks in ``ids`` that exist, equal to
+    ``TaskSerializer(task, context=context).data``.
+    """
+    request = (context or {}).get('request')
+    preview_size = getattr(settings, 'TASK_THREAD_PREVIEW_SIZE', 3)
+    rows = list(Task.objects.filter(pk__in=ids).values(*TASK_COLUMNS))
+    if not rows:
+        return {}
+
+    prefixes = [f"{row['path']}{row['id']}/" for row in rows if row['subtask_count']]
+    descendants = []
+    if prefixes:
+        query = Q()
+        for prefix in prefixes:
+            query |= Q(path__startswith=prefix)
+        # Subtrees of the batch can overlap, e.g. when a task and its parent are both listed
+        descendants = list(Task.objects.filter(query).distinct().values(*TASK_COLUMNS))
+
+    loaded = {row['id']: row for row in descendants}
+    loaded.update((row['id'], row) for row in rows)
+    batch = _Batch(list(loaded.values()), preview_size)
+
+    # Deepest first, so every child's representation exists before its parent's
+    children = {}
+    for row in sorted(descendants, key=lambda row: (-row['depth'], row['id'])):
+        children.setdefault(row['parent_task'], []).append(
+            batch.task(row, request, children.get(row['id'], [])),
+        )
+    return {row['id']: batch.task(row, request, children.get(row['id'], [])) for row in rows}
@@ -0,0 +1,141 @@
+"""
+Roll-up aggregates of parent tasks.
+
+Every task stores aggregates over its whole subtree (not counting itself):
+``subtask_count``, ``done_subtask_count`` and ``earliest_due_date`` of the
+subtasks that are still open. Changes are propagated as deltas to all
+ancestors (taken from ``Task.path``) with one UPDATE statement. The minimum
+due date is only recomputed, with one aggregate over the affected subtree,
+when the value being removed was the current minimum of some ancestor.
+"""
+from dataclasses import dataclass
+from datetime import datetime
+
+from django.db.models import F, Min, Q, Value
+from django.db.models.functions import Least
+
+DONE = 'done'
+
+
+@dataclass(frozen=True)
+class Contribution:
+    """What a task (optionally with its subtree) adds to each of its ancestors."""
+    total: int
+    done: int
+    due: datetime | None
+
+
+def _open_due(status, due_date):
+    return due_date if status != DONE else None
+
+
+def _earliest(*values):
+    values = [value for value in values if value is not None]
+    return min(values) if values else None
+
+
+def own_contribution(status, due_date):
+    return Contribution(1, int(status == DONE), _open_due(status, due_date))
+
+
+# Columns ``subtree_contribution`` reads, whether from a task or a ``.values()`` row
+SUBTREE_FIELDS = ('status', 'due_date', 'subtask_count', 'done_subtask_count', 'earliest_due_date')
+
+
+def subtree_contribution(values):
+    """Contribution of a task and its descendants, from a mapping of ``SUBTREE_FIELDS``."""
+    return Contribution(
+        1 + values['subtask_count'],
+        int(values['status'] == DONE) + values['done_subtask_count'],
+        _earliest(_open_due(values['status'], values['due_date']), values['earliest_due_date']),
+    )
+
+
+def combined(contributions):
+    """One contribution for several sibling subtrees that change together."""
+    contributions = list(contributions)
+    return Contribution(
+        sum(c.total for c in contributions),
+        sum(c.done for c in contributions),
+        _earliest(*(c.due for c in contributions)),
+    )
+
+
+def propagate(ancestor_ids, added=None, removed=None):
+    """
+    Apply ``added`` minus ``removed`` to the given ancestors.
+
+    Counts and "earlier due date" changes are one UPDATE; ancestors whose
+    minimum was the removed due date get it recomputed from their subtree.
+    """
+    from .models import Task
+
+    if not ancestor_ids:
+        return
+    added = added or Contribution(0, 0, None)
+    removed = removed or Contribution(0, 0, None)
+    delta_total = added.total - removed.total
+    delta_done = added.done - removed.done
+
+    updates = {}
+    if delta_total:
+        updates['subtask_count'] = F('subtask_count') + delta_total
+    if delta_done:
+        updates['done_subtask_count'] = F('done_subtask_count') + delta_done
+    if added.due is not None and added.due != removed.due:
+        updates['earliest_due_date'] = Least(F('earliest_due_date'), Value(added.due))
+    if updates:
+        Task.objects.filter(pk__in=ancestor_ids).update(**updates)
+
+    if removed.due is not None and (added.due is None or added.due > removed.due):
+        stale = list(
+            Task.objects.filter(pk__in=ancestor_ids, earliest_due_date=removed.due).values_list('pk', 'path')
+        )
+        if stale:
+            recompute_earliest_due_dates(stale)
+
+
+def recompute_earliest_due_dates(tasks):
+    """Recompute ``earliest_due_date`` for ``(pk, path)`` pairs lying on one ancestor chain."""
+    from .models import Task
+
+    prefixes = {pk: f'{path}{pk}/' for pk, path in tasks}
+    outermost = min(prefixes.values(), key=len)
+    minimums = Task.objects.filter(path__startswith=outermost).exclude(status=DONE).aggregate(**{
+        f'task_{pk}': Min('due_date', filter=Q(path__startswith=prefix))
+        for pk, prefix in prefixes.items()
+    })
+    Task.objects.bulk_update(
+        [Task(pk=pk, earliest_due_date=minimums[f'task_{pk}']) for pk in prefixes],
+        ['earliest_due_date'],
+    )
+
+
+def rebuild(task_model, batch_size=1000):
+    """
+    Recompute every roll-up of the current schema from scratch.
+
+    Tasks are streamed deepest first, so each node's subtree totals are complete
+    when it is reached; only the accumulators of nodes whose children are still
+    being visited are held in memory.
+    """
+    pending = {}
+    changed = []
+    rows = task_model.objects.order_by('-depth').values_list(
+        'pk', 'parent_task_id', 'status', 'due_date',
+        'subtask_count', 'done_subtask_count', 'earliest_due_date',
+    )
+    for pk, parent_id, status, due_date, total, done, earliest in rows.iterator(chunk_size=batch_size):
+        own = pending.pop(pk, [0, 0, None])
+        if (total, done, earliest) != tuple(own):
+            changed.append(task_model(pk=pk, subtask_count=own[0], done_subtask_count=own[1], earliest_due_date=own[2]))
+        if parent_id is not None:
+            parent = pending.setdefault(parent_id, [0, 0, None])
+            parent[0] += 1 + own[0]
+            parent[1] += int(status == DONE) + own[1]
+            parent[2] = _earliest(parent[2], own[2], _open_due(status, due_date))
+        if len(changed) >= batch_size:
+            task_model.objects.bulk_update(changed, ['subtask_count', 'done_subtask_count', 'earliest_due_date'])
+            changed = []
+    if changed:
+        task_model.objects.bulk_update(changed, ['subtask_count', 'done_subtask_count', 'earliest_due_date'])
@@ -1,9 +1,17 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError as DjangoValidationError
 from rest_framework import serializers
 
 from users.serializers import CustomUserSerializer
 
-from .models import Task, TaskAttachment, TaskComment
+from .models import (ArchivedTask, Task, TaskActivity, TaskAttachment,
+                     TaskComment, TaskDependency)
 
+User = get_user_model()
+
+def _preview_size():
+    return getattr(settings, 'TASK_THREAD_PREVIEW_SIZE', 3)
 
 class TaskAttachmentSerializer(serializers.ModelSerializer):
     class Meta:
@@ -22,8 +30,12 @@ class TaskCommentSerializer(serializers.ModelSerializer):
 class TaskSerializer(serializers.ModelSerializer):
     created_by = CustomUserSerializer(read_only=True)
     assigned_to = CustomUserSerializer(read_only=True)
-    comments = TaskCommentSerializer(many=True, read_only=True)
-    attachments = TaskAttachmentSerializer(many=True, read_only=True)
+    comment_count = serializers.SerializerMethodField()
+    latest_comments = serializers.SerializerMethodField()
+    attachment_count = serializers.SerializerMethodField()
+    latest_attachments = serializers.SerializerMethodField()
+    open_subtask_count = serializers.SerializerMethodField()
+    progress = serializers.SerializerMethodField()
     subtasks = serializers.SerializerMethodField()
 
     class Meta:
@@ -31,14 +43,123 @@ class TaskSerializer(serializers.ModelSerializer):
         fields = [
             'id', 'title', 'description', 'created_by', 'assigned_to',
             'priority', 'status', 'due_date', 'created_at', 'updated_at',
-            'completed_at', 'parent_task', 'comments', 'attachments', 'subtasks'
+            'completed_at', 'parent_task', 'path', 'depth', 'subtask_count', 'done_subtask_count',
+            'open_subtask_count', 'progress', 'earliest_due_date', 'comment_count', 'latest_comments',
+            'attachment_count', 'latest_attachments', 'subtasks'
+        ]
+        read_only_fields = [
+            'created_at', 'updated_at', 'completed_at', 'path', 'depth',
+            'subtask_count', 'done_subtask_count', 'earliest_due_date',
         ]
-        read_only_fields = ['created_at', 'updated_at', 'completed_at']
+
+    def get_open_subtask_count(self, obj) -> int:
+        return obj.subtask_count - obj.done_subtask_count
+
+    def get_progress(self, obj) -> float | None:
+        """Percent of all descendant tasks that are done, or ``None`` for leaf tasks."""
+        if not obj.subtask_count:
+            return None
+        return round(100 * obj.done_subtask_count / obj.subtask_count, 1)
+
+    def validate_parent_task(self, value):
+        if value is not None and self.instance is not None:
+            try:
+                self.instance.validate_parent(value.pk)
+            except DjangoValidationError as exc:
+                raise serializers.ValidationError(exc.message_dict['parent_task'])
+        return value
+
+    # Counts and previews come from ``Task.objects.with_thread_summary()``; the
+    # fallbacks below only run for instances loaded without it (create/update).
+    def get_comment_count(self, obj) -> int:
+        if hasattr(obj, 'comment_count'):
+            return obj.comment_count
+        return obj.comments.count()
+
+    def get_latest_comments(self, obj):
+        comments = getattr(obj, 'latest_comments', None)
+        if comments is None:
+            comments = obj.comments.select_related('user').order_by('-created_at', '-id')[:_preview_size()]
+        return TaskCommentSerializer(comments, many=True, context=self.context).data
+
+    def get_attachment_count(self, obj) -> int:
+        if hasattr(obj, 'attachment_count'):
+            return obj.attachment_count
+        return obj.attachments.count()
+
+    def get_latest_attachments(self, obj):
+        attachments = getattr(obj, 'latest_attachments', None)
+        if attachments is None:
+            attachments = obj.attachments.order_by('-uploaded_at', '-id')[:_preview_size()]
+        return TaskAttachmentSerializer(attachments, many=True, context=self.context).data
 
     def get_subtasks(self, obj):
-        subtasks = obj.subtasks.all()
-        return TaskSerializer(subtasks, many=True).data
+        # Views load whole trees up front with ``attach_subtrees``; single instances load theirs here
+        subtasks = getattr(obj, 'loaded_subtasks', None)
+        if subtasks is None:
+            subtasks = type(obj).objects.attach_subtrees([obj])[0].loaded_subtasks
+        return type(self)(subtasks, many=True, context=self.context).data
 
     def create(self, validated_data):
         validated_data['created_by'] = self.context['request'].user
-        return super().create(validated_data) 
\ No newline at end of file
+        return super().create(validated_data)
+
+class ArchivedTaskSerializer(TaskSerializer):
+    """Read-only rendering of an archived task, with the same fields as a live one."""
+    class Meta(TaskSerializer.Meta):
+        model = ArchivedTask
+        fields = TaskSerializer.Meta.fields + ['archived_at']
+        read_only_fields = fields
+
+class TaskShareSerializer(serializers.Serializer):
+    user = serializers.PrimaryKeyRelatedField(queryset=User.objects.all())
+    can_change = serializers.BooleanField(default=False)
+
+class TaskBulkDeleteSerializer(serializers.Serializer):
+    ids = serializers.ListField(child=serializers.IntegerField(), required=False, max_length=10000)
+
+class TaskMoveSerializer(serializers.Serializer):
+    """Target column and neighbours of a card; ``after`` is the card above it, ``before`` the one below."""
+    status = serializers.ChoiceField(choices=Task.STATUS_CHOICES, required=False)
+    after = serializers.PrimaryKeyRelatedField(queryset=Task.objects.all(), required=False, allow_null=True)
+    before = serializers.PrimaryKeyRelatedField(queryset=Task.objects.all(), required=False, allow_null=True)
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        request = self.context.get('request')
+        if request is not None:
+            # Cards can only be placed next to cards the user can see
+            visible = Task.objects.visible_to(request.user)
+            self.fields['after'].queryset = self.fields['before'].queryset = visible
+
+    def validate(self, attrs):
+        task = self.context['task']
+        attrs.setdefault('status', task.status)
+        for name in ('after', 'before'):
+            neighbour = attrs.get(name)
+            if neighbour is None:
+                continue
+            if neighbour.pk == task.pk:
+                raise serializers.ValidationError({name: 'A task cannot be placed next to itself.'})
+            if neighbour.status != attrs['status']:
+                raise serializers.ValidationError({name: 'This task is in another column.'})
+        after, before = attrs.get('after'), attrs.get('before')
+        if after is not None and before is not None and (after.rank, after.pk) >= (before.rank, before.pk):
+            raise serializers.ValidationError('"after" must come before "before" in the column.')
+        return attrs
+
+class TaskDependencySerializer(serializers.ModelSerializer):
+    # One side defaults to the task in the URL, so only the other one is required
+    blocker = serializers.PrimaryKeyRelatedField(queryset=Task.objects.all(), required=False)
+    blocked = serializers.PrimaryKeyRelatedField(queryset=Task.objects.all(), required=False)
+
+    class Meta:
+        model = TaskDependency
+        fields = ['id', 'blocker', 'blocked', 'created_at']
+        read_only_fields = ['created_at']
+
+class TaskActivitySerializer(serializers.ModelSerializer):
+    class Meta:
+        model = TaskActivity
+        fields = ['id', 'task_id', 'actor_id', 'verb', 'changes', 'created_at']
+        read_only_fields = fields
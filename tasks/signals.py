@@ -0,0 +1,102 @@
+from django.contrib.auth import get_user_model
+from django.contrib.contenttypes.models import ContentType
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import Signal, receiver
+from guardian.models import UserObjectPermission
+
+from users.cache import represented_fields_changed
+
+from . import visibility
+from .cache import invalidate_task, task_representations
+from .models import BOARD_FIELDS, Task, TaskAttachment, TaskComment
+
+User = get_user_model()
+
+VISIBILITY_USER_FIELDS = {'role', 'department'}
+
+# Sent by ``tasks.deletion`` before whole subtrees are removed with set-based
+# DELETEs, which bypass the per-row delete signals. ``queryset`` selects every
+# task about to be deleted; receivers should use it as a subquery.
+subtrees_deleting = Signal()
+
+
+@receiver(post_save, sender=Task)
+def refresh_task_visibility(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    if created or instance.has_changed('created_by_id', 'assigned_to_id'):
+        visibility.refresh_tasks([instance.pk])
+
+
+@receiver(post_delete, sender=Task)
+def delete_task_grants(sender, instance, **kwargs):
+    # Guardian rows point at tasks through a generic key, so they do not cascade
+    UserObjectPermission.objects.filter(
+        content_type=ContentType.objects.get_for_model(Task), object_pk=str(instance.pk),
+    ).delete()
+
+
+@receiver(post_save, sender=UserObjectPermission)
+@receiver(post_delete, sender=UserObjectPermission)
+def refresh_shared_task_visibility(sender, instance, raw=False, **kwargs):
+    if raw or instance.content_type_id != ContentType.objects.get_for_model(Task).pk:
+        return
+    visibility.refresh_tasks([int(instance.object_pk)])
+
+
+@receiver(pre_save, sender=User)
+def track_user_visibility_change(sender, instance, update_fields=None, raw=False, **kwargs):
+    instance._visibility_changed = False
+    if raw or (update_fields is not None and not VISIBILITY_USER_FIELDS.intersection(update_fields)):
+        return
+    if instance.pk is None:
+        instance._visibility_changed = instance.role == 'manager' and bool(instance.department)
+        return
+    previous = User.objects.filter(pk=instance.pk).values_list('role', 'department').first()
+    instance._visibility_changed = previous != (instance.role, instance.department)
+
+
+@receiver(post_save, sender=User)
+def refresh_user_visibility(sender, instance, **kwargs):
+    if getattr(instance, '_visibility_changed', False):
+        instance._visibility_changed = False
+        visibility.refresh_user(instance)
+
+
+@receiver(post_save, sender=Task)
+def invalidate_task_representation(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    if raw or (update_fields is not None and update_fields <= set(BOARD_FIELDS)):
+        # Board positions are not part of the representation
+        return
+    if not created and instance.has_changed('parent_task_id'):
+        # The whole subtree changed paths and both ancestor chains changed roll-ups
+        task_representations.bump()
+    else:
+        invalidate_task(instance.pk, instance.path)
+
+
+@receiver(post_delete, sender=Task)
+def invalidate_deleted_task_representation(sender, instance, **kwargs):
+    invalidate_task(instance.pk, instance.path)
+
+
+@receiver(subtrees_deleting, sender=Task)
+def invalidate_deleted_subtrees(sender, queryset, **kwargs):
+    task_representations.bump()
+
+
+@receiver(post_save, sender=TaskComment)
+@receiver(post_delete, sender=TaskComment)
+@receiver(post_save, sender=TaskAttachment)
+@receiver(post_delete, sender=TaskAttachment)
+def invalidate_thread_preview(sender, instance, raw=False, **kwargs):
+    if not raw:
+        invalidate_task(instance.task_id)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_embedded_users(sender, instance, update_fields=None, raw=False, **kwargs):
+    # Tasks embed their creator and assignee
+    if not raw and represented_fields_changed(update_fields):
+        task_representations.bump()
@@ -1,3 +1,538 @@
-from django.test import TestCase
+from datetime import datetime, timezone
+from io import StringIO
 
-# Create your tests here.
+import numpy as np
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.core.exceptions import ValidationError
+from django.core.management import call_command
+from django.db import connection
+from django.test import SimpleTestCase
+from django.test.utils import CaptureQueriesContext
+from django_tenants.test.cases import TenantTestCase
+from django_tenants.test.client import TenantClient
+from guardian.shortcuts import assign_perm
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from cleanup.models import PendingFileDeletion
+from task_management_system.cache import local
+
+from . import analytics, archive, deletion, graph, ranking, rollup
+from .cache import task_representations
+from .models import (ArchivedTask, ArchivedTaskAttachment, ArchivedTaskComment,
+                     Task, TaskAttachment, TaskComment, TaskDependency,
+                     TaskVisibility)
+from .signals import subtrees_deleting
+
+User = get_user_model()
+
+
+def day(number):
+    return datetime(2026, 1, number, tzinfo=timezone.utc)
+
+
+class TenantAPITestCase(TenantTestCase):
+    """Runs in a throwaway tenant schema; ``client_for`` sends requests as a user of it."""
+    def client_for(self, user):
+        token = RefreshToken.for_user(user).access_token
+        return TenantClient(self.tenant, HTTP_AUTHORIZATION=f'Bearer {token}')
+
+    def create_task(self, user, **fields):
+        fields.setdefault('title', 'Task')
+        fields.setdefault('description', '')
+        return Task.objects.create(created_by=user, **fields)
+
+
+class KeyBetweenTests(SimpleTestCase):
+    def test_open_ends(self):
+        self.assertEqual(ranking.key_between(None, None), ranking.FIRST_KEY)
+        self.assertGreater(ranking.key_between('a5', None), 'a5')
+        self.assertLess(ranking.key_between(None, 'a5'), 'a5')
+
+    def test_repeated_inserts_at_the_same_spot_stay_ordered(self):
+        lower, upper = 'a0', 'a1'
+        for _ in range(500):
+            key = ranking.key_between(lower, upper)
+            self.assertTrue(lower < key < upper)
+            upper = key
+
+    def test_unordered_neighbours_are_rejected(self):
+        with self.assertRaises(ranking.RankError):
+            ranking.key_between('a1', 'a0')
+        with self.assertRaises(ranking.RankError):
+            ranking.key_between('a1', 'a1')
+
+    def test_sequential_keys_are_unique_and_sorted(self):
+        keys = list(ranking.sequential_keys(5000))
+        self.assertEqual(keys, sorted(keys))
+        self.assertEqual(len(set(keys)), len(keys))
+
+
+class BoardRankingTests(TenantAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.admin = User.objects.create_user('ranker', password='x', role='admin')
+        self.tasks = [self.create_task(self.admin, title=f'Card {index}') for index in range(5)]
+
+    def column(self, status='todo'):
+        return list(Task.objects.filter(status=status).order_by('rank', 'pk').values_list('pk', flat=True))
+
+    def test_new_tasks_go_to_the_end_of_their_column(self):
+        self.assertEqual(self.column(), [task.pk for task in self.tasks])
+
+    def test_move_within_a_column_only_rewrites_the_moved_task(self):
+        first, second, third, fourth, fifth = self.tasks
+        before = dict(Task.objects.values_list('pk', 'rank'))
+        response = self.client_for(self.admin).post(
+            f'/api/tasks/{fifth.pk}/move/', {'after': first.pk, 'before': second.pk}, content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.column(), [first.pk, fifth.pk, second.pk, third.pk, fourth.pk])
+        after = dict(Task.objects.values_list('pk', 'rank'))
+        self.assertEqual([pk for pk in after if after[pk] != before[pk]], [fifth.pk])
+
+    def test_move_to_another_column(self):
+        response = self.client_for(self.admin).post(
+            f'/api/tasks/{self.tasks[2].pk}/move/', {'status': 'in_progress'}, content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.column('in_progress'), [self.tasks[2].pk])
+        self.assertNotIn(self.tasks[2].pk, self.column())
+
+    def test_rebalance_shortens_keys_and_keeps_the_order(self):
+        first, second = self.tasks[:2]
+        # Keep inserting right below the first card, which lengthens the keys there
+        for task in self.tasks[2:] * 20:
+            task.refresh_from_db()
+            second.refresh_from_db()
+            ranking.move(task, 'todo', after=first, before=second)
+            second = task
+        order = self.column()
+        self.assertEqual(ranking.columns_to_rebalance(max_length=4), ['todo'])
+
+        call_command('rebalance_task_ranks', max_length=4, stdout=StringIO())
+
+        self.assertEqual(self.column(), order)
+        ranks = list(Task.objects.filter(status='todo').order_by('rank', 'pk').values_list('rank', flat=True))
+        self.assertEqual(ranks, list(ranking.sequential_keys(len(order))))
+        self.assertEqual(ranking.columns_to_rebalance(max_length=4), [])
+
+
+class TaskVisibilityTests(TenantAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.creator = User.objects.create_user('alice', password='x', role='employee', department='eng')
+        self.manager = User.objects.create_user('mia', password='x', role='manager', department='eng')
+        self.outsider = User.objects.create_user('olga', password='x', role='employee', department='ops')
+        self.other_manager = User.objects.create_user('omar', password='x', role='manager', department='ops')
+        self.task = self.create_task(self.creator)
+        self.url = f'/api/tasks/{self.task.pk}/'
+
+    def grants(self, task):
+        return {
+            user: (reason, can_change)
+            for user, reason, can_change in TaskVisibility.objects.filter(task=task)
+            .values_list('user__username', 'reason', 'can_change')
+        }
+
+    def share(self, user, can_change=False):
+        return self.client_for(self.creator).post(
+            f'{self.url}share/', {'user': user.pk, 'can_change': can_change}, content_type='application/json',
+        )
+
+    def test_creator_and_department_manager_are_indexed(self):
+        self.assertEqual(self.grants(self.task), {
+            'alice': (TaskVisibility.CREATOR, True),
+            'mia': (TaskVisibility.DEPARTMENT, False),
+        })
+        self.assertEqual(self.client_for(self.manager).get(self.url).status_code, 200)
+        self.assertEqual(self.client_for(self.outsider).get(self.url).status_code, 404)
+
+    def test_department_manager_can_read_but_not_change(self):
+        response = self.client_for(self.manager).patch(self.url, {'title': 'Renamed'}, content_type='application/json')
+        self.assertEqual(response.status_code, 404)
+        self.task.refresh_from_db()
+        self.assertEqual(self.task.title, 'Task')
+
+    def test_assignee_brings_in_their_department_manager(self):
+        self.task.assigned_to = self.outsider
+        self.task.save()
+        self.assertEqual(self.grants(self.task)['olga'], (TaskVisibility.ASSIGNEE, True))
+        self.assertEqual(self.grants(self.task)['omar'], (TaskVisibility.DEPARTMENT, False))
+        self.assertEqual(self.client_for(self.other_manager).get(self.url).status_code, 200)
+
+    def test_read_only_share(self):
+        self.assertEqual(self.share(self.outsider).status_code, 204)
+        self.assertEqual(self.grants(self.task)['olga'], (TaskVisibility.SHARED, False))
+        client = self.client_for(self.outsider)
+        self.assertEqual(client.get(self.url).status_code, 200)
+        self.assertEqual(client.patch(self.url, {'title': 'x'}, content_type='application/json').status_code, 404)
+
+    def test_share_with_change_rights_then_unshare(self):
+        self.assertEqual(self.share(self.outsider, can_change=True).status_code, 204)
+        client = self.client_for(self.outsider)
+        self.assertEqual(client.patch(self.url, {'title': 'Shared'}, content_type='application/json').status_code, 200)
+
+        # Sharing again without change rights takes them back
+        self.share(self.outsider)
+        self.assertEqual(self.grants(self.task)['olga'], (TaskVisibility.SHARED, False))
+
+        response = self.client_for(self.creator).post(
+            f'{self.url}unshare/', {'user': self.outsider.pk}, content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 204)
+        self.assertNotIn('olga', self.grants(self.task))
+        self.assertEqual(client.get(self.url).status_code, 404)
+
+    def test_only_the_creator_can_share(self):
+        response = self.client_for(self.manager).post(
+            f'{self.url}share/', {'user': self.outsider.pk}, content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 404)
+        self.assertNotIn('olga', self.grants(self.task))
+
+
+class TaskTreeTests(TenantAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.admin = User.objects.create_user('arborist', password='x', role='admin')
+        self.root = self.create_task(self.admin, title='Root')
+        self.child = self.create_task(self.admin, title='Child', parent_task=self.root)
+        self.grandchild = self.create_task(self.admin, title='Grandchild', parent_task=self.child)
+        self.other = self.create_task(self.admin, title='Other')
+
+    def assertPath(self, task, ancestors):
+        task.refresh_from_db()
+        self.assertEqual(task.ancestor_ids, [ancestor.pk for ancestor in ancestors])
+        self.assertEqual(task.depth, len(ancestors))
+
+    def test_paths_follow_the_parents(self):
+        self.assertPath(self.root, [])
+        self.assertPath(self.grandchild, [self.root, self.child])
+        self.assertEqual(list(self.root.get_descendants().order_by('depth')), [self.child, self.grandchild])
+        self.assertEqual(list(self.grandchild.get_ancestors()), [self.root, self.child])
+
+    def test_reparenting_moves_the_whole_subtree(self):
+        self.child.parent_task = self.other
+        with CaptureQueriesContext(connection) as queries:
+            self.child.save()
+        # The new parent chain is locked before the cycle check
+        self.assertTrue(any('FOR UPDATE' in query['sql'] for query in queries))
+        self.assertPath(self.child, [self.other])
+        self.assertPath(self.grandchild, [self.other, self.child])
+
+        self.child.parent_task = None
+        self.child.save()
+        self.assertPath(self.grandchild, [self.child])
+
+    def test_a_task_cannot_move_below_its_own_subtree(self):
+        for parent in (self.root, self.grandchild):
+            self.root.parent_task = parent
+            with self.subTest(parent=parent.title), self.assertRaises(ValidationError):
+                self.root.save()
+        self.assertPath(self.root, [])
+
+        response = self.client_for(self.admin).patch(
+            f'/api/tasks/{self.root.pk}/', {'parent_task': self.grandchild.pk}, content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('parent_task', response.json())
+
+
+class TaskRollupTests(TenantAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.admin = User.objects.create_user('roller', password='x', role='admin')
+        self.root = self.create_task(self.admin, title='Root')
+        self.child = self.create_task(self.admin, title='Child', parent_task=self.root, due_date=day(20))
+        self.leaf = self.create_task(self.admin, title='Leaf', parent_task=self.child, due_date=day(10))
+        self.done = self.create_task(self.admin, title='Done', parent_task=self.child, status='done', due_date=day(5))
+        self.other = self.create_task(self.admin, title='Other')
+
+    def rollups(self, task):
+        task.refresh_from_db()
+        return task.subtask_count, task.done_subtask_count, task.earliest_due_date
+
+    def test_new_subtasks_count_on_every_ancestor(self):
+        self.assertEqual(self.rollups(self.root), (3, 1, day(10)))
+        self.assertEqual(self.rollups(self.child), (2, 1, day(10)))
+        self.assertEqual(self.rollups(self.leaf), (0, 0, None))
+
+    def test_status_and_due_date_changes(self):
+        self.leaf.status = 'done'
+        self.leaf.save()
+        # Done tasks no longer hold the earliest due date
+        self.assertEqual(self.rollups(self.root), (3, 2, day(20)))
+        self.assertEqual(self.rollups(self.child), (2, 2, None))
+
+        self.child.due_date = day(3)
+        self.child.save()
+        self.assertEqual(self.rollups(self.root), (3, 2, day(3)))
+
+    def test_moves_carry_the_subtree_totals(self):
+        self.child.parent_task = self.other
+        self.child.save()
+        self.assertEqual(self.rollups(self.root), (0, 0, None))
+        self.assertEqual(self.rollups(self.other), (3, 1, day(10)))
+
+    def test_deleting_a_subtree(self):
+        self.child.delete()
+        self.assertEqual(self.rollups(self.root), (0, 0, None))
+
+    def test_rebuild_agrees_with_the_incremental_updates(self):
+        self.leaf.status = 'done'
+        self.leaf.save()
+        self.done.delete()
+        expected = [self.rollups(task) for task in (self.root, self.child)]
+        Task.objects.filter(pk__in=[self.root.pk, self.child.pk]).update(subtask_count=0, done_subtask_count=0)
+        rollup.rebuild(Task)
+        self.assertEqual([self.rollups(task) for task in (self.root, self.child)], expected)
+
+
+class TaskArchiveTests(TenantAPITestCase):
+    cutoff = day(15)
+
+    def setUp(self):
+        super().setUp()
+        self.admin = User.objects.create_user('archivist', password='x', role='admin')
+        self.root = self.create_task(self.admin, title='Root', status='done', completed_at=day(1))
+        self.child = self.create_task(self.admin, parent_task=self.root, status='done', completed_at=day(2))
+        self.leaf = self.create_task(self.admin, parent_task=self.child, status='done', completed_at=day(3))
+        TaskComment.objects.create(task=self.child, user=self.admin, content='Shipped')
+        TaskAttachment.objects.create(task=self.leaf, file='task_attachments/spec.pdf', uploaded_by=self.admin, size=5)
+        self.recent = self.create_task(self.admin, status='done', completed_at=day(20))
+        self.unfinished = self.create_task(self.admin, status='done', completed_at=day(1))
+        self.create_task(self.admin, parent_task=self.unfinished)
+        self.tree = [self.root.pk, self.child.pk, self.leaf.pk]
+
+    def tree_rows(self, model):
+        return list(
+            model.objects.filter(pk__in=self.tree).order_by('pk')
+            .values_list('pk', 'parent_task_id', 'path', 'depth', 'subtask_count', 'done_subtask_count')
+        )
+
+    def archive(self):
+        return archive.archive_trees([self.root.pk, self.recent.pk, self.unfinished.pk], self.cutoff)
+
+    def test_only_finished_trees_are_candidates(self):
+        roots = archive.candidate_roots(self.cutoff)
+        self.assertIn(self.root.pk, roots)
+        self.assertNotIn(self.recent.pk, roots)
+        self.assertNotIn(self.unfinished.pk, roots)
+        self.assertNotIn(self.child.pk, roots)
+
+    def test_archiving_moves_whole_trees(self):
+        live = self.tree_rows(Task)
+        self.assertEqual(self.archive(), {'tasks': 3, 'comments': 1, 'attachments': 1})
+        self.assertEqual(self.tree_rows(ArchivedTask), live)
+        self.assertFalse(Task.objects.filter(pk__in=self.tree).exists())
+        self.assertFalse(TaskVisibility.objects.filter(task_id__in=self.tree).exists())
+        self.assertEqual(ArchivedTaskComment.objects.get(task=self.child.pk).content, 'Shipped')
+        self.assertEqual(ArchivedTaskAttachment.objects.get(task=self.leaf.pk).file.name, 'task_attachments/spec.pdf')
+        # Recently completed trees and trees with open subtasks stay live
+        self.assertEqual(Task.objects.filter(pk__in=[self.recent.pk, self.unfinished.pk]).count(), 2)
+
+        response = self.client_for(self.admin).get(f'/api/tasks/{self.leaf.pk}/', {'include_archived': 'true'})
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNotNone(response.json()['archived_at'])
+
+    def test_restoring_brings_the_tree_back(self):
+        live = self.tree_rows(Task)
+        self.archive()
+        # Only whole trees are restored, by their root
+        self.assertEqual(archive.restore_trees([self.child.pk]), {})
+
+        self.assertEqual(archive.restore_trees([self.root.pk]), {'tasks': 3, 'comments': 1, 'attachments': 1})
+        self.assertEqual(self.tree_rows(Task), live)
+        self.assertFalse(ArchivedTask.objects.filter(pk__in=self.tree).exists())
+        self.assertEqual(TaskComment.objects.get(task=self.child).content, 'Shipped')
+        self.assertEqual(TaskAttachment.objects.get(task=self.leaf).size, 5)
+        # Back at the end of the done column, and visible to their creator again
+        column = list(Task.objects.filter(status='done').order_by('rank', 'pk').values_list('pk', flat=True))
+        self.assertEqual(column[-3:], self.tree)
+        visible = TaskVisibility.objects.filter(user=self.admin, task_id__in=self.tree).values_list('task', flat=True)
+        self.assertEqual(set(visible), set(self.tree))
+
+
+class SubtreeDeletionTests(TenantAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.admin = User.objects.create_user('pruner', password='x', role='admin')
+        self.epic = self.create_task(self.admin, title='Epic')
+        self.story = self.create_task(self.admin, title='Story', parent_task=self.epic)
+        self.subtask = self.create_task(self.admin, title='Subtask', parent_task=self.story, status='done')
+        self.sibling = self.create_task(self.admin, title='Sibling', parent_task=self.epic)
+        TaskComment.objects.create(task=self.subtask, user=self.admin, content='Done')
+        TaskAttachment.objects.create(
+            task=self.subtask, file='task_attachments/log.txt', uploaded_by=self.admin, size=3,
+        )
+        TaskDependency.objects.create(blocker=self.sibling, blocked=self.story)
+
+        self.deleting = []
+        subtrees_deleting.connect(self.record_deleting, sender=Task)
+        self.addCleanup(subtrees_deleting.disconnect, self.record_deleting, sender=Task)
+
+    def record_deleting(self, sender, queryset, **kwargs):
+        self.deleting.append(set(queryset.values_list('pk', flat=True)))
+
+    def test_a_subtree_goes_with_its_rows_and_files(self):
+        # The subtask is below the story, so it is deleted once, with it
+        self.assertEqual(deletion.delete_subtrees([self.story.pk, self.subtask.pk]), 2)
+        self.assertEqual(self.deleting, [{self.story.pk, self.subtask.pk}])
+
+        self.assertFalse(Task.objects.filter(pk__in=[self.story.pk, self.subtask.pk]).exists())
+        self.assertFalse(TaskComment.objects.filter(task_id=self.subtask.pk).exists())
+        self.assertFalse(TaskAttachment.objects.filter(task_id=self.subtask.pk).exists())
+        self.assertFalse(TaskDependency.objects.filter(blocker=self.sibling).exists())
+        self.assertFalse(TaskVisibility.objects.filter(task_id=self.story.pk).exists())
+        self.assertTrue(PendingFileDeletion.objects.filter(name='task_attachments/log.txt').exists())
+
+        self.epic.refresh_from_db()
+        self.assertEqual((self.epic.subtask_count, self.epic.done_subtask_count), (1, 0))
+
+    def test_bulk_delete_by_filter(self):
+        response = self.client_for(self.admin).post(
+            f'/api/tasks/bulk_delete/?ancestor={self.epic.pk}', {}, content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {'deleted': 3})
+        self.assertEqual(len(self.deleting), 1)
+        self.assertEqual(list(Task.objects.filter(path__startswith=self.epic.subtree_prefix)), [])
+
+        self.epic.refresh_from_db()
+        self.assertEqual(self.epic.subtask_count, 0)
+
+    def test_bulk_delete_needs_a_filter_or_ids(self):
+        response = self.client_for(self.admin).post('/api/tasks/bulk_delete/', {}, content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(Task.objects.filter(pk=self.epic.pk).count(), 1)
+
+
+class TaskCacheTests(TenantAPITestCase):
+    def setUp(self):
+        super().setUp()
+        local.clear()
+        caches['default'].clear()
+        self.addCleanup(local.clear)
+        self.admin = User.objects.create_user('cacher', password='x', role='admin')
+        self.parent = self.create_task(self.admin, title='Parent')
+        self.child = self.create_task(self.admin, title='Child', parent_task=self.parent)
+
+    def render(self, task):
+        return task_representations.render([task.pk])[0]
+
+    def test_subtask_changes_invalidate_the_ancestors(self):
+        self.assertEqual([task['title'] for task in self.render(self.parent)['subtasks']], ['Child'])
+        self.child.title = 'Renamed'
+        self.child.save()
+        self.assertEqual([task['title'] for task in self.render(self.parent)['subtasks']], ['Renamed'])
+
+    def test_user_changes_bump_the_namespace(self):
+        self.assertEqual(self.render(self.child)['created_by']['first_name'], '')
+        self.admin.first_name = 'Ada'
+        self.admin.save()
+        self.assertEqual(self.render(self.child)['created_by']['first_name'], 'Ada')
+
+
+class GroupPercentileTests(SimpleTestCase):
+    def test_matches_numpy_percentile_per_group(self):
+        rng = np.random.default_rng(7)
+        groups = rng.integers(0, 6, 500)
+        values = rng.exponential(30, 500)
+        result = analytics.group_percentiles(groups, values, 7, (50, 85))
+        for group in range(6):
+            for p in (50, 85):
+                self.assertAlmostEqual(result[p][group], np.percentile(values[groups == group], p))
+        # Group 6 has no values
+        self.assertTrue(np.isnan(result[50][6]))
+
+
+class TaskAnalyticsTests(TenantAPITestCase):
+    url = '/api/tasks/analytics/'
+
+    def setUp(self):
+        super().setUp()
+        analytics.clear()
+        self.admin = User.objects.create_user('ada', password='x', role='admin')
+        self.manager = User.objects.create_user('mia', password='x', role='manager', department='eng')
+        self.member = User.objects.create_user('eli', password='x', role='employee', department='eng')
+        self.outsider = User.objects.create_user('olga', password='x', role='employee', department='ops')
+        self.department_task = self.create_task(self.member, status='done')
+        self.assigned_task = self.create_task(self.admin, assigned_to=self.member)
+        self.shared_task = self.create_task(self.outsider)
+        self.other_task = self.create_task(self.outsider, status='done')
+        assign_perm('tasks.view_task', self.manager, self.shared_task)
+
+    def summary(self, user):
+        response = self.client_for(user).get(self.url, {'weeks': 1})
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_employees_are_forbidden(self):
+        self.assertEqual(self.client_for(self.member).get(self.url).status_code, 403)
+
+    def test_admins_see_the_whole_tenant(self):
+        summary = self.summary(self.admin)
+        self.assertEqual(summary['task_count'], Task.objects.count() + ArchivedTask.objects.count())
+
+    def test_managers_see_what_the_task_list_shows_them(self):
+        visible = set(Task.objects.visible_to(self.manager).values_list('pk', flat=True))
+        self.assertEqual(visible, {self.department_task.pk, self.assigned_task.pk, self.shared_task.pk})
+        summary = self.summary(self.manager)
+        self.assertEqual(summary['task_count'], 3)
+        self.assertEqual(summary['lead_time_hours']['count'], 1)
+        self.assertEqual(summary['wip']['count'], 2)
+
+    def test_incremental_refresh_matches_a_full_load(self):
+        columns = analytics.load()
+        self.other_task.status = 'in_progress'
+        self.other_task.save()
+        self.department_task.delete()
+        self.create_task(self.member)
+
+        refreshed = analytics.refresh(columns)
+        full = analytics.load()
+        order, full_order = np.argsort(refreshed['id']), np.argsort(full['id'])
+        for name in analytics.COLUMNS:
+            np.testing.assert_array_equal(refreshed[name][order], full[name][full_order])
+
+
+class DependencyAnalysisTests(SimpleTestCase):
+    tasks = [
+        (1, 'todo', day(10)),
+        (2, 'todo', day(5)),
+        (3, 'done', None),
+        (4, 'in_progress', None),
+        (5, 'todo', day(20)),
+        (6, 'todo', None),
+        (7, 'done', day(30)),
+    ]
+    edges = [(1, 2), (2, 4), (3, 4), (6, 2), (7, 2), (1, 99)]
+
+    def setUp(self):
+        self.result = graph.analyze(self.tasks, self.edges)
+
+    def test_blockers_come_first(self):
+        order = self.result['topological_order']
+        self.assertEqual(sorted(order), [1, 2, 3, 4, 5, 6, 7])
+        for blocker, blocked in self.edges[:-1]:
+            self.assertLess(order.index(blocker), order.index(blocked))
+        # The edge to a task outside the analyzed set is ignored
+        self.assertEqual(self.result['edge_count'], 5)
+
+    def test_critical_path_prefers_the_earlier_due_blocker(self):
+        self.assertEqual(self.result['critical_path'], [1, 2, 4])
+        self.assertEqual(self.result['critical_path_length'], 3)
+
+    def test_only_open_blockers_block(self):
+        self.assertEqual(self.result['blocked'], [2, 4])
+
+    def test_conflicts_need_an_open_task_with_its_own_due_date(self):
+        # 6 has no due date and 7 is done, so neither has a date to move
+        self.assertEqual(self.result['due_date_conflicts'], [
+            {'task': 1, 'due_date': day(10), 'effective_due_date': day(5)},
+        ])
+
+    def test_cycles_are_rejected(self):
+        with self.assertRaises(ValidationError):
+            graph.analyze(self.tasks, self.edges + [(4, 1)])
@@ -1,23 +1,43 @@
-from django.db.models import Q
+from django.conf import settings
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db.models import Q, Value
+from django.http import Http404
 from django.shortcuts import get_object_or_404, render
 from django.utils import timezone
 from django_filters import rest_framework as filters
-from drf_spectacular.types import OpenApiTypes
-from drf_spectacular.utils import (OpenApiExample, OpenApiParameter,
-                                   extend_schema)
-from rest_framework import permissions, status, viewsets
+from guardian.shortcuts import assign_perm, remove_perm
+from rest_framework import permissions, serializers, status, viewsets
 from rest_framework.decorators import action
 from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
 from rest_framework.views import APIView
 
-from .models import Task, TaskAttachment, TaskComment
+from cleanup.queue import enqueue
+from task_management_system.docs import (OpenApiExample, OpenApiParameter,
+                                         OpenApiTypes, extend_schema)
+from task_management_system.profiling import ProfilingMixin
+from users.permissions import IsManagerOrAdmin
+
+from . import activity, analytics, deletion, graph, ranking
+from .cache import task_representations
+from .models import (ArchivedTask, Task, TaskActivity, TaskAttachment,
+                     TaskComment, TaskDependency)
+from .pagination import (TaskActivityCursorPagination,
+                         TaskAttachmentCursorPagination,
+                         TaskBoardCursorPagination,
+                         TaskCommentCursorPagination)
 from .permissions import IsTaskAssigneeOrAdmin, IsTaskCreatorOrAdmin
-from .serializers import (TaskAttachmentSerializer, TaskCommentSerializer,
-                          TaskSerializer)
+from .serializers import (ArchivedTaskSerializer, TaskActivitySerializer,
+                          TaskAttachmentSerializer, TaskBulkDeleteSerializer,
+                          TaskCommentSerializer, TaskDependencySerializer,
+                          TaskMoveSerializer, TaskSerializer,
+                          TaskShareSerializer)
 
 # Create your views here.
 
 class TaskFilter(filters.FilterSet):
+    ancestor = filters.NumberFilter(method='filter_ancestor')
+
     class Meta:
         model = Task
         fields = {
@@ -32,6 +52,13 @@ class TaskFilter(filters.FilterSet):
             'created_by': ['exact'],
         }
 
+    def filter_ancestor(self, queryset, name, value):
+        # Trees are archived whole, so the ancestor lives in the same table as the queryset
+        ancestor = queryset.model.objects.filter(pk=value).only('pk', 'path').first()
+        if ancestor is None:
+            return queryset.none()
+        return queryset.descendants_of(ancestor)
+
 @extend_schema(
     tags=['Tasks'],
     summary="Task Management",
@@ -69,6 +96,18 @@ class TaskFilter(filters.FilterSet):
             description="Search in title and description",
             required=False
         ),
+        OpenApiParameter(
+            name="ancestor",
+            type=OpenApiTypes.INT,
+            description="Only return tasks below this task in the hierarchy",
+            required=False
+        ),
+        OpenApiParameter(
+            name="include_archived",
+            type=OpenApiTypes.BOOL,
+            description="Also return archived tasks (list, retrieve and history)",
+            required=False
+        ),
     ],
     examples=[
         OpenApiExample(
@@ -84,25 +123,335 @@ class TaskFilter(filters.FilterSet):
         ),
     ]
 )
-class TaskViewSet(viewsets.ModelViewSet):
+class TaskViewSet(ProfilingMixin, viewsets.ModelViewSet):
     queryset = Task.objects.all()
     serializer_class = TaskSerializer
     permission_classes = [permissions.IsAuthenticated, IsTaskAssigneeOrAdmin]
+    participation_actions = ('add_comment', 'add_attachment')
+    filter_backends = [filters.DjangoFilterBackend]
+    filterset_class = TaskFilter
+    # Request class for throttling; actions override it (e.g. ``bulk``)
+    throttle_scope = None
 
     def get_queryset(self):
-        user = self.request.user
-        if user.role == 'admin':
-            return Task.objects.all()
-        elif user.role == 'manager':
-            return Task.objects.filter(Q(created_by=user) | Q(assigned_to=user))
-        else:
-            return Task.objects.filter(Q(created_by=user) | Q(assigned_to=user))
+        return self.restrict(Task.objects.select_related('created_by', 'assigned_to').with_thread_summary())
+
+    def restrict(self, queryset):
+        # Object permissions are resolved in SQL against the visibility index
+        for permission in self.get_permissions():
+            if hasattr(permission, 'filter_queryset'):
+                queryset = permission.filter_queryset(self.request, self, queryset)
+        return queryset
+
+    @property
+    def include_archived(self):
+        return self.request.query_params.get('include_archived', '').lower() in ('1', 'true', 'yes')
+
+    def get_archived_object(self):
+        queryset = ArchivedTask.objects.visible_to(self.request.user).select_related('created_by', 'assigned_to')
+        return get_object_or_404(queryset.with_thread_summary(), pk=self.kwargs['pk'])
+
+    def list(self, request, *args, **kwargs):
+        if not self.include_archived:
+            # Page over visible ids, then take representations from the cache and load only the misses
+            queryset = self.filter_queryset(self.restrict(Task.objects.all())).order_by('-created_at', '-pk')
+            page = self.paginate_queryset(queryset.values_list('pk', flat=True))
+            data = task_representations.render(
+                list(page if page is not None else queryset.values_list('pk', flat=True)),
+                self.get_serializer_context(),
+            )
+            return self.get_paginated_response(data) if page is not None else Response(data)
+
+        # Page over the ids of both tables, then load only the page's rows
+        live = self.filter_queryset(self.restrict(Task.objects.all()))
+        archived = TaskFilter(
+            request.query_params, queryset=ArchivedTask.objects.visible_to(request.user), request=request,
+        ).qs
+        combined = live.order_by().values('pk', 'created_at').annotate(archived=Value(False)).union(
+            archived.order_by().values('pk', 'created_at').annotate(archived=Value(True)), all=True,
+        ).order_by('-created_at', '-pk')
+        page = self.paginate_queryset(combined)
+        live_tasks = self.get_queryset().in_bulk([row['pk'] for row in page if not row['archived']])
+        archived_tasks = (
+            ArchivedTask.objects.select_related('created_by', 'assigned_to').with_thread_summary()
+            .in_bulk([row['pk'] for row in page if row['archived']])
+        )
+        Task.objects.attach_subtrees(live_tasks.values())
+        ArchivedTask.objects.attach_subtrees(archived_tasks.values())
+        context = self.get_serializer_context()
+        data = [
+            ArchivedTaskSerializer(archived_tasks[row['pk']], context=context).data if row['archived']
+            else TaskSerializer(live_tasks[row['pk']], context=context).data
+            for row in page
+        ]
+        return self.get_paginated_response(data)
+
+    def perform_destroy(self, instance):
+        deletion.delete_subtrees([instance.pk])
+
+    @extend_schema(
+        summary="Bulk Delete Tasks",
+        description=(
+            "Delete every task matching the list filters (query string) and/or the given ids, with their "
+            "subtasks, comments and attachments. At least one filter or id is required."
+        ),
+        request=TaskBulkDeleteSerializer,
+        responses={200: OpenApiTypes.OBJECT},
+    )
+    @action(detail=False, methods=['post'], throttle_scope='bulk')
+    def bulk_delete(self, request):
+        serializer = TaskBulkDeleteSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        ids = serializer.validated_data.get('ids')
+        filtered = bool(set(request.query_params) & set(self.filterset_class.get_filters()))
+        if not ids and not filtered:
+            raise serializers.ValidationError({'detail': 'Pass ids or at least one filter.'})
+        queryset = self.filter_queryset(self.restrict(Task.objects.all()))
+        if ids:
+            queryset = queryset.filter(pk__in=ids)
+        return Response({'deleted': deletion.delete_matching(queryset)})
+
+    def retrieve(self, request, *args, **kwargs):
+        try:
+            pk = int(kwargs['pk'])
+        except ValueError:
+            raise Http404
+        # Permissions are checked on the bare row; only the rendering comes from the cache
+        task = self.restrict(Task.objects.filter(pk=pk)).first()
+        if task is not None:
+            self.check_object_permissions(request, task)
+            data = task_representations.render([pk], self.get_serializer_context())
+            if data:
+                return Response(data[0])
+        if not self.include_archived:
+            raise Http404
+        archived = self.get_archived_object()
+        self.check_object_permissions(request, archived)
+        serializer = ArchivedTaskSerializer(archived, context=self.get_serializer_context())
+        return Response(serializer.data)
 
     def get_permissions(self):
-        if self.action == 'destroy':
+        if self.action in ('destroy', 'bulk_delete', 'share', 'unshare'):
             return [permissions.IsAuthenticated(), IsTaskCreatorOrAdmin()]
+        if self.action == 'analytics':
+            return [IsManagerOrAdmin()]
         return super().get_permissions()
 
+    @extend_schema(
+        summary="Task Ancestors",
+        description="List the ancestors of a task, root first",
+        responses={200: TaskSerializer(many=True)},
+    )
+    @action(detail=True, methods=['get'])
+    def ancestors(self, request, pk=None):
+        task = self.get_object()
+        queryset = self.get_queryset().filter(pk__in=task.ancestor_ids).order_by('depth')
+        serializer = self.get_serializer(Task.objects.attach_subtrees(queryset), many=True)
+        return Response(serializer.data)
+
+    @extend_schema(
+        summary="Task Descendants",
+        description="List every task below a task in the hierarchy",
+        responses={200: TaskSerializer(many=True)},
+    )
+    @action(detail=True, methods=['get'])
+    def descendants(self, request, pk=None):
+        task = self.get_object()
+        queryset = self.get_queryset().descendants_of(task).order_by('path', 'id')
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            serializer = self.get_serializer(Task.objects.attach_subtrees(page), many=True)
+            return self.get_paginated_response(serializer.data)
+        serializer = self.get_serializer(Task.objects.attach_subtrees(queryset), many=True)
+        return Response(serializer.data)
+
+    @extend_schema(
+        summary="Task History",
+        description="Every recorded change, comment, attachment and share event of a task, newest first",
+        responses={200: TaskActivitySerializer(many=True)},
+    )
+    @action(detail=True, methods=['get'], pagination_class=TaskActivityCursorPagination)
+    def history(self, request, pk=None):
+        try:
+            task = self.get_object()
+        except Http404:
+            if not self.include_archived:
+                raise
+            task = self.get_archived_object()
+        page = self.paginate_queryset(TaskActivity.objects.filter(task_id=task.pk))
+        serializer = TaskActivitySerializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+
+    @extend_schema(
+        summary="Dependency Graph Analysis",
+        description=(
+            "Topological order, critical path, blocked tasks and due date conflicts of the "
+            "dependency graph of all visible tasks, or of one task and its subtree"
+        ),
+        parameters=[
+            OpenApiParameter(
+                name="root",
+                type=OpenApiTypes.INT,
+                description="Only analyze this task and its descendants",
+                required=False
+            ),
+        ],
+        responses={200: OpenApiTypes.OBJECT},
+    )
+    @action(detail=False, methods=['get'])
+    def dependency_graph(self, request):
+        queryset = Task.objects.visible_to(request.user)
+        root_id = request.query_params.get('root')
+        if root_id:
+            root = get_object_or_404(queryset, pk=root_id)
+            queryset = queryset.filter(Q(pk=root.pk) | Q(path__startswith=root.subtree_prefix))
+        return Response(graph.analyze_queryset(queryset))
+
+    @extend_schema(
+        summary="Task Analytics",
+        description=(
+            "Lead time (creation to completion) percentiles, weekly throughput and due-date hit rate of the "
+            "tasks completed in the last `weeks` weeks, aging of the work in progress, and a breakdown per "
+            "assignee and priority. Archived tasks are included. Admins see the whole tenant, managers the "
+            "tasks they can see in the task list (and the archived ones of their department). Figures may lag "
+            "changes by `ANALYTICS_REFRESH_INTERVAL` seconds."
+        ),
+        parameters=[
+            OpenApiParameter(
+                name="weeks",
+                type=OpenApiTypes.INT,
+                description="Weeks covered, the current one included (at most 104)",
+                required=False
+            ),
+        ],
+        responses={200: OpenApiTypes.OBJECT},
+    )
+    @action(detail=False, methods=['get'])
+    def analytics(self, request):
+        try:
+            weeks = int(request.query_params.get('weeks', settings.ANALYTICS_DEFAULT_WEEKS))
+        except ValueError:
+            weeks = settings.ANALYTICS_DEFAULT_WEEKS
+        weeks = max(1, min(weeks, settings.ANALYTICS_MAX_WEEKS))
+        task_ids = None
+        if request.user.role != 'admin':
+            # Scoped like the task list: live tasks through the visibility index, archived ones by their own rule
+            task_ids = list(
+                Task.objects.visible_to(request.user).order_by().values_list('pk', flat=True).union(
+                    ArchivedTask.objects.visible_to(request.user).order_by().values_list('pk', flat=True), all=True,
+                )
+            )
+        return Response(analytics.summarize(analytics.snapshot(), task_ids, weeks))
+
+    @extend_schema(
+        summary="Task Board",
+        description=(
+            "Tasks grouped into one column per status, each in board order and paginated on its own. "
+            "Follow a column's `next` link (`<status>_cursor`) to load more of that column. "
+            "Accepts the list filters; `status` limits the board to one column."
+        ),
+        parameters=[
+            OpenApiParameter(
+                name="page_size",
+                type=OpenApiTypes.INT,
+                description="Tasks per column (at most 100)",
+                required=False
+            ),
+        ],
+        responses={200: OpenApiTypes.OBJECT},
+    )
+    @action(detail=False, methods=['get'], pagination_class=TaskBoardCursorPagination)
+    def board(self, request):
+        queryset = self.filter_queryset(self.restrict(Task.objects.all()))
+        selected = request.query_params.get('status')
+        columns, ids = [], []
+        for value, label in Task.STATUS_CHOICES:
+            if selected and value != selected:
+                continue
+            paginator = self.pagination_class()
+            paginator.cursor_query_param = f'{value}_cursor'
+            page = paginator.paginate_queryset(queryset.filter(status=value).values('pk', 'rank'), request, view=self)
+            # A column's links only fetch that column
+            paginator.base_url = replace_query_param(paginator.base_url, 'status', value)
+            column_ids = [row['pk'] for row in page]
+            ids.extend(column_ids)
+            columns.append({
+                'status': value,
+                'label': label,
+                'next': paginator.get_next_link(),
+                'previous': paginator.get_previous_link(),
+                'ids': column_ids,
+            })
+        # One cache lookup (and one build of the misses) for the whole board
+        data = {task['id']: task for task in task_representations.render(ids, self.get_serializer_context())}
+        for column in columns:
+            column['results'] = [data[pk] for pk in column.pop('ids') if pk in data]
+        return Response({'columns': columns})
+
+    @extend_schema(
+        summary="Move Task on the Board",
+        description=(
+            "Place a task between two cards of a column, optionally changing its status. `after` is the card "
+            "that ends up above it and `before` the one below; give either or both. Without either, the task "
+            "goes to the end of the column. Reordering within a column writes only the moved task."
+        ),
+        request=TaskMoveSerializer,
+        responses={200: TaskSerializer},
+        examples=[
+            OpenApiExample(
+                'Move Example',
+                value={"status": "in_progress", "after": 41, "before": 57},
+                request_only=True,
+            ),
+        ]
+    )
+    @action(detail=True, methods=['post'])
+    def move(self, request, pk=None):
+        task = self.get_object()
+        serializer = TaskMoveSerializer(data=request.data, context={'request': request, 'task': task})
+        serializer.is_valid(raise_exception=True)
+        ranking.move(task, **serializer.validated_data)
+        return Response(task_representations.render([task.pk], self.get_serializer_context())[0])
+
+    @extend_schema(
+        summary="Share Task",
+        description="Grant a user view (and optionally change) access to a task",
+        request=TaskShareSerializer,
+        responses={204: None},
+    )
+    @action(detail=True, methods=['post'])
+    def share(self, request, pk=None):
+        task = self.get_object()
+        serializer = TaskShareSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        user = serializer.validated_data['user']
+        assign_perm('tasks.view_task', user, task)
+        if serializer.validated_data['can_change']:
+            assign_perm('tasks.change_task', user, task)
+        else:
+            remove_perm('tasks.change_task', user, task)
+        activity.record(task.pk, TaskActivity.SHARED, {
+            'user': user.pk, 'can_change': serializer.validated_data['can_change'],
+        })
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+    @extend_schema(
+        summary="Unshare Task",
+        description="Revoke access previously granted with the share action",
+        request=TaskShareSerializer,
+        responses={204: None},
+    )
+    @action(detail=True, methods=['post'])
+    def unshare(self, request, pk=None):
+        task = self.get_object()
+        serializer = TaskShareSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        user = serializer.validated_data['user']
+        remove_perm('tasks.view_task', user, task)
+        remove_perm('tasks.change_task', user, task)
+        activity.record(task.pk, TaskActivity.UNSHARED, {'user': user.pk})
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
     @extend_schema(
         summary="Add Comment to Task",
         description="Add a new comment to a specific task",
@@ -124,7 +473,8 @@ class TaskViewSet(viewsets.ModelViewSet):
         task = self.get_object()
         serializer = TaskCommentSerializer(data=request.data)
         if serializer.is_valid():
-            serializer.save(task=task, user=request.user)
+            comment = serializer.save(task=task, user=request.user)
+            activity.record(task.pk, TaskActivity.COMMENTED, {'comment': comment.pk})
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
@@ -149,7 +499,8 @@ class TaskViewSet(viewsets.ModelViewSet):
         task = self.get_object()
         serializer = TaskAttachmentSerializer(data=request.data)
         if serializer.is_valid():
-            serializer.save(task=task, uploaded_by=request.user)
+            attachment = serializer.save(task=task, uploaded_by=request.user)
+            activity.record(task.pk, TaskActivity.ATTACHED, {'attachment': attachment.pk, 'file': attachment.file.name})
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
@@ -176,16 +527,23 @@ class TaskViewSet(viewsets.ModelViewSet):
         ),
     ]
 )
-class TaskCommentViewSet(viewsets.ModelViewSet):
+class TaskCommentViewSet(ProfilingMixin, viewsets.ModelViewSet):
     serializer_class = TaskCommentSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = TaskCommentCursorPagination
 
     def get_queryset(self):
-        return TaskComment.objects.filter(task_id=self.kwargs['task_pk'])
+        visible = Task.objects.visible_to(self.request.user).filter(pk=self.kwargs['task_pk'])
+        return TaskComment.objects.filter(task_id=self.kwargs['task_pk'], task__in=visible).select_related('user')
 
     def perform_create(self, serializer):
-        task = get_object_or_404(Task, pk=self.kwargs['task_pk'])
-        serializer.save(task=task, user=self.request.user)
+        task = get_object_or_404(Task.objects.visible_to(self.request.user), pk=self.kwargs['task_pk'])
+        comment = serializer.save(task=task, user=self.request.user)
+        activity.record(task.pk, TaskActivity.COMMENTED, {'comment': comment.pk})
+
+    def perform_destroy(self, instance):
+        activity.record(instance.task_id, TaskActivity.COMMENT_DELETED, {'comment': instance.pk})
+        instance.delete()
 
 @extend_schema(
     tags=['Attachments'],
@@ -210,13 +568,79 @@ class TaskCommentViewSet(viewsets.ModelViewSet):
         ),
     ]
 )
-class TaskAttachmentViewSet(viewsets.ModelViewSet):
+class TaskAttachmentViewSet(ProfilingMixin, viewsets.ModelViewSet):
     serializer_class = TaskAttachmentSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = TaskAttachmentCursorPagination
 
     def get_queryset(self):
-        return TaskAttachment.objects.filter(task_id=self.kwargs['task_pk'])
+        visible = Task.objects.visible_to(self.request.user).filter(pk=self.kwargs['task_pk'])
+        return TaskAttachment.objects.filter(task_id=self.kwargs['task_pk'], task__in=visible)
 
     def perform_create(self, serializer):
-        task = get_object_or_404(Task, pk=self.kwargs['task_pk'])
-        serializer.save(task=task, uploaded_by=self.request.user)
+        task = get_object_or_404(Task.objects.visible_to(self.request.user), pk=self.kwargs['task_pk'])
+        attachment = serializer.save(task=task, uploaded_by=self.request.user)
+        activity.record(task.pk, TaskActivity.ATTACHED, {'attachment': attachment.pk, 'file': attachment.file.name})
+
+    def perform_destroy(self, instance):
+        activity.record(
+            instance.task_id, TaskActivity.ATTACHMENT_DELETED, {'attachment': instance.pk, 'file': instance.file.name},
+        )
+        instance.delete()
+        enqueue([instance.file.name])
+
+@extend_schema(
+    tags=['Tasks'],
+    summary="Task Dependencies",
+    description=(
+        "Blocks / blocked-by edges of a task. Post either `blocker` or `blocked`; "
+        "the other side defaults to the task in the URL. Edges that would create a cycle are rejected."
+    ),
+    parameters=[
+        OpenApiParameter(
+            name="task_pk",
+            type=OpenApiTypes.INT,
+            description="ID of the task",
+            required=True
+        ),
+    ],
+    examples=[
+        OpenApiExample(
+            'Dependency Creation Example',
+            value={
+                "blocker": 42
+            },
+            request_only=True,
+        ),
+    ]
+)
+class TaskDependencyViewSet(ProfilingMixin, viewsets.ModelViewSet):
+    serializer_class = TaskDependencySerializer
+    permission_classes = [permissions.IsAuthenticated]
+    http_method_names = ['get', 'post', 'delete', 'head', 'options']
+
+    def get_queryset(self):
+        task_pk = self.kwargs['task_pk']
+        visible = Task.objects.visible_to(self.request.user).filter(pk=task_pk)
+        return TaskDependency.objects.filter(Q(blocker_id=task_pk) | Q(blocked_id=task_pk)).filter(
+            Q(blocker__in=visible) | Q(blocked__in=visible)
+        ).order_by('id')
+
+    def create(self, request, *args, **kwargs):
+        task = get_object_or_404(Task.objects.visible_to(request.user, for_change=True), pk=self.kwargs['task_pk'])
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        blocker = serializer.validated_data.get('blocker', task)
+        blocked = serializer.validated_data.get('blocked', task)
+        other = blocked if blocker == task else blocker
+        if task not in (blocker, blocked) or not Task.objects.visible_to(request.user).filter(pk=other.pk).exists():
+            raise serializers.ValidationError({'detail': 'Dependencies must link this task to another visible task.'})
+        try:
+            dependency = graph.add_dependency(blocker, blocked)
+        except DjangoValidationError as exc:
+            raise serializers.ValidationError({'detail': exc.messages})
+        return Response(self.get_serializer(dependency).data, status=status.HTTP_201_CREATED)
+
+    def perform_destroy(self, instance):
+        get_object_or_404(Task.objects.visible_to(self.request.user, for_change=True), pk=self.kwargs['task_pk'])
+        instance.delete()
@@ -0,0 +1,129 @@
+"""
+Maintenance of the ``TaskVisibility`` index.
+
+A user can see a task when they created it, are assigned to it, manage the
+department of its creator or assignee, or were granted ``view_task`` /
+``change_task`` on it through django-guardian. Creators, assignees and
+``change_task`` grantees may also change it; department managers only read. Those rules are evaluated
+here, in batches, whenever one of their inputs changes, so that list and
+detail queries only need one join against the precomputed rows.
+"""
+from collections import defaultdict
+
+from django.contrib.auth import get_user_model
+from django.contrib.contenttypes.models import ContentType
+from django.db import transaction
+from django.db.models import Q
+from guardian.models import UserObjectPermission
+
+from .models import Task, TaskVisibility
+
+User = get_user_model()
+
+BATCH_SIZE = 1000
+
+# Strongest reason first; a pair that qualifies several ways keeps the first
+REASON_ORDER = (
+    TaskVisibility.CREATOR,
+    TaskVisibility.ASSIGNEE,
+    TaskVisibility.DEPARTMENT,
+    TaskVisibility.SHARED,
+)
+
+
+def _chunks(ids, size=BATCH_SIZE):
+    ids = list(ids)
+    for start in range(0, len(ids), size):
+        yield ids[start:start + size]
+
+
+def _compute_rows(task_ids):
+    rows = {}
+
+    def grant(task_id, user_id, reason, can_change):
+        key = (task_id, user_id)
+        current = rows.get(key)
+        if current is None:
+            rows[key] = (reason, can_change)
+        else:
+            best = min(current[0], reason, key=REASON_ORDER.index)
+            rows[key] = (best, current[1] or can_change)
+
+    tasks = Task.objects.filter(pk__in=task_ids).values_list(
+        'pk', 'created_by_id', 'created_by__department', 'assigned_to_id', 'assigned_to__department',
+    )
+    by_department = defaultdict(set)
+    for task_id, creator_id, creator_department, assignee_id, assignee_department in tasks:
+        grant(task_id, creator_id, TaskVisibility.CREATOR, True)
+        if assignee_id:
+            grant(task_id, assignee_id, TaskVisibility.ASSIGNEE, True)
+        for department in (creator_department, assignee_department):
+            if department:
+                by_department[department].add(task_id)
+
+    if by_department:
+        managers = User.objects.filter(role='manager', department__in=by_department).values_list('pk', 'department')
+        for manager_id, department in managers:
+            for task_id in by_department[department]:
+                grant(task_id, manager_id, TaskVisibility.DEPARTMENT, False)
+
+    grants = UserObjectPermission.objects.filter(
+        content_type=ContentType.objects.get_for_model(Task),
+        object_pk__in=[str(task_id) for task_id in task_ids],
+        permission__codename__in=('view_task', 'change_task'),
+    ).values_list('object_pk', 'user_id', 'permission__codename')
+    for object_pk, user_id, codename in grants:
+        grant(int(object_pk), user_id, TaskVisibility.SHARED, codename == 'change_task')
+
+    return [
+        TaskVisibility(task_id=task_id, user_id=user_id, reason=reason, can_change=can_change)
+        for (task_id, user_id), (reason, can_change) in rows.items()
+    ]
+
+
+def refresh_tasks(task_ids):
+    """Recompute the visibility rows of the given tasks."""
+    for chunk in _chunks(set(task_ids)):
+        rows = _compute_rows(chunk)
+        with transaction.atomic():
+            TaskVisibility.objects.filter(task_id__in=chunk).delete()
+            TaskVisibility.objects.bulk_create(rows, batch_size=BATCH_SIZE)
+
+
+def affected_tasks_for_user(user):
+    """
+    Task ids whose visibility may change when ``user``'s role or department changes.
+
+    That is everything the user could see before (covers the old department),
+    the tasks they own or are assigned (their department managers change) and,
+    for managers, the tasks of their new department's members.
+    """
+    task_ids = set(TaskVisibility.objects.filter(user=user).values_list('task_id', flat=True))
+    task_ids.update(
+        Task.objects.filter(Q(created_by=user) | Q(assigned_to=user)).values_list('pk', flat=True)
+    )
+    if user.role == 'manager' and user.department:
+        task_ids.update(
+            Task.objects.filter(
+                Q(created_by__department=user.department) | Q(assigned_to__department=user.department)
+            ).values_list('pk', flat=True)
+        )
+    return task_ids
+
+
+def refresh_user(user):
+    refresh_tasks(affected_tasks_for_user(user))
+
+
+def rebuild_all():
+    """Rebuild the whole index for the current schema, one batch at a time."""
+    TaskVisibility.objects.all().delete()
+    last_pk = 0
+    while True:
+        chunk = list(
+            Task.objects.filter(pk__gt=last_pk).order_by('pk').values_list('pk', flat=True)[:BATCH_SIZE]
+        )
+        if not chunk:
+            return
+        TaskVisibility.objects.bulk_create(_compute_rows(chunk), batch_size=BATCH_SIZE)
+        last_pk = chunk[-1]
@@ -0,0 +1,44 @@
+"""
+Cached hostname -> tenant lookups.
+
+``TenantMainMiddleware`` resolves the tenant of every request with a join of
+``Domain`` and ``Tenant`` in the public schema. ``CachedTenantMiddleware``
+answers that from the default cache instead. Unknown hostnames are cached
+too, so junk Host headers do not reach the database either. Entries are
+deleted by the ``Tenant``/``Domain`` signal handlers in ``tenants.signals``
+and expire after ``TENANT_CACHE_TIMEOUT`` seconds. That bound matters when the
+cache is per process (the default ``LocMemCache``), where a write in one
+process cannot clear the others.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django_tenants.middleware.main import TenantMainMiddleware
+
+KEY_PREFIX = 'tenants:domain:'
+MISSING = 'missing'
+
+
+def cache_key(hostname):
+    return f'{KEY_PREFIX}{hostname}'
+
+
+def lookup(domain_model, hostname):
+    """The tenant serving ``hostname``; raises ``domain_model.DoesNotExist`` like a plain lookup."""
+    key = cache_key(hostname)
+    tenant = cache.get(key)
+    if tenant is None:
+        domain = domain_model.objects.select_related('tenant').filter(domain=hostname).first()
+        tenant = domain.tenant if domain is not None else MISSING
+        cache.set(key, tenant, getattr(settings, 'TENANT_CACHE_TIMEOUT', 300))
+    if tenant == MISSING:
+        raise domain_model.DoesNotExist(f'No domain {hostname!r}')
+    return tenant
+
+
+def invalidate(hostnames):
+    cache.delete_many([cache_key(hostname) for hostname in hostnames])
+
+
+class CachedTenantMiddleware(TenantMainMiddleware):
+    def get_tenant(self, domain_model, hostname):
+        return lookup(domain_model, hostname)
@@ -0,0 +1,86 @@
+import csv
+import json
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.core.serializers.json import DjangoJSONEncoder
+
+from tenants.models import TenantUsage
+from tenants.usage import COUNT_FIELDS, refresh_usage, totals
+
+
+class Command(BaseCommand):
+    help = (
+        'Refreshes the stale per-tenant usage reports (concurrently, one worker thread per tenant '
+        'in flight) and prints the cached reports as a table, JSON or CSV.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=getattr(settings, 'USAGE_REPORT_WORKERS', 4))
+        parser.add_argument(
+            '--max-age-minutes', type=int,
+            default=int(getattr(settings, 'USAGE_REPORT_MAX_AGE', timedelta(hours=1)).total_seconds() // 60),
+            help='Recompute reports older than this; 0 recomputes every tenant',
+        )
+        parser.add_argument('--schema', action='append', default=[], help='Only these tenant schemas (repeatable)')
+        parser.add_argument('--no-refresh', action='store_true', help='Print the cached reports as they are')
+        parser.add_argument('--format', choices=('table', 'json', 'csv'), default='table')
+
+    def handle(self, *args, **options):
+        if not options['no_refresh']:
+            refreshed = refresh_usage(
+                max_age=timedelta(minutes=options['max_age_minutes']),
+                workers=options['workers'],
+                schema_names=options['schema'],
+            )
+            self.stderr.write(f'Refreshed {len(refreshed)} tenant reports')
+
+        reports = TenantUsage.objects.select_related('tenant').order_by('tenant__schema_name')
+        if options['schema']:
+            reports = reports.filter(tenant__schema_name__in=options['schema'])
+        reports = list(reports)
+        getattr(self, f"write_{options['format']}")(reports)
+
+    def write_json(self, reports):
+        payload = {
+            'tenants': [
+                {'schema_name': report.tenant.schema_name, **{
+                    field: getattr(report, field)
+                    for field in ('tasks_by_status', *COUNT_FIELDS, 'growth', 'computed_at', 'duration_ms')
+                }}
+                for report in reports
+            ],
+            'totals': totals(reports),
+        }
+        self.stdout.write(json.dumps(payload, cls=DjangoJSONEncoder, indent=2))
+
+    def write_csv(self, reports):
+        writer = csv.writer(self.stdout)
+        writer.writerow(['schema_name', *COUNT_FIELDS, 'computed_at'])
+        for report in reports:
+            writer.writerow([
+                report.tenant.schema_name,
+                *(getattr(report, field) for field in COUNT_FIELDS),
+                report.computed_at.isoformat(),
+            ])
+
+    def write_table(self, reports):
+        headers = ['schema', 'tasks', 'archived', 'users', 'active', 'comments', 'attachments', 'bytes', 'computed']
+        rows = [
+            [
+                report.tenant.schema_name, report.task_count, report.archived_task_count, report.user_count,
+                report.active_user_count, report.comment_count, report.attachment_count,
+                report.attachment_bytes, f'{report.computed_at:%Y-%m-%d %H:%M}',
+            ]
+            for report in reports
+        ]
+        summed = totals(reports)
+        rows.append([
+            'TOTAL', summed['task_count'], summed['archived_task_count'], summed['user_count'],
+            summed['active_user_count'], summed['comment_count'], summed['attachment_count'],
+            summed['attachment_bytes'], '',
+        ])
+        widths = [max(len(str(row[i])) for row in [headers, *rows]) for i in range(len(headers))]
+        for row in [headers, *rows]:
+            self.stdout.write('  '.join(str(value).ljust(width) for value, width in zip(row, widths)))
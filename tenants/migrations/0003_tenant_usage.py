@@ -0,0 +1,32 @@
+# Generated by Django 5.1.7 on 2026-10-19 09:17
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tenants', '0002_setup_public_tenant'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TenantUsage',
+            fields=[
+                ('tenant', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='usage', serialize=False, to='tenants.tenant')),
+                ('tasks_by_status', models.JSONField(default=dict)),
+                ('task_count', models.PositiveIntegerField(default=0)),
+                ('archived_task_count', models.PositiveIntegerField(default=0)),
+                ('user_count', models.PositiveIntegerField(default=0)),
+                ('active_user_count', models.PositiveIntegerField(default=0)),
+                ('comment_count', models.PositiveIntegerField(default=0)),
+                ('recent_comment_count', models.PositiveIntegerField(default=0)),
+                ('attachment_count', models.PositiveIntegerField(default=0)),
+                ('attachment_bytes', models.PositiveBigIntegerField(default=0)),
+                ('growth', models.JSONField(default=dict)),
+                ('computed_at', models.DateTimeField(db_index=True)),
+                ('duration_ms', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+    ]
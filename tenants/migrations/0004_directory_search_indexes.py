@@ -0,0 +1,37 @@
+# Generated by Django 5.1.7 on 2026-10-19 09:20
+
+import django.contrib.postgres.indexes
+import django.db.models.functions.text
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tenants', '0003_tenant_usage'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.AddIndex(
+            model_name='domain',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('domain'), name='gin_trgm_ops'), name='domain_domain_trgm'),
+        ),
+        migrations.AddIndex(
+            model_name='tenant',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('name'), name='gin_trgm_ops'), name='tenant_name_trgm'),
+        ),
+        migrations.AddIndex(
+            model_name='tenant',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('schema_name'), name='gin_trgm_ops'), name='tenant_schema_name_trgm'),
+        ),
+        migrations.AddIndex(
+            model_name='tenant',
+            index=models.Index(fields=['name', 'id'], name='tenant_name_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tenant',
+            index=models.Index(fields=['paid_until'], name='tenant_paid_until_idx'),
+        ),
+    ]
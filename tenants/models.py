@@ -1,4 +1,6 @@
+from django.contrib.postgres.indexes import GinIndex, OpClass
 from django.db import models
+from django.db.models.functions import Upper
 from django_tenants.models import DomainMixin, TenantMixin
 
 # Create your models here.
@@ -10,8 +12,47 @@ class Tenant(TenantMixin):
     created_on = models.DateField(auto_now_add=True)
     auto_create_schema = True
 
+    class Meta:
+        # Same trigram scheme as the user directory: the GIN indexes on
+        # UPPER(column) serve case-insensitive prefix and substring search.
+        indexes = [
+            GinIndex(OpClass(Upper('name'), name='gin_trgm_ops'), name='tenant_name_trgm'),
+            GinIndex(OpClass(Upper('schema_name'), name='gin_trgm_ops'), name='tenant_schema_name_trgm'),
+            # Keyset pagination of the directory
+            models.Index(fields=['name', 'id'], name='tenant_name_id_idx'),
+            models.Index(fields=['paid_until'], name='tenant_paid_until_idx'),
+        ]
+
     def __str__(self):
         return self.name
 
 class Domain(DomainMixin):
-    pass
+    class Meta:
+        indexes = [
+            GinIndex(OpClass(Upper('domain'), name='gin_trgm_ops'), name='domain_domain_trgm'),
+        ]
+
+class TenantUsage(models.Model):
+    """
+    Cached usage report of one tenant, kept in the public schema.
+
+    Rows are written by ``tenants.usage.refresh_usage`` so that the usage
+    endpoint never has to visit every tenant schema on a request. ``growth``
+    maps ``YYYY-MM`` to the tasks, comments and users created that month.
+    """
+    tenant = models.OneToOneField(Tenant, on_delete=models.CASCADE, primary_key=True, related_name='usage')
+    tasks_by_status = models.JSONField(default=dict)
+    task_count = models.PositiveIntegerField(default=0)
+    archived_task_count = models.PositiveIntegerField(default=0)
+    user_count = models.PositiveIntegerField(default=0)
+    active_user_count = models.PositiveIntegerField(default=0)
+    comment_count = models.PositiveIntegerField(default=0)
+    recent_comment_count = models.PositiveIntegerField(default=0)
+    attachment_count = models.PositiveIntegerField(default=0)
+    attachment_bytes = models.PositiveBigIntegerField(default=0)
+    growth = models.JSONField(default=dict)
+    computed_at = models.DateTimeField(db_index=True)
+    duration_ms = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f'Usage of {self.tenant_id} at {self.computed_at}'
@@ -0,0 +1,14 @@
+from rest_framework.pagination import CursorPagination
+
+
+class TenantCursorPagination(CursorPagination):
+    """
+    Keyset pagination over the tenant directory, alphabetically.
+
+    Pages are resolved on the ``(name, id)`` index instead of with an OFFSET,
+    so the last page of thousands of tenants costs the same as the first one.
+    """
+    ordering = ('name', 'id')
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 200
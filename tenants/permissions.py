@@ -0,0 +1,9 @@
+from rest_framework import permissions
+
+
+class IsSuperuser(permissions.BasePermission):
+    """
+    Only lets superusers through, for endpoints that look across all tenants.
+    """
+    def has_permission(self, request, view):
+        return bool(request.user and request.user.is_authenticated and request.user.is_superuser)
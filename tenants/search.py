@@ -0,0 +1,30 @@
+"""
+Tenant directory search.
+
+Name and schema name are matched directly and domains through an ``EXISTS``
+subquery, so a tenant with several matching domains is returned once and the
+directory keeps its keyset ordering. All three columns have trigram GIN
+indexes on ``UPPER(column)`` (migration 0004). Short terms only do prefix
+matching; longer ones also match anywhere in the value.
+"""
+from django.db.models import Exists, OuterRef, Q
+
+from .models import Domain
+
+SEARCH_FIELDS = ('name', 'schema_name')
+
+# Substring matches need at least one trigram to use the indexes
+SUBSTRING_MIN_LENGTH = 3
+
+
+def search_tenants(queryset, term):
+    term = term.strip()
+    if not term:
+        return queryset
+
+    lookup = 'icontains' if len(term) >= SUBSTRING_MIN_LENGTH else 'istartswith'
+    matches = Q()
+    for field in SEARCH_FIELDS:
+        matches |= Q(**{f'{field}__{lookup}': term})
+    domains = Domain.objects.filter(tenant=OuterRef('pk'), **{f'domain__{lookup}': term})
+    return queryset.filter(matches | Q(Exists(domains)))
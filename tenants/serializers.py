@@ -1,6 +1,6 @@
 from rest_framework import serializers
 
-from .models import Domain, Tenant
+from .models import Domain, Tenant, TenantUsage
 
 
 class DomainSerializer(serializers.ModelSerializer):
@@ -14,5 +14,25 @@ class TenantSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Tenant
-        fields = ['id', 'name', 'paid_until', 'on_trial', 'created_on', 'domains', 'domain']
-        read_only_fields = ['created_on'] 
\ No newline at end of file
+        fields = ['id', 'name', 'schema_name', 'paid_until', 'on_trial', 'created_on', 'domains', 'domain']
+        read_only_fields = ['created_on']
+
+    def get_fields(self):
+        fields = super().get_fields()
+        if self.instance is not None:
+            # Renaming a live schema would break django-tenants routing
+            fields['schema_name'].read_only = True
+        return fields
+
+class TenantUsageSerializer(serializers.ModelSerializer):
+    schema_name = serializers.CharField(source='tenant.schema_name', read_only=True)
+    name = serializers.CharField(source='tenant.name', read_only=True)
+
+    class Meta:
+        model = TenantUsage
+        fields = [
+            'tenant', 'schema_name', 'name', 'tasks_by_status', 'task_count', 'archived_task_count',
+            'user_count', 'active_user_count', 'comment_count', 'recent_comment_count',
+            'attachment_count', 'attachment_bytes', 'growth', 'computed_at', 'duration_ms',
+        ]
+        read_only_fields = fields
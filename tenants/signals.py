@@ -0,0 +1,30 @@
+from django.db.models.signals import (post_delete, post_save, pre_delete,
+                                      pre_save)
+from django.dispatch import receiver
+
+from . import domains
+from .models import Domain, Tenant
+
+
+@receiver(pre_save, sender=Domain)
+def invalidate_renamed_domain(sender, instance, raw=False, **kwargs):
+    # The old hostname must stop resolving to this tenant as well
+    if raw or instance.pk is None:
+        return
+    previous = Domain.objects.filter(pk=instance.pk).values_list('domain', flat=True).first()
+    if previous and previous != instance.domain:
+        domains.invalidate([previous])
+
+
+@receiver(post_save, sender=Domain)
+@receiver(post_delete, sender=Domain)
+def invalidate_domain(sender, instance, **kwargs):
+    domains.invalidate([instance.domain])
+
+
+@receiver(post_save, sender=Tenant)
+@receiver(pre_delete, sender=Tenant)
+def invalidate_tenant_domains(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    domains.invalidate(instance.domains.values_list('domain', flat=True))
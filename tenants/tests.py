@@ -1,3 +1,54 @@
-from django.test import TestCase
+from django.contrib.auth import get_user_model
+from django.test import Client, TestCase, override_settings
+from django_tenants.utils import get_public_schema_name
+from rest_framework_simplejwt.tokens import RefreshToken
 
-# Create your tests here.
+from .models import Domain, Tenant
+
+User = get_user_model()
+
+PUBLIC_HOST = 'public.test.com'
+
+
+@override_settings(ALLOWED_HOSTS=[PUBLIC_HOST])
+class TenantPermissionTests(TestCase):
+    """The tenant directory is served from the public host, where every request resolves to the public tenant."""
+    @classmethod
+    def setUpTestData(cls):
+        cls.public, _ = Tenant.objects.get_or_create(schema_name=get_public_schema_name(), defaults={'name': 'Public'})
+        Domain.objects.get_or_create(domain=PUBLIC_HOST, defaults={'tenant': cls.public, 'is_primary': False})
+        cls.member = User.objects.create_user('member', password='x', role='admin')
+        cls.superuser = User.objects.create_superuser('root', 'root@example.com', 'x')
+
+    def client_for(self, user):
+        token = RefreshToken.for_user(user).access_token
+        return Client(HTTP_HOST=PUBLIC_HOST, HTTP_AUTHORIZATION=f'Bearer {token}')
+
+    def test_other_users_only_read_their_tenant(self):
+        client = self.client_for(self.member)
+        url = f'/api/tenants/{self.public.pk}/'
+        self.assertEqual(client.get(url).status_code, 200)
+        self.assertEqual(client.patch(url, {'name': 'Taken'}, content_type='application/json').status_code, 403)
+        self.assertEqual(
+            client.put(url, {'name': 'Taken', 'schema_name': 'taken', 'domain': 'x.test.com'},
+                       content_type='application/json').status_code,
+            403,
+        )
+        self.assertEqual(client.delete(url).status_code, 403)
+        self.assertEqual(
+            client.post(f'{url}add_domain/', {'domain': 'evil.test.com'}, content_type='application/json').status_code,
+            403,
+        )
+        self.public.refresh_from_db()
+        self.assertNotEqual(self.public.name, 'Taken')
+        self.assertFalse(Domain.objects.filter(domain='evil.test.com').exists())
+
+    def test_schema_name_cannot_be_changed(self):
+        response = self.client_for(self.superuser).patch(
+            f'/api/tenants/{self.public.pk}/', {'name': 'Renamed', 'schema_name': 'renamed'},
+            content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 200)
+        self.public.refresh_from_db()
+        self.assertEqual(self.public.name, 'Renamed')
+        self.assertEqual(self.public.schema_name, get_public_schema_name())
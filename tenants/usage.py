@@ -0,0 +1,208 @@
+"""
+Cross-tenant usage reports.
+
+Each tenant's report (tasks by status, users and active users, comment
+volume, attachment count and bytes, monthly growth) is computed inside its
+own schema by a pool of ``USAGE_REPORT_WORKERS`` threads. Django connections
+are per thread, so every worker switches its own connection between schemas
+and closes it when the tenant is done. Results are written to
+``TenantUsage`` in the public schema with one upsert.
+
+Refreshes are incremental: tenants whose cached row is younger than
+``USAGE_REPORT_MAX_AGE`` are skipped, and for the rest only the months since
+the previous report are recounted; earlier growth buckets are carried over.
+"""
+import logging
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import timedelta
+from datetime import timezone as dt_timezone
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+from django_tenants.utils import schema_context
+
+from tasks.activity import month_start
+from tasks.models import (ArchivedTask, ArchivedTaskAttachment,
+                          ArchivedTaskComment, Task, TaskActivity,
+                          TaskAttachment, TaskComment)
+
+from .models import Tenant, TenantUsage
+
+logger = logging.getLogger(__name__)
+
+USAGE_FIELDS = (
+    'tasks_by_status', 'task_count', 'archived_task_count', 'user_count', 'active_user_count',
+    'comment_count', 'recent_comment_count', 'attachment_count', 'attachment_bytes',
+    'growth', 'computed_at', 'duration_ms',
+)
+COUNT_FIELDS = (
+    'task_count', 'archived_task_count', 'user_count', 'active_user_count',
+    'comment_count', 'recent_comment_count', 'attachment_count', 'attachment_bytes',
+)
+
+
+def _month_key(moment):
+    return f'{moment:%Y-%m}'
+
+
+def _monthly(queryset, field, since):
+    return (
+        queryset.filter(**{f'{field}__gte': since})
+        .annotate(month=TruncMonth(field, tzinfo=dt_timezone.utc))
+        .order_by()
+        .values_list('month')
+        .annotate(count=Count('pk'))
+    )
+
+
+def _growth(since, months):
+    buckets = {
+        _month_key(month_start(since, offset)): {'tasks': 0, 'comments': 0, 'users': 0}
+        for offset in range(months)
+    }
+    sources = (
+        ('tasks', Task.objects, 'created_at'),
+        ('tasks', ArchivedTask.objects, 'created_at'),
+        ('comments', TaskComment.objects, 'created_at'),
+        ('comments', ArchivedTaskComment.objects, 'created_at'),
+        ('users', get_user_model().objects, 'date_joined'),
+    )
+    for key, queryset, field in sources:
+        for month, count in _monthly(queryset, field, since):
+            buckets.setdefault(_month_key(month), {'tasks': 0, 'comments': 0, 'users': 0})[key] += count
+    return buckets
+
+
+def compute_usage(previous=None, now=None):
+    """
+    Compute the usage report of the current schema as ``TenantUsage`` field values.
+
+    With a ``previous`` report, growth is only recounted from the month that
+    report was computed in.
+    """
+    started = time.perf_counter()
+    now = now or timezone.now()
+    months = getattr(settings, 'USAGE_GROWTH_MONTHS', 12)
+    active_since = now - timedelta(days=getattr(settings, 'USAGE_ACTIVE_DAYS', 30))
+
+    tasks_by_status = dict(
+        Task.objects.order_by().values_list('status').annotate(count=Count('pk'))
+    )
+    comments = TaskComment.objects.aggregate(
+        total=Count('pk'), recent=Count('pk', filter=Q(created_at__gte=active_since)),
+    )
+    attachments = TaskAttachment.objects.aggregate(count=Count('pk'), bytes=Sum('size', default=0))
+    archived_attachments = ArchivedTaskAttachment.objects.aggregate(count=Count('pk'), bytes=Sum('size', default=0))
+
+    window_start = month_start(now, -(months - 1))
+    since = window_start
+    growth = {}
+    if previous is not None and previous.computed_at > window_start:
+        since = month_start(previous.computed_at)
+        range_start, range_end = _month_key(window_start), _month_key(since)
+        growth = {month: counts for month, counts in previous.growth.items() if range_start <= month < range_end}
+    remaining = (now.year - since.year) * 12 + now.month - since.month + 1
+    growth.update(_growth(since, remaining))
+
+    return {
+        'tasks_by_status': tasks_by_status,
+        'task_count': sum(tasks_by_status.values()),
+        'archived_task_count': ArchivedTask.objects.count(),
+        'user_count': get_user_model().objects.count(),
+        # Actors are plain ids, so users deleted since are left out here
+        'active_user_count': get_user_model().objects.filter(
+            pk__in=TaskActivity.objects.filter(created_at__gte=active_since).values('actor_id'),
+        ).count(),
+        'comment_count': comments['total'] + ArchivedTaskComment.objects.count(),
+        'recent_comment_count': comments['recent'],
+        'attachment_count': attachments['count'] + archived_attachments['count'],
+        'attachment_bytes': attachments['bytes'] + archived_attachments['bytes'],
+        'growth': dict(sorted(growth.items())),
+        'computed_at': now,
+        'duration_ms': round((time.perf_counter() - started) * 1000),
+    }
+
+
+def _compute_tenant(schema_name, previous, now):
+    # Runs on a pool thread, which owns its connection
+    try:
+        with schema_context(schema_name):
+            return compute_usage(previous, now)
+    finally:
+        connection.close()
+
+
+def stale_tenants(max_age=None, schema_names=None, now=None):
+    """``(tenant, cached report or None)`` for every tenant whose report is missing or older than ``max_age``."""
+    now = now or timezone.now()
+    if max_age is None:
+        max_age = getattr(settings, 'USAGE_REPORT_MAX_AGE', timedelta(hours=1))
+    tenants = Tenant.objects.order_by('pk')
+    if schema_names:
+        tenants = tenants.filter(schema_name__in=schema_names)
+    tenants = list(tenants)
+    cached = TenantUsage.objects.in_bulk([tenant.pk for tenant in tenants])
+    return [
+        (tenant, cached.get(tenant.pk))
+        for tenant in tenants
+        if tenant.pk not in cached or cached[tenant.pk].computed_at <= now - max_age
+    ]
+
+
+def refresh_usage(max_age=None, workers=None, schema_names=None, now=None):
+    """
+    Recompute the stale tenant reports concurrently and store them.
+
+    A tenant whose report fails is logged and keeps its previous row.
+    Returns the refreshed ``TenantUsage`` objects.
+    """
+    now = now or timezone.now()
+    workers = workers or getattr(settings, 'USAGE_REPORT_WORKERS', 4)
+    stale = stale_tenants(max_age, schema_names, now)
+    if not stale:
+        return []
+
+    refreshed = []
+    with ThreadPoolExecutor(max_workers=min(workers, len(stale)), thread_name_prefix='tenant-usage') as pool:
+        futures = {
+            pool.submit(_compute_tenant, tenant.schema_name, previous, now): tenant
+            for tenant, previous in stale
+        }
+        for future in as_completed(futures):
+            tenant = futures[future]
+            try:
+                values = future.result()
+            except Exception:
+                logger.exception('Usage report of tenant %s failed', tenant.schema_name)
+                continue
+            refreshed.append(TenantUsage(tenant=tenant, **values))
+
+    TenantUsage.objects.bulk_create(
+        refreshed, update_conflicts=True, unique_fields=['tenant'],
+        update_fields=list(USAGE_FIELDS),
+    )
+    logger.info('Refreshed usage of %d of %d stale tenants', len(refreshed), len(stale))
+    return refreshed
+
+
+def totals(reports):
+    """Sum of the given reports, in the same shape as a single report."""
+    summed = dict.fromkeys(COUNT_FIELDS, 0)
+    by_status = Counter()
+    growth = {}
+    for report in reports:
+        for field in COUNT_FIELDS:
+            summed[field] += getattr(report, field)
+        by_status.update(report.tasks_by_status)
+        for month, counts in report.growth.items():
+            bucket = growth.setdefault(month, Counter())
+            bucket.update(counts)
+    summed['tasks_by_status'] = dict(by_status)
+    summed['growth'] = {month: dict(counts) for month, counts in sorted(growth.items())}
+    return summed
@@ -1,17 +1,47 @@
+from datetime import timedelta
+
 from django.db import transaction
+from django.db.models import Prefetch, Q
 from django.shortcuts import render
-from drf_spectacular.types import OpenApiTypes
-from drf_spectacular.utils import (OpenApiExample, OpenApiParameter,
-                                   extend_schema)
+from django.utils import timezone
+from django_filters import rest_framework as filters
 from rest_framework import permissions, status, viewsets
 from rest_framework.decorators import action
 from rest_framework.response import Response
 
-from .models import Domain, Tenant
-from .serializers import DomainSerializer, TenantSerializer
+from task_management_system.docs import (OpenApiExample, OpenApiParameter,
+                                         OpenApiTypes, extend_schema)
+from task_management_system.profiling import ProfilingMixin
+
+from . import usage
+from .models import Domain, Tenant, TenantUsage
+from .pagination import TenantCursorPagination
+from .permissions import IsSuperuser
+from .search import search_tenants
+from .serializers import (DomainSerializer, TenantSerializer,
+                          TenantUsageSerializer)
 
 # Create your views here.
 
+class TenantFilter(filters.FilterSet):
+    search = filters.CharFilter(method='filter_search')
+    is_active = filters.BooleanFilter(method='filter_is_active')
+
+    class Meta:
+        model = Tenant
+        fields = {
+            'paid_until': ['exact', 'gte', 'lte', 'isnull'],
+            'on_trial': ['exact'],
+        }
+
+    def filter_search(self, queryset, name, value):
+        return search_tenants(queryset, value)
+
+    def filter_is_active(self, queryset, name, value):
+        # Active: on trial, paid up to today or later, or without an end date
+        active = Q(on_trial=True) | Q(paid_until__isnull=True) | Q(paid_until__gte=timezone.localdate())
+        return queryset.filter(active) if value else queryset.exclude(active)
+
 @extend_schema(
     tags=['Tenants'],
     summary="Tenant Management",
@@ -20,13 +50,25 @@ from .serializers import DomainSerializer, TenantSerializer
         OpenApiParameter(
             name="search",
             type=OpenApiTypes.STR,
-            description="Search tenants by name or domain",
+            description="Search tenants by name, schema name or domain",
             required=False
         ),
         OpenApiParameter(
             name="is_active",
             type=OpenApiTypes.BOOL,
-            description="Filter tenants by active status",
+            description="Filter tenants that are on trial, paid up or without an end date",
+            required=False
+        ),
+        OpenApiParameter(
+            name="paid_until",
+            type=OpenApiTypes.DATE,
+            description="Filter tenants by paid-until date (also paid_until__gte, __lte, __isnull)",
+            required=False
+        ),
+        OpenApiParameter(
+            name="on_trial",
+            type=OpenApiTypes.BOOL,
+            description="Filter tenants by trial status",
             required=False
         ),
     ],
@@ -44,15 +86,28 @@ from .serializers import DomainSerializer, TenantSerializer
         ),
     ]
 )
-class TenantViewSet(viewsets.ModelViewSet):
+class TenantViewSet(ProfilingMixin, viewsets.ModelViewSet):
     queryset = Tenant.objects.all()
     serializer_class = TenantSerializer
     permission_classes = [permissions.IsAuthenticated]
+    filter_backends = [filters.DjangoFilterBackend]
+    filterset_class = TenantFilter
+    pagination_class = TenantCursorPagination
 
     def get_queryset(self):
+        # One query loads the domains of the whole page
+        queryset = Tenant.objects.prefetch_related(
+            Prefetch('domains', queryset=Domain.objects.order_by('-is_primary', 'domain')),
+        )
         if self.request.user.is_superuser:
-            return Tenant.objects.all()
-        return Tenant.objects.filter(id=self.request.user.tenant_id)
+            return queryset
+        return queryset.filter(pk=self.request.tenant.pk)
+
+    def get_permissions(self):
+        # Other users only read their own tenant's row
+        if self.action in ('update', 'partial_update', 'destroy', 'add_domain'):
+            return [IsSuperuser()]
+        return super().get_permissions()
 
     @transaction.atomic
     def create(self, request, *args, **kwargs):
@@ -120,3 +175,64 @@ class TenantViewSet(viewsets.ModelViewSet):
         new_domain.save()
         
         return Response({'message': 'Domain added successfully'})
+
+    @extend_schema(
+        summary="Cross-Tenant Usage Report",
+        description=(
+            "Superusers only. Returns the cached usage report of every tenant (tasks by status, "
+            "users, active users, comments, attachment bytes and monthly growth) plus totals. "
+            "With `refresh=true` and exactly one `schema`, that tenant's report is recomputed "
+            "first if it is older than `max_age_minutes` (default `USAGE_REPORT_MAX_AGE`). "
+            "Refreshing every tenant is left to `python manage.py tenant_usage`."
+        ),
+        parameters=[
+            OpenApiParameter(
+                name="refresh",
+                type=OpenApiTypes.BOOL,
+                description="Recompute the report of the single requested `schema` if it is stale",
+                required=False
+            ),
+            OpenApiParameter(
+                name="max_age_minutes",
+                type=OpenApiTypes.INT,
+                description="Age after which a cached report counts as stale",
+                required=False
+            ),
+            OpenApiParameter(
+                name="schema",
+                type=OpenApiTypes.STR,
+                description="Only report on these tenant schemas (repeatable)",
+                required=False
+            ),
+        ],
+        responses={200: OpenApiTypes.OBJECT},
+    )
+    @action(detail=False, methods=['get'], permission_classes=[IsSuperuser])
+    def usage(self, request):
+        schema_names = request.query_params.getlist('schema')
+        if request.query_params.get('refresh', '').lower() in ('1', 'true', 'yes'):
+            # Recomputing scans a whole tenant, so a request refreshes at most one
+            if len(schema_names) != 1:
+                return Response(
+                    {'error': 'refresh=true needs exactly one schema; '
+                              'run `manage.py tenant_usage` to refresh every tenant'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            max_age = request.query_params.get('max_age_minutes')
+            try:
+                max_age = timedelta(minutes=int(max_age)) if max_age else None
+            except ValueError:
+                return Response(
+                    {'error': 'max_age_minutes must be an integer'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            usage.refresh_usage(max_age=max_age, schema_names=schema_names)
+
+        reports = TenantUsage.objects.select_related('tenant').order_by('tenant__schema_name')
+        if schema_names:
+            reports = reports.filter(tenant__schema_name__in=schema_names)
+        reports = list(reports)
+        return Response({
+            'tenants': TenantUsageSerializer(reports, many=True).data,
+            'totals': usage.totals(reports),
+        })
@@ -0,0 +1,19 @@
+"""
+Cached user representations and typeahead results (see ``task_management_system.cache``);
+representations are built by ``users.representations``.
+"""
+from task_management_system.cache import RepresentationCache, TwoLevelCache
+
+from .representations import build_users
+from .serializers import CustomUserSerializer
+
+user_representations = RepresentationCache('user', build_users)
+# Result rows of `/api/users/lookup/`, keyed by the caller's scope and the query
+user_lookups = TwoLevelCache('user-lookup', timeout=60)
+
+REPRESENTED_FIELDS = frozenset(CustomUserSerializer.Meta.fields)
+
+
+def represented_fields_changed(update_fields):
+    """Whether a save with ``update_fields`` can change what the caches hold (``last_login`` cannot)."""
+    return update_fields is None or bool(REPRESENTED_FIELDS.intersection(update_fields))
@@ -0,0 +1,54 @@
+import csv
+import json
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from users import provisioning
+
+
+class Command(BaseCommand):
+    help = (
+        'Creates users in bulk from a CSV file (with a header line) or a JSON list; see '
+        'users.provisioning. Passwords are hashed in parallel, rows without one get an invite. '
+        'Run it through `tenant_command`, e.g. `tenant_command provision_users --schema=acme users.csv`.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="CSV or JSON file, or '-' for standard input")
+        parser.add_argument('--format', choices=['csv', 'json'], help='Default: from the file extension, else CSV')
+        parser.add_argument('--invite', action='store_true', help='Invite every user instead of setting passwords')
+        parser.add_argument('--atomic', action='store_true', help='Create no user unless all rows are valid')
+        parser.add_argument('--workers', type=int, help='Hashing processes (default: USER_PROVISION_WORKERS)')
+        parser.add_argument('--chunk-size', type=int, help='Users per INSERT (default: USER_PROVISION_CHUNK_SIZE)')
+        parser.add_argument('--report', help='Write the per-row results (ids, invites, errors) to this JSON file')
+
+    def handle(self, *args, **options):
+        try:
+            if options['path'] == '-':
+                rows = provisioning.read_rows(sys.stdin, options['format'] or 'csv')
+            else:
+                with open(options['path'], 'rb') as f:
+                    rows = provisioning.read_rows(f, options['format'], name=options['path'])
+        except (OSError, ValueError, csv.Error) as exc:
+            raise CommandError(f'Cannot read {options["path"]}: {exc}')
+
+        started = time.monotonic()
+        created, results = provisioning.provision(
+            rows, invite=options['invite'], atomic=options['atomic'],
+            workers=options['workers'], chunk_size=options['chunk_size'],
+        )
+        elapsed = time.monotonic() - started
+
+        failed = [result for result in results if 'errors' in result]
+        for result in failed[:20]:
+            self.stdout.write(self.style.WARNING(f"row {result['row']} {result['username']!r}: {json.dumps(result['errors'])}"))
+        if len(failed) > 20:
+            self.stdout.write(self.style.WARNING(f'... and {len(failed) - 20} more rows failed'))
+        if options['report']:
+            with open(options['report'], 'w') as f:
+                json.dump(results, f, indent=2)
+        self.stdout.write(self.style.SUCCESS(
+            f'Created {created} of {len(results)} users in {elapsed:.1f}s ({len(failed)} failed)'
+        ))
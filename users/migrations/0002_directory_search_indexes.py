@@ -0,0 +1,42 @@
+# Generated by Django 5.1.7 on 2026-10-19 08:57
+
+import django.contrib.postgres.indexes
+import django.db.models.functions.text
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('users', '0001_initial'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.AddIndex(
+            model_name='customuser',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('username'), name='gin_trgm_ops'), name='user_username_trgm'),
+        ),
+        migrations.AddIndex(
+            model_name='customuser',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('email'), name='gin_trgm_ops'), name='user_email_trgm'),
+        ),
+        migrations.AddIndex(
+            model_name='customuser',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('first_name'), name='gin_trgm_ops'), name='user_first_name_trgm'),
+        ),
+        migrations.AddIndex(
+            model_name='customuser',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('last_name'), name='gin_trgm_ops'), name='user_last_name_trgm'),
+        ),
+        migrations.AddIndex(
+            model_name='customuser',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('department'), name='gin_trgm_ops'), name='user_department_trgm'),
+        ),
+        migrations.AddIndex(
+            model_name='customuser',
+            index=models.Index(fields=['role', 'department'], name='user_role_department_idx'),
+        ),
+    ]
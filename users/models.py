@@ -1,5 +1,7 @@
 from django.contrib.auth.models import AbstractUser
+from django.contrib.postgres.indexes import GinIndex, OpClass
 from django.db import models
+from django.db.models.functions import Upper
 
 
 class CustomUser(AbstractUser):
@@ -13,6 +15,18 @@ class CustomUser(AbstractUser):
     phone_number = models.CharField(max_length=15, blank=True)
     department = models.CharField(max_length=100, blank=True)
     profile_picture = models.ImageField(upload_to='profile_pics/', null=True, blank=True)
+
+    class Meta(AbstractUser.Meta):
+        # Trigram indexes on UPPER(column) serve Django's case-insensitive
+        # lookups (``UPPER(col) LIKE UPPER(%s)``) as well as fuzzy matching.
+        indexes = [
+            GinIndex(OpClass(Upper('username'), name='gin_trgm_ops'), name='user_username_trgm'),
+            GinIndex(OpClass(Upper('email'), name='gin_trgm_ops'), name='user_email_trgm'),
+            GinIndex(OpClass(Upper('first_name'), name='gin_trgm_ops'), name='user_first_name_trgm'),
+            GinIndex(OpClass(Upper('last_name'), name='gin_trgm_ops'), name='user_last_name_trgm'),
+            GinIndex(OpClass(Upper('department'), name='gin_trgm_ops'), name='user_department_trgm'),
+            models.Index(fields=['role', 'department'], name='user_role_department_idx'),
+        ]
     
     def __str__(self):
         return self.username
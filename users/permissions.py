@@ -0,0 +1,17 @@
+from rest_framework import permissions
+
+
+class IsTenantAdmin(permissions.BasePermission):
+    """
+    Only lets admins of the current tenant through.
+    """
+    def has_permission(self, request, view):
+        return bool(request.user and request.user.is_authenticated and request.user.role == 'admin')
+
+
+class IsManagerOrAdmin(permissions.BasePermission):
+    """
+    Only lets managers and admins of the current tenant through.
+    """
+    def has_permission(self, request, view):
+        return bool(request.user and request.user.is_authenticated and request.user.role in ('manager', 'admin'))
@@ -0,0 +1,229 @@
+"""
+Bulk creation of users from CSV or JSON rows.
+
+``UserCreateSerializer`` costs a request, uniqueness queries and one PBKDF2
+hash per user. Here a whole file is handled at once:
+
+* Rows are checked with ``ProvisionRowSerializer``, which runs no queries.
+  Taken usernames are looked up with one query for the whole file, and
+  usernames repeated within the file are reported as well.
+* Passwords are validated and hashed in a pool of
+  ``USER_PROVISION_WORKERS`` processes; hashing is CPU-bound and would
+  serialize on the GIL in threads.
+* With ``invite``, or for rows without a password, the user gets an
+  unusable password and nothing is hashed at all. The row's result carries
+  an invite token (``django.contrib.auth.tokens``) that
+  ``POST /api/users/accept_invite/`` exchanges for a password; like a
+  password reset token it expires after ``PASSWORD_RESET_TIMEOUT``.
+* Valid rows are inserted with ``bulk_create`` in chunks of
+  ``USER_PROVISION_CHUNK_SIZE``. A chunk that conflicts with users created
+  meanwhile is inserted again row by row, so only the conflicting rows fail.
+
+Every input row gets a result, in input order: ``{"row", "username", "id"}``
+(plus ``"invite"``) when it was created, ``{"row", "username", "errors"}``
+when it was not.
+"""
+import csv
+import io
+import json
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.base_user import BaseUserManager
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.password_validation import validate_password
+from django.contrib.auth.tokens import default_token_generator
+from django.contrib.auth.validators import UnicodeUsernameValidator
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.utils.encoding import force_bytes
+from django.utils.http import urlsafe_base64_encode
+from rest_framework import serializers
+
+User = get_user_model()
+
+ATTRIBUTES = ('username', 'email', 'first_name', 'last_name', 'role', 'phone_number', 'department')
+# Below this many passwords, starting the pool costs more than it saves
+POOL_THRESHOLD = 4
+
+
+class ProvisionRowSerializer(serializers.Serializer):
+    username = serializers.CharField(max_length=150, validators=[UnicodeUsernameValidator()])
+    email = serializers.EmailField(required=False, allow_blank=True, default='')
+    first_name = serializers.CharField(max_length=150, required=False, allow_blank=True, default='')
+    last_name = serializers.CharField(max_length=150, required=False, allow_blank=True, default='')
+    role = serializers.ChoiceField(choices=User.ROLE_CHOICES, default='employee')
+    phone_number = serializers.CharField(max_length=15, required=False, allow_blank=True, default='')
+    department = serializers.CharField(max_length=100, required=False, allow_blank=True, default='')
+    password = serializers.CharField(required=False, allow_blank=True, default='', trim_whitespace=False)
+
+
+def read_rows(stream, format=None, name=''):
+    """Rows of a CSV file with a header line, or of a JSON list (or ``{"users": [...]}``)."""
+    if format is None:
+        format = 'json' if name.lower().endswith('.json') else 'csv'
+    content = stream.read()
+    if isinstance(content, bytes):
+        content = content.decode('utf-8-sig')
+    if format == 'json':
+        rows = json.loads(content)
+        if isinstance(rows, dict):
+            rows = rows.get('users')
+        if not isinstance(rows, list):
+            raise ValueError('Expected a list of users.')
+        return rows
+    reader = csv.DictReader(io.StringIO(content))
+    return [{key.strip(): value for key, value in row.items() if key} for row in reader]
+
+
+def _init_worker():
+    # Pool processes that were not forked from a set-up process need Django first
+    import django
+
+    django.setup()
+
+
+def _check_and_hash(item):
+    """Runs in a pool process: ``(errors, None)`` for a rejected password, else ``(None, hash)``."""
+    attributes, password = item
+    try:
+        validate_password(password, User(**attributes))
+    except DjangoValidationError as exc:
+        return list(exc.messages), None
+    return None, make_password(password)
+
+
+def hash_passwords(items, workers=None):
+    """``_check_and_hash`` of every ``(attributes, password)`` item, in order."""
+    workers = max(1, workers or getattr(settings, 'USER_PROVISION_WORKERS', 2))
+    if workers == 1 or len(items) < POOL_THRESHOLD:
+        return [_check_and_hash(item) for item in items]
+    workers = min(workers, len(items))
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+        return list(pool.map(_check_and_hash, items, chunksize=max(1, len(items) // (workers * 4))))
+
+
+def invite_for(user):
+    uid = urlsafe_base64_encode(force_bytes(user.pk))
+    token = default_token_generator.make_token(user)
+    invite = {'uid': uid, 'token': token}
+    url = getattr(settings, 'USER_INVITE_URL', '')
+    if url:
+        invite['url'] = url.format(uid=uid, token=token)
+    return invite
+
+
+def _insert(users, chunk_size):
+    """``bulk_create`` ``{row: user}`` in chunks; returns ``{row: errors}`` of the users that conflicted."""
+    rows = list(users)
+    conflicts = {}
+    for start in range(0, len(rows), chunk_size):
+        chunk = rows[start:start + chunk_size]
+        try:
+            with transaction.atomic():
+                User.objects.bulk_create([users[row] for row in chunk])
+        except IntegrityError:
+            # Someone created one of these meanwhile; find out which, row by row
+            for row in chunk:
+                users[row].pk = None
+                try:
+                    with transaction.atomic():
+                        users[row].save(force_insert=True)
+                except IntegrityError:
+                    conflicts[row] = {'username': ['A user with that username already exists.']}
+    return conflicts
+
+
+def provision(rows, invite=False, atomic=False, workers=None, chunk_size=None):
+    """Create users from ``rows`` (dicts); returns ``(created, results)``."""
+    chunk_size = chunk_size or getattr(settings, 'USER_PROVISION_CHUNK_SIZE', 500)
+    rows = [row if isinstance(row, dict) else {} for row in rows]
+    results = [{'row': index, 'username': row.get('username', '')} for index, row in enumerate(rows)]
+    valid = {}
+    for index, row in enumerate(rows):
+        serializer = ProvisionRowSerializer(data=row)
+        if serializer.is_valid():
+            data = serializer.validated_data
+            data['username'] = User.normalize_username(data['username'])
+            data['email'] = BaseUserManager.normalize_email(data['email'])
+            results[index]['username'] = data['username']
+            valid[index] = data
+        else:
+            results[index]['errors'] = serializer.errors
+
+    # Usernames taken already or earlier in the file
+    names = [data['username'] for data in valid.values()]
+    taken = set(User.objects.filter(username__in=names).values_list('username', flat=True))
+    for index, data in list(valid.items()):
+        if data['username'] in taken:
+            results[index]['errors'] = {'username': ['A user with that username already exists.']}
+            del valid[index]
+        taken.add(data['username'])
+
+    hashing = [index for index, data in valid.items() if data['password'] and not invite]
+    hashed = hash_passwords(
+        [({name: valid[index][name] for name in ATTRIBUTES}, valid[index]['password']) for index in hashing], workers,
+    )
+    passwords = {}
+    for index, (errors, password) in zip(hashing, hashed):
+        if errors:
+            results[index]['errors'] = {'password': errors}
+            del valid[index]
+        else:
+            passwords[index] = password
+
+    if atomic and any('errors' in result for result in results):
+        return 0, _not_created(results)
+
+    users = {}
+    for index, data in valid.items():
+        user = User(**{name: data[name] for name in ATTRIBUTES})
+        if index in passwords:
+            user.password = passwords[index]
+        else:
+            user.set_unusable_password()
+        users[index] = user
+
+    with transaction.atomic() if atomic else nullcontext():
+        conflicts = _insert(users, chunk_size)
+        for index, errors in conflicts.items():
+            results[index]['errors'] = errors
+            del users[index]
+        if atomic and conflicts:
+            transaction.set_rollback(True)
+            return 0, _not_created(results)
+        _refresh_manager_visibility(users.values())
+
+    for index, user in users.items():
+        results[index]['id'] = user.pk
+        if index not in passwords:
+            results[index]['invite'] = invite_for(user)
+    if users:
+        # Imported here: users.cache imports the serializers, which import this module
+        from .cache import user_lookups
+
+        user_lookups.bump()
+    return len(users), results
+
+
+def _not_created(results):
+    for result in results:
+        result.setdefault('errors', {'non_field_errors': ['Not created because other rows failed.']})
+    return results
+
+
+def _refresh_manager_visibility(users):
+    # New managers see the tasks of their department's members; other new users have no tasks yet
+    from tasks import visibility
+    from tasks.models import Task
+
+    departments = {user.department for user in users if user.role == 'manager' and user.department}
+    if departments:
+        visibility.refresh_tasks(
+            Task.objects.filter(
+                Q(created_by__department__in=departments) | Q(assigned_to__department__in=departments),
+            ).values_list('pk', flat=True)
+        )
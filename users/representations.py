@@ -0,0 +1,30 @@
+"""
+``CustomUserSerializer`` output built from ``.values()`` rows (see
+``task_management_system.representations``).
+"""
+from django.contrib.auth import get_user_model
+
+from task_management_system.representations import file_url
+
+User = get_user_model()
+
+USER_COLUMNS = (
+    'id', 'username', 'email', 'first_name', 'last_name',
+    'role', 'phone_number', 'department', 'profile_picture',
+)
+
+
+def user_representation(row, request=None):
+    """The ``CustomUserSerializer`` representation of a ``USER_COLUMNS`` row."""
+    data = dict(row)
+    data['profile_picture'] = file_url(
+        row['profile_picture'], request, User._meta.get_field('profile_picture').storage,
+    )
+    return data
+
+
+def build_users(ids, context=None):
+    """``{pk: representation}`` of the users in ``ids`` that exist, in one query."""
+    request = (context or {}).get('request')
+    rows = User.objects.filter(pk__in=ids).values(*USER_COLUMNS)
+    return {row['id']: user_representation(row, request) for row in rows}
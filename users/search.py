@@ -0,0 +1,42 @@
+"""
+User directory search.
+
+Every searchable column has a trigram GIN index on ``UPPER(column)`` (see
+migration 0002). Postgres uses it for Django's ``istartswith``/``icontains``
+lookups and for the ``%>`` word similarity operator, as long as the latter is
+applied to the same ``UPPER(column)`` expression. Short terms only do prefix matching; longer ones also
+match fuzzily and are ranked by their best word similarity.
+"""
+from django.contrib.postgres.search import TrigramWordSimilarity
+from django.db.models import Case, FloatField, Q, Value, When
+from django.db.models.functions import Greatest, Upper
+
+SEARCH_FIELDS = ('username', 'email', 'first_name', 'last_name', 'department')
+
+# Below this length trigram similarity is mostly noise
+FUZZY_MIN_LENGTH = 3
+
+
+def search_users(queryset, term):
+    term = term.strip()
+    if not term:
+        return queryset
+
+    prefix = Q()
+    for field in SEARCH_FIELDS:
+        prefix |= Q(**{f'{field}__istartswith': term})
+    if len(term) < FUZZY_MIN_LENGTH:
+        return queryset.filter(prefix).order_by('username')
+
+    upper = {f'upper_{field}': Upper(field) for field in SEARCH_FIELDS}
+    fuzzy = Q()
+    for field in SEARCH_FIELDS:
+        fuzzy |= Q(**{f'{field}__icontains': term}) | Q(**{f'upper_{field}__trigram_word_similar': term})
+    similarity = Greatest(*(TrigramWordSimilarity(term, alias) for alias in upper))
+    return queryset.alias(**upper).filter(fuzzy).annotate(
+        search_rank=Case(
+            When(prefix, then=Value(2.0)),
+            default=similarity,
+            output_field=FloatField(),
+        ),
+    ).order_by('-search_rank', 'username')
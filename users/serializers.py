@@ -1,7 +1,16 @@
+import csv
+
+from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.contrib.auth.password_validation import validate_password
+from django.contrib.auth.tokens import default_token_generator
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.utils.encoding import force_str
+from django.utils.http import urlsafe_base64_decode
 from rest_framework import serializers
 
+from .provisioning import read_rows
+
 User = get_user_model()
 
 class CustomUserSerializer(serializers.ModelSerializer):
@@ -11,6 +20,16 @@ class CustomUserSerializer(serializers.ModelSerializer):
                  'role', 'phone_number', 'department', 'profile_picture']
         read_only_fields = ['id']
 
+class UserLookupSerializer(serializers.Serializer):
+    """Compact user shape for typeahead pickers, built from ``.values()`` rows."""
+    id = serializers.IntegerField()
+    username = serializers.CharField()
+    email = serializers.CharField()
+    first_name = serializers.CharField()
+    last_name = serializers.CharField()
+    role = serializers.CharField()
+    department = serializers.CharField()
+
 class UserCreateSerializer(serializers.ModelSerializer):
     password = serializers.CharField(write_only=True, required=True, validators=[validate_password])
     password2 = serializers.CharField(write_only=True, required=True)
@@ -28,4 +47,71 @@ class UserCreateSerializer(serializers.ModelSerializer):
     def create(self, validated_data):
         validated_data.pop('password2')
         user = User.objects.create_user(**validated_data)
-        return user 
\ No newline at end of file
+        return user
+
+class UserProvisionSerializer(serializers.Serializer):
+    users = serializers.ListField(child=serializers.DictField(), required=False, allow_empty=False)
+    file = serializers.FileField(required=False, help_text='CSV with a header line, or a JSON list')
+    invite = serializers.BooleanField(default=False, help_text='Create every user with an invite instead of a password')
+    atomic = serializers.BooleanField(default=False, help_text='Create no user unless all rows are valid')
+
+    def validate(self, attrs):
+        if ('users' in attrs) == ('file' in attrs):
+            raise serializers.ValidationError('Send either "users" or a "file".')
+        if 'file' in attrs:
+            upload = attrs.pop('file')
+            try:
+                attrs['users'] = read_rows(upload, name=upload.name)
+            except (ValueError, csv.Error) as exc:
+                raise serializers.ValidationError({'file': [f'Cannot read the file: {exc}']})
+        limit = getattr(settings, 'USER_PROVISION_MAX_ROWS', 10000)
+        if len(attrs['users']) > limit:
+            raise serializers.ValidationError({'users': [f'At most {limit} users per request.']})
+        # Hashing is the slow part; larger files with passwords go through `provision_users`
+        password_limit = getattr(settings, 'USER_PROVISION_MAX_PASSWORDS', 200)
+        if not attrs['invite'] and sum(1 for row in attrs['users'] if isinstance(row, dict) and row.get('password')) > password_limit:
+            raise serializers.ValidationError(
+                {'users': [f'At most {password_limit} users with passwords per request; invite the rest.']}
+            )
+        return attrs
+
+class ProvisionResultSerializer(serializers.Serializer):
+    row = serializers.IntegerField(help_text='Index of the row in the input')
+    username = serializers.CharField()
+    id = serializers.IntegerField(required=False)
+    invite = serializers.DictField(child=serializers.CharField(), required=False)
+    errors = serializers.DictField(required=False)
+
+class UserProvisionResponseSerializer(serializers.Serializer):
+    created = serializers.IntegerField()
+    failed = serializers.IntegerField()
+    results = ProvisionResultSerializer(many=True)
+
+class InviteAcceptSerializer(serializers.Serializer):
+    uid = serializers.CharField()
+    token = serializers.CharField()
+    password = serializers.CharField(write_only=True, trim_whitespace=False)
+    password2 = serializers.CharField(write_only=True, trim_whitespace=False)
+
+    def validate(self, attrs):
+        try:
+            user = User.objects.get(pk=int(force_str(urlsafe_base64_decode(attrs['uid']))))
+        except (TypeError, ValueError, OverflowError, User.DoesNotExist):
+            user = None
+        # Only invited users, who have never set a password, can use this
+        if user is None or user.has_usable_password() or not default_token_generator.check_token(user, attrs['token']):
+            raise serializers.ValidationError({'token': 'Invalid or expired invite.'})
+        if attrs['password'] != attrs['password2']:
+            raise serializers.ValidationError({"password": "Password fields didn't match."})
+        try:
+            validate_password(attrs['password'], user)
+        except DjangoValidationError as exc:
+            raise serializers.ValidationError({'password': list(exc.messages)})
+        attrs['user'] = user
+        return attrs
+
+    def save(self):
+        user = self.validated_data['user']
+        user.set_password(self.validated_data['password'])
+        user.save(update_fields=['password'])
+        return user
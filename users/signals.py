@@ -0,0 +1,17 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .cache import (represented_fields_changed, user_lookups,
+                    user_representations)
+
+User = get_user_model()
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_user_caches(sender, instance, update_fields=None, raw=False, **kwargs):
+    if raw or not represented_fields_changed(update_fields):
+        return
+    user_representations.invalidate([instance.pk])
+    user_lookups.bump()
@@ -1,3 +1,56 @@
-from django.test import TestCase
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django_tenants.test.cases import TenantTestCase
 
-# Create your tests here.
+from task_management_system.cache import local
+
+from .cache import user_lookups, user_representations
+from .provisioning import provision
+
+User = get_user_model()
+
+
+class UserCacheTests(TenantTestCase):
+    """Signal-driven invalidation of the user caches; ``update()`` below writes without sending signals."""
+    def setUp(self):
+        super().setUp()
+        local.clear()
+        caches['default'].clear()
+        self.addCleanup(local.clear)
+        self.user = User.objects.create_user('cached', password='x', role='employee', first_name='Old')
+
+    def first_name(self):
+        return [user['first_name'] for user in user_representations.render([self.user.pk])]
+
+    def test_saves_invalidate_the_representation(self):
+        self.assertEqual(self.first_name(), ['Old'])
+        User.objects.filter(pk=self.user.pk).update(first_name='Unsignalled')
+        self.assertEqual(self.first_name(), ['Old'])
+
+        self.user.first_name = 'New'
+        self.user.save()
+        self.assertEqual(self.first_name(), ['New'])
+
+    def test_logins_do_not_invalidate(self):
+        self.first_name()
+        User.objects.filter(pk=self.user.pk).update(first_name='Unsignalled')
+        self.user.save(update_fields=['last_login'])
+        self.assertEqual(self.first_name(), ['Old'])
+
+    def test_deleted_users_drop_out(self):
+        self.first_name()
+        self.user.delete()
+        self.assertEqual(self.first_name(), [])
+
+    def test_saves_and_provisioning_bump_the_lookups(self):
+        user_lookups.set_many({'query': ['cached']})
+        self.user.save()
+        self.assertEqual(user_lookups.get_many(['query']), {})
+
+        user_lookups.set_many({'query': ['cached']})
+        generation = user_lookups.generation()
+        # Provisioning inserts with bulk_create, which sends no post_save
+        created, _ = provision([{'username': 'newcomer'}, {'username': 'another'}])
+        self.assertEqual(created, 2)
+        self.assertEqual(user_lookups.generation(), generation + 1)
+        self.assertEqual(user_lookups.get_many(['query']), {})
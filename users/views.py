@@ -1,16 +1,43 @@
+from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.db.models import Q
 from django.shortcuts import render
-from drf_spectacular.types import OpenApiTypes
-from drf_spectacular.utils import (OpenApiExample, OpenApiParameter,
-                                   extend_schema)
+from django_filters import rest_framework as filters
 from rest_framework import permissions, status, viewsets
 from rest_framework.decorators import action
+from rest_framework.parsers import MultiPartParser
 from rest_framework.response import Response
 
-from .serializers import CustomUserSerializer, UserCreateSerializer
+from task_management_system.cache import digest
+from task_management_system.docs import (OpenApiExample, OpenApiParameter,
+                                         OpenApiTypes, extend_schema)
+from task_management_system.parsers import ORJSONParser
+from task_management_system.profiling import ProfilingMixin
+
+from . import provisioning
+from .cache import user_lookups, user_representations
+from .permissions import IsTenantAdmin
+from .search import search_users
+from .serializers import (CustomUserSerializer, InviteAcceptSerializer,
+                          UserCreateSerializer, UserLookupSerializer,
+                          UserProvisionResponseSerializer,
+                          UserProvisionSerializer)
 
 User = get_user_model()
 
+class UserFilter(filters.FilterSet):
+    search = filters.CharFilter(method='filter_search')
+
+    class Meta:
+        model = User
+        fields = {
+            'role': ['exact'],
+            'department': ['exact'],
+        }
+
+    def filter_search(self, queryset, name, value):
+        return search_users(queryset, value)
+
 @extend_schema(
     tags=['Users'],
     summary="User Management",
@@ -19,7 +46,7 @@ User = get_user_model()
         OpenApiParameter(
             name="search",
             type=OpenApiTypes.STR,
-            description="Search users by username or email",
+            description="Prefix/fuzzy search on username, email, first/last name and department",
             required=False
         ),
         OpenApiParameter(
@@ -27,7 +54,13 @@ User = get_user_model()
             type=OpenApiTypes.STR,
             description="Filter users by role",
             required=False,
-            enum=["admin", "manager", "user"]
+            enum=["admin", "manager", "employee"]
+        ),
+        OpenApiParameter(
+            name="department",
+            type=OpenApiTypes.STR,
+            description="Filter users by department",
+            required=False
         ),
     ],
     examples=[
@@ -44,26 +77,42 @@ User = get_user_model()
         ),
     ]
 )
-class UserViewSet(viewsets.ModelViewSet):
+class UserViewSet(ProfilingMixin, viewsets.ModelViewSet):
     queryset = User.objects.all()
     serializer_class = CustomUserSerializer
     permission_classes = [permissions.IsAuthenticated]
+    filter_backends = [filters.DjangoFilterBackend]
+    filterset_class = UserFilter
+    # Request class for throttling; actions override it (e.g. ``bulk``)
+    throttle_scope = None
 
     def get_queryset(self):
         user = self.request.user
         if user.role == 'admin':
             return User.objects.all()
         elif user.role == 'manager':
-            return User.objects.filter(role='employee')
+            # Managers see the employees of their own department
+            if not user.department:
+                return User.objects.filter(id=user.id)
+            return User.objects.filter(Q(department=user.department, role='employee') | Q(id=user.id))
         return User.objects.filter(id=user.id)
 
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        if not queryset.query.order_by:
+            queryset = queryset.order_by('username')
+        ids = queryset.values_list('pk', flat=True)
+        page = self.paginate_queryset(ids)
+        data = user_representations.render(list(page if page is not None else ids), self.get_serializer_context())
+        return self.get_paginated_response(data) if page is not None else Response(data)
+
     def get_serializer_class(self):
         if self.action == 'create':
             return UserCreateSerializer
         return CustomUserSerializer
 
     def get_permissions(self):
-        if self.action == 'create':
+        if self.action in ('create', 'accept_invite'):
             return [permissions.AllowAny()]
         return super().get_permissions()
 
@@ -90,3 +139,92 @@ class UserViewSet(viewsets.ModelViewSet):
     def me(self, request):
         serializer = self.get_serializer(request.user)
         return Response(serializer.data)
+
+    @extend_schema(
+        summary="User Lookup",
+        description="Compact, capped user search for assignee pickers and other typeaheads",
+        parameters=[
+            OpenApiParameter(name="q", type=OpenApiTypes.STR, description="Search term", required=False),
+            OpenApiParameter(name="role", type=OpenApiTypes.STR, required=False, enum=["admin", "manager", "employee"]),
+            OpenApiParameter(name="department", type=OpenApiTypes.STR, required=False),
+            OpenApiParameter(name="limit", type=OpenApiTypes.INT, description="Maximum number of results", required=False),
+        ],
+        responses={200: UserLookupSerializer(many=True)},
+    )
+    @action(detail=False, methods=['get'])
+    def lookup(self, request):
+        queryset = self.get_queryset()
+        if request.query_params.get('role'):
+            queryset = queryset.filter(role=request.query_params['role'])
+        if request.query_params.get('department'):
+            queryset = queryset.filter(department=request.query_params['department'])
+        queryset = search_users(queryset, request.query_params.get('q', ''))
+        try:
+            limit = int(request.query_params.get('limit', settings.USER_LOOKUP_DEFAULT_LIMIT))
+        except ValueError:
+            limit = settings.USER_LOOKUP_DEFAULT_LIMIT
+        limit = max(1, min(limit, settings.USER_LOOKUP_MAX_LIMIT))
+        if not queryset.query.order_by:
+            queryset = queryset.order_by('username')
+        rows = queryset.values(*UserLookupSerializer().fields)[:limit]
+        # What get_queryset() lets the caller see decides which cached results they may share
+        user = request.user
+        scope = ('all',) if user.role == 'admin' else (user.role, user.department, user.pk)
+        params = request.query_params
+        key = digest(scope, params.get('q', '').strip(), params.get('role'), params.get('department'), limit)
+        data = user_lookups.get_or_set(key, lambda: UserLookupSerializer(rows, many=True).data)
+        return Response(data)
+
+    @extend_schema(
+        summary="Provision Users",
+        description=(
+            "Create many users at once from a JSON list or an uploaded CSV/JSON file. Passwords are "
+            "validated and hashed in parallel; with `invite` (or for rows without a password) users get "
+            "an invite token instead of a password. Every row gets a result with its id or its errors. "
+            "Admins only."
+        ),
+        request={
+            'application/json': UserProvisionSerializer,
+            'multipart/form-data': UserProvisionSerializer,
+        },
+        responses={200: UserProvisionResponseSerializer},
+        examples=[
+            OpenApiExample(
+                'Invite Example',
+                value={
+                    "invite": True,
+                    "users": [
+                        {"username": "jane", "email": "jane@example.com", "role": "manager", "department": "eng"},
+                        {"username": "joe", "email": "joe@example.com"}
+                    ]
+                },
+                request_only=True,
+            ),
+        ]
+    )
+    @action(
+        detail=False, methods=['post'], permission_classes=[IsTenantAdmin],
+        parser_classes=[ORJSONParser, MultiPartParser], throttle_scope='bulk',
+    )
+    def provision(self, request):
+        serializer = UserProvisionSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        created, results = provisioning.provision(
+            serializer.validated_data['users'],
+            invite=serializer.validated_data['invite'],
+            atomic=serializer.validated_data['atomic'],
+        )
+        return Response({'created': created, 'failed': len(results) - created, 'results': results})
+
+    @extend_schema(
+        summary="Accept Invite",
+        description="Set the password of an invited user with the `uid` and `token` of their invite",
+        request=InviteAcceptSerializer,
+        responses={200: CustomUserSerializer},
+    )
+    @action(detail=False, methods=['post'])
+    def accept_invite(self, request):
+        serializer = InviteAcceptSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        user = serializer.save()
+        return Response(CustomUserSerializer(user).data)
@@ -0,0 +1,160 @@
+"""
+Signing and sending of webhook batches.
+
+A batch is one ``POST`` to the subscription URL with a JSON body
+``{"events": [{"id", "type", "created_at", "data"}, ...]}``, oldest first.
+It carries ``X-Webhook-Signature: t=<unix time>,v1=<hex digest>``, where the
+digest is the HMAC-SHA256 of ``"<t>.<body>"`` keyed with the subscription's
+secret. Receivers should recompute it over the raw body (``verify``),
+reject old timestamps to stop replays, and deduplicate on the event ids:
+a batch is retried as a whole until it gets a 2xx response, so every event
+is delivered at least once.
+
+Subscription URLs are tenant input, so they must not reach the cluster's
+own network: ``check_url`` rejects other schemes than http(s) and hosts
+that resolve to private, loopback, link-local, reserved or multicast
+addresses when a subscription is saved, and ``post`` checks the address it
+actually connected to again (DNS may answer differently by then), without
+proxies and without following redirects. ``WEBHOOK_ALLOW_PRIVATE_URLS``
+lifts the address check for local development.
+"""
+import hashlib
+import hmac
+import http.client
+import ipaddress
+import socket
+import time
+import urllib.error
+import urllib.request
+from urllib.parse import urlsplit
+
+import orjson
+from django.conf import settings
+
+SIGNATURE_HEADER = 'X-Webhook-Signature'
+USER_AGENT = 'task-management-webhooks/1'
+
+
+class DeliveryError(Exception):
+    pass
+
+
+class UnsafeURL(ValueError):
+    pass
+
+
+def _check_address(address):
+    if getattr(settings, 'WEBHOOK_ALLOW_PRIVATE_URLS', False):
+        return
+    ip = ipaddress.ip_address(address.split('%', 1)[0])
+    if ip.version == 6 and ip.ipv4_mapped:
+        ip = ip.ipv4_mapped
+    if not ip.is_global or ip.is_multicast:
+        raise UnsafeURL(f'{address} is not a public address')
+
+
+def _check_scheme(url):
+    parts = urlsplit(url)
+    if parts.scheme not in ('http', 'https'):
+        raise UnsafeURL('Only http and https URLs are allowed')
+    if not parts.hostname:
+        raise UnsafeURL('The URL has no host')
+    return parts
+
+
+def check_url(url):
+    """Raise ``UnsafeURL`` unless ``url`` is http(s) and every address of its host is public."""
+    parts = _check_scheme(url)
+    try:
+        port = parts.port or (443 if parts.scheme == 'https' else 80)
+        addresses = socket.getaddrinfo(parts.hostname, port, type=socket.SOCK_STREAM)
+    except (OSError, ValueError) as exc:
+        raise UnsafeURL(f'Cannot resolve {parts.hostname}') from exc
+    for *_, sockaddr in addresses:
+        _check_address(sockaddr[0])
+
+
+class _PublicHTTPConnection(http.client.HTTPConnection):
+    # Checks the connected address before anything is sent (for HTTPS, before the TLS handshake)
+    def connect(self):
+        super().connect()
+        try:
+            _check_address(self.sock.getpeername()[0])
+        except UnsafeURL:
+            self.close()
+            raise
+
+
+class _PublicHTTPSConnection(http.client.HTTPSConnection, _PublicHTTPConnection):
+    pass
+
+
+class _PublicHTTPHandler(urllib.request.HTTPHandler):
+    def http_open(self, req):
+        return self.do_open(_PublicHTTPConnection, req)
+
+
+class _PublicHTTPSHandler(urllib.request.HTTPSHandler):
+    def https_open(self, req):
+        return self.do_open(_PublicHTTPSConnection, req, context=self._context)
+
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    # A 3xx answer then surfaces as an ``HTTPError``, i.e. a failed delivery
+    def redirect_request(self, req, fp, code, msg, headers, newurl):
+        return None
+
+
+_opener = urllib.request.build_opener(
+    urllib.request.ProxyHandler({}), _NoRedirect, _PublicHTTPHandler, _PublicHTTPSHandler,
+)
+
+
+def encode(deliveries):
+    return orjson.dumps({
+        'events': [
+            {'id': delivery.event_id, 'type': delivery.event, 'created_at': delivery.created_at, 'data': delivery.payload}
+            for delivery in deliveries
+        ],
+    })
+
+
+def signature(secret, body, timestamp):
+    return hmac.new(secret.encode(), f'{timestamp}.'.encode() + body, hashlib.sha256).hexdigest()
+
+
+def sign(secret, body, timestamp=None):
+    timestamp = int(time.time()) if timestamp is None else timestamp
+    return f't={timestamp},v1={signature(secret, body, timestamp)}'
+
+
+def verify(secret, body, header, tolerance=300):
+    """Whether ``header`` is a valid signature of ``body`` made at most ``tolerance`` seconds ago."""
+    try:
+        parts = dict(part.split('=', 1) for part in header.split(','))
+        timestamp = int(parts['t'])
+    except (KeyError, ValueError):
+        return False
+    if abs(time.time() - timestamp) > tolerance:
+        return False
+    return hmac.compare_digest(signature(secret, body, timestamp), parts.get('v1', ''))
+
+
+def post(url, secret, body, timeout):
+    """Send one signed batch; raises ``DeliveryError`` unless the receiver answers with a 2xx status."""
+    headers = {
+        'Content-Type': 'application/json',
+        'User-Agent': USER_AGENT,
+        SIGNATURE_HEADER: sign(secret, body),
+    }
+    try:
+        _check_scheme(url)
+        request = urllib.request.Request(url, data=body, method='POST', headers=headers)
+        with _opener.open(request, timeout=timeout) as response:
+            status = response.status
+    except urllib.error.HTTPError as exc:
+        raise DeliveryError(f'HTTP {exc.code}') from exc
+    except (OSError, http.client.HTTPException, ValueError) as exc:  # connection errors, timeouts, invalid or unsafe URLs
+        raise DeliveryError(f'{type(exc).__name__}: {exc}') from exc
+    if not 200 <= status < 300:
+        raise DeliveryError(f'HTTP {status}')
@@ -0,0 +1,79 @@
+"""
+Recording of task events in the outbox.
+
+Events are written to ``OutboxEvent`` inside the caller's transaction, so a
+rolled-back change never announces itself and a committed one is never
+lost; nothing talks to a subscriber here. Tenants without an active
+subscription for an event type do not get rows at all. The event types each
+tenant subscribes to are cached in the default cache for
+``WEBHOOK_SUBSCRIPTION_CACHE_TIMEOUT`` seconds; the entry is deleted when
+one of its subscriptions changes. A stale entry would silently drop the
+events of a new subscription, so the timeout defaults to 0 (no caching)
+unless the default cache is shared (``REDIS_URL``).
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.utils import timezone
+
+from reminders.index import current_tenant_id
+
+from .models import OutboxEvent, WebhookSubscription
+
+KEY_PREFIX = 'webhooks:events:'
+ALL = '*'
+
+
+def cache_key(tenant_id):
+    return f'{KEY_PREFIX}{tenant_id}'
+
+
+def subscribed_events(tenant_id):
+    """Event types with an active subscription of the tenant; ``ALL`` stands for every type."""
+    timeout = getattr(settings, 'WEBHOOK_SUBSCRIPTION_CACHE_TIMEOUT', 0)
+    key = cache_key(tenant_id)
+    events = cache.get(key) if timeout else None
+    if events is None:
+        events = set()
+        for wanted in WebhookSubscription.objects.filter(tenant_id=tenant_id, is_active=True).values_list('events', flat=True):
+            events.update(wanted or [ALL])
+        events = sorted(events)
+        if timeout:
+            cache.set(key, events, timeout)
+    return events
+
+
+def invalidate(tenant_id):
+    cache.delete(cache_key(tenant_id))
+
+
+def _subscribed_tenant(event):
+    tenant_id = current_tenant_id()
+    if tenant_id is None:
+        return None
+    events = subscribed_events(tenant_id)
+    return tenant_id if ALL in events or event in events else None
+
+
+def record(event, payload):
+    tenant_id = _subscribed_tenant(event)
+    if tenant_id is not None:
+        OutboxEvent.objects.create(tenant_id=tenant_id, event=event, payload=payload)
+
+
+def record_deleted_tasks(queryset):
+    """One ``task.deleted`` event per task of ``queryset``, with one ``INSERT ... SELECT``."""
+    tenant_id = _subscribed_tenant('task.deleted')
+    if tenant_id is None:
+        return 0
+    sql, params = queryset.order_by().values('pk', 'title', 'parent_task').query.sql_with_params()
+    quote = connection.ops.quote_name
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {quote(OutboxEvent._meta.db_table)} (tenant_id, event, payload, created_at) '
+            f"SELECT %s, 'task.deleted', "
+            f"json_build_object('id', tasks.id, 'title', tasks.title, 'parent_task', tasks.parent_task_id), %s "
+            f'FROM ({sql}) tasks ORDER BY tasks.id',
+            [tenant_id, timezone.now(), *params],
+        )
+        return cursor.rowcount
@@ -0,0 +1,60 @@
+import json
+import random
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from django.core.management.base import BaseCommand
+
+from webhooks.delivery import SIGNATURE_HEADER, verify
+
+
+class Command(BaseCommand):
+    help = (
+        'Runs a local webhook receiver for development and testing: it prints every batch it '
+        'receives, checks the signature with --secret, and can fail (--fail-rate) or stall '
+        '(--delay) requests to exercise retries, backoff and timeouts.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--bind', default='127.0.0.1')
+        parser.add_argument('--port', type=int, default=8099)
+        parser.add_argument('--secret', default='', help='Subscription secret; requests signed otherwise get 401')
+        parser.add_argument('--fail-rate', type=float, default=0, help='Fraction of requests answered with 503')
+        parser.add_argument('--delay', type=float, default=0, help='Seconds to wait before answering')
+
+    def handle(self, *args, **options):
+        command = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+                if options['delay']:
+                    time.sleep(options['delay'])
+                if options['secret'] and not verify(options['secret'], body, self.headers.get(SIGNATURE_HEADER, '')):
+                    command.stdout.write(command.style.ERROR('Rejected a batch with an invalid signature'))
+                    return self.answer(401)
+                if random.random() < options['fail_rate']:
+                    command.stdout.write(command.style.WARNING('Failing a batch on purpose'))
+                    return self.answer(503)
+                events = json.loads(body)['events']
+                command.stdout.write(f'Received {len(events)} events: ' + ', '.join(
+                    f"{event['id']} {event['type']}" for event in events
+                ))
+                self.answer(204)
+
+            def answer(self, status):
+                self.send_response(status)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+
+            def log_message(self, format, *args):
+                pass
+
+        server = ThreadingHTTPServer((options['bind'], options['port']), Handler)
+        self.stdout.write(f"Webhook stub listening on http://{options['bind']}:{options['port']}/")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
@@ -0,0 +1,37 @@
+import signal
+import threading
+
+from django.core.management.base import BaseCommand
+
+from webhooks.worker import WebhookWorker
+
+
+class Command(BaseCommand):
+    help = (
+        'Delivers the outbox events of all tenants to their webhook subscriptions. '
+        'Several instances may run at once; each claims its own batches.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Deliver what is due now and exit')
+        parser.add_argument('--batch-size', type=int, help='Events per request to one subscriber')
+        parser.add_argument('--concurrency', type=int, help='Requests sent at once')
+        parser.add_argument(
+            '--retry-failed', action='store_true', help='Queue deliveries that ran out of attempts again first',
+        )
+
+    def handle(self, *args, **options):
+        worker = WebhookWorker(batch_size=options['batch_size'], concurrency=options['concurrency'])
+        if options['retry_failed']:
+            self.stdout.write(f'Queued {worker.retry_failed()} failed deliveries again')
+        if options['once']:
+            handled = worker.run_pending()
+            self.stdout.write(self.style.SUCCESS(f'Processed {handled} webhook deliveries'))
+            return
+
+        stop_event = threading.Event()
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(signum, lambda *_: stop_event.set())
+        self.stdout.write('Webhook worker started')
+        worker.run_forever(stop_event)
+        self.stdout.write(self.style.SUCCESS('Webhook worker stopped'))
@@ -0,0 +1,60 @@
+# Generated by Django 5.1.7 on 2026-10-19 09:57
+
+import django.contrib.postgres.fields
+import django.core.serializers.json
+import django.db.models.deletion
+import django.utils.timezone
+import webhooks.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('tenants', '0004_directory_search_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OutboxEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('event', models.CharField(choices=[('task.created', 'Task created'), ('task.updated', 'Task updated'), ('task.deleted', 'Task deleted'), ('comment.created', 'Comment added'), ('attachment.created', 'Attachment added')], max_length=50)),
+                ('payload', models.JSONField(encoder=django.core.serializers.json.DjangoJSONEncoder)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('tenant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='tenants.tenant')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='WebhookSubscription',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('url', models.URLField(max_length=500)),
+                ('secret', models.CharField(default=webhooks.models.generate_secret, editable=False, max_length=64)),
+                ('events', django.contrib.postgres.fields.ArrayField(base_field=models.CharField(choices=[('task.created', 'Task created'), ('task.updated', 'Task updated'), ('task.deleted', 'Task deleted'), ('comment.created', 'Comment added'), ('attachment.created', 'Attachment added')], max_length=50), blank=True, default=list, size=None)),
+                ('is_active', models.BooleanField(default=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('tenant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='tenants.tenant')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='WebhookDelivery',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('event_id', models.BigIntegerField()),
+                ('event', models.CharField(choices=[('task.created', 'Task created'), ('task.updated', 'Task updated'), ('task.deleted', 'Task deleted'), ('comment.created', 'Comment added'), ('attachment.created', 'Attachment added')], max_length=50)),
+                ('payload', models.JSONField(encoder=django.core.serializers.json.DjangoJSONEncoder)),
+                ('created_at', models.DateTimeField()),
+                ('not_before', models.DateTimeField(default=django.utils.timezone.now)),
+                ('attempts', models.PositiveSmallIntegerField(default=0)),
+                ('last_error', models.TextField(blank=True)),
+                ('failed_at', models.DateTimeField(blank=True, null=True)),
+                ('subscription', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='deliveries', to='webhooks.webhooksubscription')),
+            ],
+            options={
+                'indexes': [models.Index(condition=models.Q(('failed_at__isnull', True)), fields=['not_before'], name='webhookdelivery_due_idx')],
+            },
+        ),
+    ]
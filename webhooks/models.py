@@ -0,0 +1,88 @@
+import secrets
+
+from django.conf import settings
+from django.contrib.postgres.fields import ArrayField
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import models
+from django.utils import timezone
+
+EVENT_CHOICES = (
+    ('task.created', 'Task created'),
+    ('task.updated', 'Task updated'),
+    ('task.deleted', 'Task deleted'),
+    ('comment.created', 'Comment added'),
+    ('attachment.created', 'Attachment added'),
+)
+
+
+def generate_secret():
+    return secrets.token_hex(32)
+
+
+class WebhookSubscription(models.Model):
+    """
+    An endpoint of one tenant that receives its task events.
+
+    An empty ``events`` list subscribes to every event type. Deliveries are
+    signed with ``secret`` (see ``webhooks.delivery``).
+    """
+    tenant = models.ForeignKey(settings.TENANT_MODEL, on_delete=models.CASCADE, related_name='+')
+    url = models.URLField(max_length=500)
+    secret = models.CharField(max_length=64, default=generate_secret, editable=False)
+    events = ArrayField(models.CharField(max_length=50, choices=EVENT_CHOICES), default=list, blank=True)
+    is_active = models.BooleanField(default=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f'{self.url} for tenant {self.tenant_id}'
+
+    def wants(self, event):
+        return self.is_active and (not self.events or event in self.events)
+
+
+class OutboxEvent(models.Model):
+    """
+    A task event of one tenant that has not been fanned out to its subscriptions yet.
+
+    Lives in the public schema only and is written in the same transaction as
+    the change it describes, so an event exists exactly when the change was
+    committed. ``webhooks.worker`` turns each event into one
+    ``WebhookDelivery`` per matching subscription and deletes it.
+    """
+    tenant = models.ForeignKey(settings.TENANT_MODEL, on_delete=models.CASCADE, related_name='+')
+    event = models.CharField(max_length=50, choices=EVENT_CHOICES)
+    payload = models.JSONField(encoder=DjangoJSONEncoder)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f'{self.event} of tenant {self.tenant_id}'
+
+
+class WebhookDelivery(models.Model):
+    """
+    One event still to be sent to one subscription.
+
+    ``not_before`` is both the retry time after a failure and the lease of a
+    worker that is sending the row. Rows that failed ``WEBHOOK_MAX_ATTEMPTS``
+    times keep ``failed_at`` set and are no longer sent.
+    """
+    subscription = models.ForeignKey(WebhookSubscription, on_delete=models.CASCADE, related_name='deliveries')
+    # Id of the outbox event; the same for every subscription and retry, so receivers can deduplicate on it
+    event_id = models.BigIntegerField()
+    event = models.CharField(max_length=50, choices=EVENT_CHOICES)
+    payload = models.JSONField(encoder=DjangoJSONEncoder)
+    created_at = models.DateTimeField()
+    not_before = models.DateTimeField(default=timezone.now)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    failed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['not_before'], name='webhookdelivery_due_idx', condition=models.Q(failed_at__isnull=True),
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.event} {self.event_id} to subscription {self.subscription_id}'
@@ -0,0 +1,22 @@
+from rest_framework import serializers
+
+from .delivery import UnsafeURL, check_url
+from .models import WebhookSubscription
+
+
+class WebhookSubscriptionSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = WebhookSubscription
+        fields = ['id', 'url', 'events', 'is_active', 'secret', 'created_at']
+        read_only_fields = ['secret', 'created_at']
+        extra_kwargs = {'events': {'help_text': 'Event types to receive; empty for all of them'}}
+
+    def validate_url(self, value):
+        try:
+            check_url(value)
+        except UnsafeURL as exc:
+            raise serializers.ValidationError(str(exc))
+        return value
+
+    def validate_events(self, value):
+        return sorted(set(value))
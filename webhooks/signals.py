@@ -0,0 +1,82 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from tasks.models import Task, TaskAttachment, TaskComment
+from tasks.signals import subtrees_deleting
+
+from . import events
+from .models import WebhookSubscription
+
+
+def task_data(task):
+    return {
+        'id': task.pk,
+        'title': task.title,
+        'description': task.description,
+        'status': task.status,
+        'priority': task.priority,
+        'due_date': task.due_date,
+        'completed_at': task.completed_at,
+        'created_by': task.created_by_id,
+        'assigned_to': task.assigned_to_id,
+        'parent_task': task.parent_task_id,
+        'created_at': task.created_at,
+        'updated_at': task.updated_at,
+    }
+
+
+@receiver(post_save, sender=Task)
+def record_task_saved(sender, instance, created, update_fields=None, raw=False, **kwargs):
+    if raw:
+        return
+    if created:
+        events.record('task.created', task_data(instance))
+        return
+    # Board moves within a column and bookkeeping writes have no tracked changes
+    changes = instance.activity_changes(update_fields)
+    if changes:
+        events.record('task.updated', {**task_data(instance), 'changes': changes})
+
+
+@receiver(post_delete, sender=Task)
+def record_task_deleted(sender, instance, **kwargs):
+    events.record('task.deleted', {'id': instance.pk, 'title': instance.title, 'parent_task': instance.parent_task_id})
+
+
+@receiver(subtrees_deleting, sender=Task)
+def record_subtrees_deleted(sender, queryset, **kwargs):
+    events.record_deleted_tasks(queryset)
+
+
+@receiver(post_save, sender=TaskComment)
+def record_comment_created(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        events.record('comment.created', {
+            'id': instance.pk,
+            'task': instance.task_id,
+            'user': instance.user_id,
+            'content': instance.content,
+            'created_at': instance.created_at,
+        })
+
+
+@receiver(post_save, sender=TaskAttachment)
+def record_attachment_created(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        events.record('attachment.created', {
+            'id': instance.pk,
+            'task': instance.task_id,
+            'file': instance.file.name,
+            'size': instance.size,
+            'description': instance.description,
+            'uploaded_by': instance.uploaded_by_id,
+            'uploaded_at': instance.uploaded_at,
+        })
+
+
+@receiver(post_save, sender=WebhookSubscription)
+@receiver(post_delete, sender=WebhookSubscription)
+def invalidate_subscribed_events(sender, instance, **kwargs):
+    # After commit, so that a concurrent request cannot cache the old subscriptions again
+    transaction.on_commit(lambda: events.invalidate(instance.tenant_id))
@@ -0,0 +1,83 @@
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+from django.test import SimpleTestCase, override_settings
+
+from . import delivery
+from .serializers import WebhookSubscriptionSerializer
+
+
+class Receiver(BaseHTTPRequestHandler):
+    """Accepts batches on ``/``; ``/redirect`` answers with a redirect to ``/``."""
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        self.server.received.append(self.path)
+        if self.path == '/redirect':
+            self.send_response(302)
+            self.send_header('Location', '/')
+        else:
+            self.send_response(204)
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+
+class WebhookURLTests(SimpleTestCase):
+    def test_only_http_and_https(self):
+        for url in ('ftp://203.0.113.7/', 'file:///etc/passwd', 'gopher://203.0.113.7/'):
+            with self.subTest(url=url), self.assertRaises(delivery.UnsafeURL):
+                delivery.check_url(url)
+
+    def test_internal_addresses_are_rejected(self):
+        for url in (
+            'http://127.0.0.1/', 'http://localhost:8000/', 'http://10.0.0.5/', 'http://172.16.3.4/',
+            'http://192.168.1.1/', 'http://169.254.169.254/latest/meta-data/', 'http://0.0.0.0/',
+            'http://[::1]/', 'http://[fd00::1]/', 'http://[::ffff:127.0.0.1]/', 'http://224.0.0.1/',
+        ):
+            with self.subTest(url=url), self.assertRaises(delivery.UnsafeURL):
+                delivery.check_url(url)
+
+    def test_public_addresses_are_accepted(self):
+        delivery.check_url('https://8.8.8.8/hooks')
+        delivery.check_url('http://[2001:4860:4860::8888]:8080/')
+
+    @override_settings(WEBHOOK_ALLOW_PRIVATE_URLS=True)
+    def test_private_addresses_can_be_allowed_for_development(self):
+        delivery.check_url('http://127.0.0.1:8099/')
+
+    def test_serializer_rejects_internal_urls(self):
+        serializer = WebhookSubscriptionSerializer(data={'url': 'http://169.254.169.254/', 'events': []})
+        self.assertFalse(serializer.is_valid())
+        self.assertIn('url', serializer.errors)
+        serializer = WebhookSubscriptionSerializer(data={'url': 'https://8.8.8.8/hooks', 'events': []})
+        self.assertTrue(serializer.is_valid(), serializer.errors)
+
+
+class WebhookPostTests(SimpleTestCase):
+    def setUp(self):
+        self.server = HTTPServer(('127.0.0.1', 0), Receiver)
+        self.server.received = []
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+        self.base = f'http://127.0.0.1:{self.server.server_port}'
+
+    def post(self, path):
+        delivery.post(self.base + path, 'secret', b'{"events": []}', timeout=5)
+
+    def test_connections_to_internal_addresses_are_refused(self):
+        with self.assertRaises(delivery.DeliveryError):
+            self.post('/')
+        self.assertEqual(self.server.received, [])
+
+    @override_settings(WEBHOOK_ALLOW_PRIVATE_URLS=True)
+    def test_delivery(self):
+        self.post('/')
+        self.assertEqual(self.server.received, ['/'])
+
+    @override_settings(WEBHOOK_ALLOW_PRIVATE_URLS=True)
+    def test_redirects_are_not_followed(self):
+        with self.assertRaisesMessage(delivery.DeliveryError, 'HTTP 302'):
+            self.post('/redirect')
+        self.assertEqual(self.server.received, ['/redirect'])
@@ -0,0 +1,54 @@
+from rest_framework import viewsets
+from rest_framework.decorators import action
+from rest_framework.response import Response
+
+from reminders.index import current_tenant_id
+from task_management_system.docs import OpenApiExample, extend_schema
+from users.permissions import IsTenantAdmin
+
+from .models import WebhookSubscription, generate_secret
+from .serializers import WebhookSubscriptionSerializer
+
+
+@extend_schema(
+    tags=['Webhooks'],
+    summary="Webhook Subscriptions",
+    description=(
+        "Endpoints that receive the tenant's task events in signed batches. "
+        "Only admins of the tenant can manage them."
+    ),
+    examples=[
+        OpenApiExample(
+            'Subscription Example',
+            value={
+                "url": "https://hooks.example.com/tasks",
+                "events": ["task.created", "task.updated"],
+                "is_active": True
+            },
+            request_only=True,
+        ),
+    ]
+)
+class WebhookSubscriptionViewSet(viewsets.ModelViewSet):
+    serializer_class = WebhookSubscriptionSerializer
+    permission_classes = [IsTenantAdmin]
+
+    def get_queryset(self):
+        # Subscriptions live in the public schema; scope them to the request's tenant
+        return WebhookSubscription.objects.filter(tenant_id=current_tenant_id()).order_by('pk')
+
+    def perform_create(self, serializer):
+        serializer.save(tenant_id=current_tenant_id())
+
+    @extend_schema(
+        summary="Rotate Secret",
+        description="Replace the signing secret; deliveries from now on are signed with the new one",
+        request=None,
+        responses={200: WebhookSubscriptionSerializer},
+    )
+    @action(detail=True, methods=['post'])
+    def rotate_secret(self, request, pk=None):
+        subscription = self.get_object()
+        subscription.secret = generate_secret()
+        subscription.save(update_fields=['secret'])
+        return Response(self.get_serializer(subscription).data)
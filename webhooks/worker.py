@@ -0,0 +1,169 @@
+"""
+Fan-out and delivery of outbox events to webhook subscriptions.
+
+Each cycle first turns pending ``OutboxEvent`` rows into one
+``WebhookDelivery`` per matching subscription, then sends the due
+deliveries. Both steps claim rows with ``SELECT ... FOR UPDATE SKIP LOCKED``,
+so several workers can share the tables.
+
+Deliveries are sent in batches of up to ``WEBHOOK_BATCH_SIZE`` events per
+subscription, one request per batch, so a busy tenant costs one request per
+subscriber rather than one per event. A worker sends at most
+``WEBHOOK_CONCURRENCY`` batches at once, each to a different subscription,
+from a thread pool. Claimed rows are leased by moving their ``not_before``
+past the request timeout, so the transaction is not held open during the
+requests and another worker does not pick them up meanwhile.
+
+A failed batch is retried as a whole with exponential backoff and jitter;
+after ``WEBHOOK_MAX_ATTEMPTS`` its deliveries are marked failed and kept for
+inspection (``run_webhook_worker --retry-failed`` queues them again).
+"""
+import logging
+import random
+import threading
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+
+from . import delivery
+from .models import OutboxEvent, WebhookDelivery, WebhookSubscription
+
+logger = logging.getLogger(__name__)
+
+MAX_BACKOFF = timedelta(hours=6)
+
+
+class WebhookWorker:
+    def __init__(self, batch_size=None, concurrency=None, timeout=None, max_attempts=None, poll_interval=None):
+        self.batch_size = batch_size or getattr(settings, 'WEBHOOK_BATCH_SIZE', 100)
+        self.concurrency = concurrency or getattr(settings, 'WEBHOOK_CONCURRENCY', 8)
+        self.timeout = timeout or getattr(settings, 'WEBHOOK_TIMEOUT', 10)
+        self.max_attempts = max_attempts or getattr(settings, 'WEBHOOK_MAX_ATTEMPTS', 10)
+        self.poll_interval = poll_interval or getattr(settings, 'WEBHOOK_POLL_INTERVAL', 5)
+        self.retry_delay = getattr(settings, 'WEBHOOK_RETRY_DELAY', 30)
+        # Long enough for every claimed batch to finish; they are all sent at once
+        self.lease = timedelta(seconds=self.timeout * 2 + 30)
+
+    def fan_out(self, now=None):
+        """Turn one batch of outbox events into deliveries; returns the number of events handled."""
+        now = now or timezone.now()
+        with transaction.atomic():
+            events = list(OutboxEvent.objects.order_by('pk').select_for_update(skip_locked=True)[:self.batch_size])
+            if not events:
+                return 0
+            subscriptions = defaultdict(list)
+            for subscription in WebhookSubscription.objects.filter(
+                tenant_id__in={event.tenant_id for event in events}, is_active=True,
+            ):
+                subscriptions[subscription.tenant_id].append(subscription)
+            WebhookDelivery.objects.bulk_create(
+                [
+                    WebhookDelivery(
+                        subscription=subscription, event_id=event.pk, event=event.event,
+                        payload=event.payload, created_at=event.created_at, not_before=now,
+                    )
+                    for event in events
+                    for subscription in subscriptions[event.tenant_id]
+                    if subscription.wants(event.event)
+                ],
+                batch_size=1000,
+            )
+            OutboxEvent.objects.filter(pk__in=[event.pk for event in events]).delete()
+        return len(events)
+
+    def claim(self, now):
+        """Lease due deliveries of up to ``concurrency`` subscriptions, at most ``batch_size`` each."""
+        with transaction.atomic():
+            due = (
+                WebhookDelivery.objects.filter(failed_at__isnull=True, not_before__lte=now)
+                .select_related('subscription')
+                .select_for_update(skip_locked=True, of=('self',))
+                .order_by('not_before', 'pk')[:self.batch_size * self.concurrency]
+            )
+            batches = {}
+            for row in due:
+                if row.subscription_id not in batches and len(batches) == self.concurrency:
+                    continue
+                batch = batches.setdefault(row.subscription_id, [])
+                if len(batch) < self.batch_size:
+                    batch.append(row)
+            WebhookDelivery.objects.filter(
+                pk__in=[row.pk for batch in batches.values() for row in batch],
+            ).update(not_before=now + self.lease)
+        # Retried rows may have been overtaken by newer ones; send each batch in event order
+        return [sorted(batch, key=lambda row: row.event_id) for batch in batches.values()]
+
+    def send(self, batch):
+        """Post one batch; returns the error, or ``None`` when it was accepted."""
+        subscription = batch[0].subscription
+        try:
+            delivery.post(subscription.url, subscription.secret, delivery.encode(batch), self.timeout)
+        except delivery.DeliveryError as exc:
+            return str(exc)
+        return None
+
+    def backoff(self, attempts):
+        delay = min(timedelta(seconds=self.retry_delay * 2 ** (attempts - 1)), MAX_BACKOFF)
+        # Jitter spreads the retries of batches that failed together, e.g. during a receiver outage
+        return delay * random.uniform(0.5, 1)
+
+    def process_batch(self, now=None):
+        """Send one round of due deliveries; returns the number of deliveries handled."""
+        batches = self.claim(now or timezone.now())
+        if not batches:
+            return 0
+        with ThreadPoolExecutor(max_workers=len(batches), thread_name_prefix='webhook') as pool:
+            errors = list(pool.map(self.send, batches))
+
+        finished = timezone.now()
+        done, failed = [], []
+        for batch, error in zip(batches, errors):
+            if error is None:
+                done.extend(row.pk for row in batch)
+                continue
+            for row in batch:
+                row.attempts += 1
+                row.last_error = error
+                if row.attempts >= self.max_attempts:
+                    row.failed_at = finished
+                else:
+                    row.not_before = finished + self.backoff(row.attempts)
+                failed.append(row)
+        with transaction.atomic():
+            WebhookDelivery.objects.filter(pk__in=done).delete()
+            WebhookDelivery.objects.bulk_update(failed, ['attempts', 'last_error', 'not_before', 'failed_at'])
+        if failed:
+            logger.warning(
+                'Could not deliver %d of %d webhook events; first error: %s',
+                len(failed), len(done) + len(failed), failed[0].last_error,
+            )
+        return len(done) + len(failed)
+
+    def retry_failed(self, now=None):
+        """Queue the deliveries that ran out of attempts again; returns their number."""
+        return WebhookDelivery.objects.filter(failed_at__isnull=False).update(
+            failed_at=None, attempts=0, last_error='', not_before=now or timezone.now(),
+        )
+
+    def run_pending(self):
+        total = 0
+        while True:
+            fanned_out = self.fan_out()
+            handled = self.process_batch()
+            total += handled
+            if fanned_out < self.batch_size and not handled:
+                return total
+
+    def run_forever(self, stop_event=None):
+        stop_event = stop_event or threading.Event()
+        while not stop_event.is_set():
+            close_old_connections()
+            try:
+                self.run_pending()
+            except Exception:
+                logger.exception('Webhook delivery failed')
+            stop_event.wait(self.poll_interval)